@@ -1,10 +1,11 @@
 # appointments/admin.py
 
-from django.contrib import admin
+from django.contrib import admin, messages
 from django.utils.html import format_html
 from django.urls import reverse
 from django.utils import timezone
 from .models import Appointment, AppointmentHistory, RecurringAppointment
+from .services import BulkStatusTransitionService
 
 
 @admin.register(Appointment)
@@ -119,43 +120,39 @@ class AppointmentAdmin(admin.ModelAdmin):
     # Acciones personalizadas
     actions = ['confirm_appointments', 'cancel_appointments', 'mark_completed']
     
+    def _transition_appointments(self, request, queryset, target_status, message, reason=""):
+        """Aplicar la transición a las citas seleccionadas con un solo UPDATE"""
+        result = BulkStatusTransitionService(request.user).transition(
+            queryset, target_status, reason=reason
+        )
+        
+        self.message_user(request, f"{len(result['updated'])} {message}")
+        if result['errors']:
+            self.message_user(
+                request,
+                f"{len(result['errors'])} citas no admiten este cambio de estado.",
+                level=messages.WARNING
+            )
+    
     def confirm_appointments(self, request, queryset):
         """Confirmar citas seleccionadas"""
-        count = 0
-        for appointment in queryset.filter(status='pending'):
-            appointment.confirm()
-            count += 1
-        
-        self.message_user(
-            request, 
-            f"{count} citas fueron confirmadas exitosamente."
+        self._transition_appointments(
+            request, queryset, 'confirmed', "citas fueron confirmadas exitosamente."
         )
     confirm_appointments.short_description = "Confirmar citas seleccionadas"
     
     def cancel_appointments(self, request, queryset):
         """Cancelar citas seleccionadas"""
-        count = 0
-        for appointment in queryset:
-            if appointment.can_be_cancelled:
-                appointment.cancel(cancelled_by=request.user, reason="Cancelada desde admin")
-                count += 1
-        
-        self.message_user(
-            request, 
-            f"{count} citas fueron canceladas exitosamente."
+        self._transition_appointments(
+            request, queryset, 'cancelled', "citas fueron canceladas exitosamente.",
+            reason="Cancelada desde admin"
         )
     cancel_appointments.short_description = "Cancelar citas seleccionadas"
     
     def mark_completed(self, request, queryset):
         """Marcar citas como completadas"""
-        count = 0
-        for appointment in queryset.filter(status__in=['checked_in', 'in_progress']):
-            appointment.complete()
-            count += 1
-        
-        self.message_user(
-            request, 
-            f"{count} citas fueron marcadas como completadas."
+        self._transition_appointments(
+            request, queryset, 'completed', "citas fueron marcadas como completadas."
         )
     mark_completed.short_description = "Marcar como completadas"
 
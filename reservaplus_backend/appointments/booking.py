@@ -0,0 +1,145 @@
+# appointments/booking.py
+
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, OperationalError, connection, transaction
+from django.db.models import F
+from organizations.models import Professional
+from .models import Appointment
+
+
+# Restricción de exclusión de PostgreSQL (ver migración 0004)
+OVERLAP_CONSTRAINT_NAME = 'appointments_no_professional_overlap'
+
+# Reintentos cuando otra transacción mantiene el bloqueo de escritura de SQLite
+DEFAULT_BOOKING_LOCK_RETRIES = 3
+DEFAULT_BOOKING_LOCK_RETRY_DELAY_MS = 50
+
+OVERLAP_MESSAGE = "El profesional ya tiene una cita en este horario"
+
+
+class AppointmentConflictError(ValidationError):
+    """
+    La cita se solapa con otra cita activa del profesional (las vistas responden 409)
+    """
+    pass
+
+
+def get_booking_lock_retries() -> int:
+    return getattr(settings, 'BOOKING_LOCK_RETRIES', DEFAULT_BOOKING_LOCK_RETRIES)
+
+
+def get_booking_lock_retry_delay() -> float:
+    return getattr(settings, 'BOOKING_LOCK_RETRY_DELAY_MS', DEFAULT_BOOKING_LOCK_RETRY_DELAY_MS) / 1000
+
+
+def lock_professional_schedule(professional_id) -> None:
+    """
+    Bloquear la agenda del profesional hasta el fin de la transacción actual
+
+    En PostgreSQL toma un bloqueo de fila (SELECT ... FOR UPDATE) sobre el
+    profesional, por lo que las reservas de profesionales distintos corren en
+    paralelo. SQLite solo bloquea la base completa: una actualización nula
+    sobre la fila toma el bloqueo de escritura. Si es la primera sentencia de
+    la transacción equivale a BEGIN IMMEDIATE (Django 4.2 abre las
+    transacciones de SQLite con BEGIN diferido) y los demás escritores
+    esperan el timeout de SQLite antes de fallar.
+    """
+    lock_professional_schedules([professional_id])
+
+
+def lock_professional_schedules(professional_ids) -> None:
+    """
+    Bloquear las agendas de varios profesionales con una sola sentencia
+
+    Las filas se bloquean en orden de id para que dos lotes con profesionales
+    en común no se bloqueen mutuamente.
+    """
+    professional_ids = sorted(set(professional_ids), key=str)
+    if not professional_ids:
+        return
+    professionals = Professional.objects.filter(pk__in=professional_ids)
+    if connection.vendor == 'postgresql':
+        list(professionals.select_for_update().order_by('pk').values_list('pk', flat=True))
+    else:
+        professionals.update(id=F('id'))
+
+
+def has_overlapping_appointment(professional_id, start_datetime, end_datetime, exclude_appointment_id=None) -> bool:
+    """
+    ¿Hay otra cita activa del profesional que se solape con el intervalo? (una consulta)
+    """
+    appointments = Appointment.objects.filter(
+        professional_id=professional_id,
+        status__in=Appointment.ACTIVE_STATUSES,
+        start_datetime__lt=end_datetime,
+        end_datetime__gt=start_datetime
+    )
+    if exclude_appointment_id is not None:
+        appointments = appointments.exclude(pk=exclude_appointment_id)
+    return appointments.exists()
+
+
+def is_overlap_violation(error: IntegrityError) -> bool:
+    return OVERLAP_CONSTRAINT_NAME in str(error)
+
+
+def is_lock_timeout(error: OperationalError) -> bool:
+    return 'database is locked' in str(error)
+
+
+@contextmanager
+def booking_transaction(professional_id):
+    """
+    Transacción con la agenda del profesional bloqueada desde la primera sentencia
+
+    Para vistas que crean otros registros (clientes) junto con la cita; la
+    cita se guarda luego con book_appointment.
+    """
+    with transaction.atomic():
+        lock_professional_schedule(professional_id)
+        yield
+
+
+def book_appointment(appointment: Appointment) -> Appointment:
+    """
+    Guardar una cita sin solaparse con reservas concurrentes
+
+    Bloquea la agenda del profesional, vuelve a verificar el solapamiento con
+    los datos ya confirmados y guarda la cita. En PostgreSQL la restricción
+    de exclusión es la garantía final. Fuera de una transacción, los
+    bloqueos de SQLite que agotan el timeout se reintentan.
+
+    Raises:
+        AppointmentConflictError: La cita se solapa con otra del profesional
+        ValidationError: Otras validaciones de Appointment.clean
+    """
+    if appointment.end_datetime is None and appointment.start_datetime and appointment.duration_minutes:
+        appointment.end_datetime = appointment.start_datetime + timedelta(minutes=appointment.duration_minutes)
+
+    retries = 0 if transaction.get_connection().in_atomic_block else get_booking_lock_retries()
+    exclude_appointment_id = None if appointment._state.adding else appointment.pk
+    for attempt in range(retries + 1):
+        try:
+            with transaction.atomic():
+                lock_professional_schedule(appointment.professional_id)
+                if appointment.status in Appointment.ACTIVE_STATUSES and has_overlapping_appointment(
+                    appointment.professional_id,
+                    appointment.start_datetime,
+                    appointment.end_datetime,
+                    exclude_appointment_id
+                ):
+                    raise AppointmentConflictError(OVERLAP_MESSAGE)
+                appointment.save()
+            return appointment
+        except IntegrityError as error:
+            if is_overlap_violation(error):
+                raise AppointmentConflictError(OVERLAP_MESSAGE) from error
+            raise
+        except OperationalError as error:
+            if not is_lock_timeout(error) or attempt >= retries:
+                raise
+            time.sleep(get_booking_lock_retry_delay() * (attempt + 1))
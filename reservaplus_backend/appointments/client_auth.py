@@ -416,8 +416,8 @@ class ClientAppointmentsView(APIView):
         
         try:
             from datetime import datetime, timedelta
-            from django.db import transaction
-            from schedule.services import AvailabilityCalculationService
+            from .booking import AppointmentConflictError, book_appointment, booking_transaction
+            from .validation import AppointmentValidationContext
             
             service = Service.objects.get(
                 id=service_id,
@@ -430,17 +430,19 @@ class ClientAppointmentsView(APIView):
                 is_active=True
             )
             
-            if not service.professionals.filter(id=professional.id).exists():
+            start_datetime = datetime.fromisoformat(start_datetime_str.replace('Z', '+00:00'))
+            
+            # Profesional, horario, capacidad y citas del intervalo en un solo paso (se reutiliza al guardar)
+            validation_context = AppointmentValidationContext(professional, service, start_datetime)
+            
+            if not validation_context.can_perform_service:
                 return Response(
                     {'error': 'El profesional no puede realizar este servicio'},
                     status=status.HTTP_400_BAD_REQUEST
                 )
             
-            start_datetime = datetime.fromisoformat(start_datetime_str.replace('Z', '+00:00'))
-            
             # Verificar disponibilidad
-            availability_service = AvailabilityCalculationService(professional)
-            is_available, reason = availability_service.is_available_at_time(start_datetime, service)
+            is_available, reason = validation_context.is_available_at_time(start_datetime)
             
             if not is_available:
                 return Response(
@@ -455,8 +457,8 @@ class ClientAppointmentsView(APIView):
                 role='owner'
             ).first()
             
-            with transaction.atomic():
-                appointment = Appointment.objects.create(
+            with booking_transaction(professional.id):
+                appointment = Appointment(
                     organization=client.organization,
                     professional=professional,
                     service=service,
@@ -469,6 +471,14 @@ class ClientAppointmentsView(APIView):
                     notes=notes,
                     created_by=system_user
                 )
+                appointment._validation_context = validation_context
+                try:
+                    book_appointment(appointment)
+                except AppointmentConflictError as conflict:
+                    return Response(
+                        {'error': conflict.messages[0]},
+                        status=status.HTTP_409_CONFLICT
+                    )
                 
                 return Response({
                     'success': True,
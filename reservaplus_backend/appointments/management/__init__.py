@@ -0,0 +1 @@
+# appointments/management/__init__.py 
\ No newline at end of file
@@ -0,0 +1 @@
+# appointments/management/commands/__init__.py 
\ No newline at end of file
@@ -0,0 +1,90 @@
+# appointments/management/commands/generate_recurring_appointments.py
+
+import time
+from django.core.management.base import BaseCommand
+from organizations.models import Organization
+from appointments.booking import AppointmentConflictError
+from appointments.models import RecurringAppointment
+from appointments.services import RecurringAppointmentGenerationService
+
+
+class Command(BaseCommand):
+    help = 'Generar las citas de las recurrencias activas (pensado para ejecutarse cada noche)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--organization',
+            type=str,
+            help='Procesar solo una organización específica (UUID)',
+        )
+        parser.add_argument(
+            '--days',
+            type=int,
+            help='Días hacia adelante a generar (por defecto advance_booking_days de cada recurrencia)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=RecurringAppointmentGenerationService.BATCH_SIZE,
+            help='Tamaño de lote para bulk_create',
+        )
+        parser.add_argument(
+            '--verbose-skipped',
+            action='store_true',
+            help='Mostrar cada ocurrencia omitida con su motivo',
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        generation_service = RecurringAppointmentGenerationService(batch_size=options['batch_size'])
+
+        organizations = Organization.objects.filter(
+            is_active=True,
+            id__in=RecurringAppointment.objects.filter(is_active=True).values('organization_id')
+        ).order_by('name')
+        if options.get('organization'):
+            organizations = organizations.filter(id=options['organization'])
+
+        self.stdout.write(
+            self.style.SUCCESS('🔁 Generando citas recurrentes...')
+        )
+
+        total_created = 0
+        total_skipped = 0
+        # Una organización a la vez: cada una se confirma en su propia transacción
+        for organization in organizations:
+            recurring_appointments = RecurringAppointment.objects.filter(
+                organization=organization,
+                is_active=True
+            ).select_related('professional__schedule', 'service', 'client')
+
+            try:
+                result = generation_service.generate(recurring_appointments, horizon_days=options.get('days'))
+            except AppointmentConflictError as error:
+                # La organización se reintenta en la próxima ejecución; las demás continúan
+                self.stdout.write(
+                    self.style.WARNING(f"   ⚠️ {organization.name}: {error.messages[0]}")
+                )
+                continue
+            created = len(result['created'])
+            skipped = len(result['skipped'])
+            total_created += created
+            total_skipped += skipped
+
+            self.stdout.write(
+                f"   📋 {organization.name}: {result['processed']} recurrencias, "
+                f"{created} citas creadas, {skipped} omitidas"
+            )
+            if options['verbose_skipped']:
+                for skipped_occurrence in result['skipped']:
+                    self.stdout.write(
+                        f"      - {skipped_occurrence['date']} "
+                        f"({skipped_occurrence['recurring_appointment_id']}): {skipped_occurrence['reason']}"
+                    )
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'\n✅ {total_created} citas creadas, {total_skipped} omitidas '
+                f'en {time.monotonic() - started:.2f}s'
+            )
+        )
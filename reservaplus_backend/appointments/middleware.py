@@ -85,8 +85,6 @@ class AvailabilityValidationMiddleware(MiddlewareMixin):
         """
         from organizations.models import Professional, Service
         from schedule.services import AvailabilityCalculationService
-        from appointments.models import Appointment
-        from datetime import timedelta
         
         try:
             # Obtener objetos
@@ -102,45 +100,12 @@ class AvailabilityValidationMiddleware(MiddlewareMixin):
             # Parsear fecha
             start_datetime = datetime.fromisoformat(start_datetime_str.replace('Z', '+00:00'))
             
-            # Usar el servicio de disponibilidad
+            # Usar el servicio de disponibilidad (horario y solapamiento con un solo índice de citas)
             availability_service = AvailabilityCalculationService(professional)
-            is_available, reason = availability_service.is_available_at_time(start_datetime, service)
-            
-            conflicts = []
-            
-            if not is_available:
-                conflicts.append({
-                    'type': 'schedule_conflict',
-                    'reason': reason,
-                    'severity': 'high'
-                })
-            
-            # Verificar solapamiento con citas existentes
-            end_datetime = start_datetime + timedelta(minutes=service.total_duration_minutes)
-            overlapping_appointments = Appointment.objects.filter(
-                professional=professional,
-                start_datetime__lt=end_datetime,
-                end_datetime__gt=start_datetime,
-                status__in=['pending', 'confirmed', 'checked_in', 'in_progress']
+            conflicts = availability_service.detect_conflicts(
+                start_datetime, service, exclude_appointment_id
             )
             
-            if exclude_appointment_id:
-                overlapping_appointments = overlapping_appointments.exclude(id=exclude_appointment_id)
-            
-            for appointment in overlapping_appointments:
-                conflicts.append({
-                    'type': 'appointment_conflict',
-                    'reason': f'Conflicto con cita de {appointment.client.full_name}',
-                    'severity': 'high',
-                    'conflicting_appointment': {
-                        'id': str(appointment.id),
-                        'client_name': appointment.client.full_name,
-                        'service_name': appointment.service.name,
-                        'start_datetime': appointment.start_datetime.isoformat(),
-                        'end_datetime': appointment.end_datetime.isoformat()
-                    }
-                })
-            
             # Sugerir slots alternativos si hay conflictos
             suggested_slots = []
             if conflicts:
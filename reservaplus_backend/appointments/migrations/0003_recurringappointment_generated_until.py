@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-17 03:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0002_alter_service_cascade_to_set_null'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recurringappointment',
+            name='generated_until',
+            field=models.DateField(blank=True, null=True),
+        ),
+    ]
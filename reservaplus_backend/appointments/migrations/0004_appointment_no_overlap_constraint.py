@@ -0,0 +1,101 @@
+from django.db import DatabaseError, migrations
+
+
+# Restricción de exclusión: dos citas activas del mismo profesional no pueden solaparse.
+# Solo PostgreSQL la soporta; en SQLite la exclusión la garantiza el bloqueo de appointments.booking.
+#
+# Requisitos en PostgreSQL:
+# - La extensión btree_gist. CREATE EXTENSION requiere un superusuario (o, desde
+#   PostgreSQL 13, un usuario con CREATE en la base, ya que btree_gist es "trusted").
+#   Si el usuario de la aplicación no tiene ese privilegio, un administrador debe
+#   ejecutar antes: CREATE EXTENSION IF NOT EXISTS btree_gist;
+# - Que no existan citas activas solapadas. La migración las busca antes de agregar
+#   la restricción y falla listándolas; deben cancelarse o reprogramarse a mano.
+CONSTRAINT_NAME = 'appointments_no_professional_overlap'
+ACTIVE_STATUSES_SQL = "('pending', 'confirmed', 'checked_in', 'in_progress')"
+
+OVERLAPPING_APPOINTMENTS_SQL = f"""
+    SELECT earlier.id, later.id, earlier.professional_id, earlier.start_datetime
+    FROM appointments_appointment earlier
+    JOIN appointments_appointment later
+        ON later.professional_id = earlier.professional_id
+        AND later.id <> earlier.id
+        AND later.start_datetime >= earlier.start_datetime
+        AND later.start_datetime < COALESCE(earlier.end_datetime, 'infinity'::timestamptz)
+        AND (later.start_datetime > earlier.start_datetime OR later.id > earlier.id)
+    WHERE earlier.status IN {ACTIVE_STATUSES_SQL}
+        AND later.status IN {ACTIVE_STATUSES_SQL}
+    ORDER BY earlier.start_datetime
+    LIMIT 20
+"""
+
+CREATE_CONSTRAINT_SQL = f"""
+    ALTER TABLE appointments_appointment
+    ADD CONSTRAINT {CONSTRAINT_NAME}
+    EXCLUDE USING gist (
+        professional_id WITH =,
+        tstzrange(start_datetime, end_datetime, '[)') WITH &&
+    )
+    WHERE (status IN {ACTIVE_STATUSES_SQL})
+"""
+
+DROP_CONSTRAINT_SQL = f"""
+    ALTER TABLE appointments_appointment
+    DROP CONSTRAINT IF EXISTS {CONSTRAINT_NAME}
+"""
+
+
+def ensure_btree_gist(schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'btree_gist'")
+        if cursor.fetchone():
+            return
+    try:
+        schema_editor.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+    except DatabaseError as error:
+        raise RuntimeError(
+            "No se pudo crear la extensión btree_gist (requiere superusuario o privilegio CREATE "
+            "en la base). Un administrador debe ejecutar 'CREATE EXTENSION IF NOT EXISTS btree_gist;' "
+            "y luego volver a correr las migraciones."
+        ) from error
+
+
+def check_overlapping_appointments(schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(OVERLAPPING_APPOINTMENTS_SQL)
+        overlaps = cursor.fetchall()
+    if overlaps:
+        details = '\n'.join(
+            f'  - profesional {professional_id}: citas {earlier_id} y {later_id} ({start_datetime})'
+            for earlier_id, later_id, professional_id, start_datetime in overlaps
+        )
+        raise RuntimeError(
+            "Hay citas activas solapadas del mismo profesional; la restricción "
+            f"{CONSTRAINT_NAME} no puede agregarse. Cancela o reprograma una cita de cada par "
+            f"y vuelve a correr las migraciones (se muestran hasta 20):\n{details}"
+        )
+
+
+def create_overlap_constraint(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    ensure_btree_gist(schema_editor)
+    check_overlapping_appointments(schema_editor)
+    schema_editor.execute(CREATE_CONSTRAINT_SQL)
+
+
+def drop_overlap_constraint(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(DROP_CONSTRAINT_SQL)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0003_recurringappointment_generated_until'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_overlap_constraint, drop_overlap_constraint),
+    ]
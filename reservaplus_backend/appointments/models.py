@@ -1,7 +1,8 @@
 # appointments/models.py
 
+import calendar
 import uuid
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 from django.db import models
 from django.core.exceptions import ValidationError
 from django.utils import timezone
@@ -54,6 +55,26 @@ class Appointment(models.Model):
         ('no_show', 'No Asistió'),
         ('rescheduled', 'Reprogramada'),
     ]
+    # Estados que ocupan la agenda del profesional
+    ACTIVE_STATUSES = ['pending', 'confirmed', 'checked_in', 'in_progress']
+    # Transiciones permitidas desde cada estado (ver confirm, check_in, start_service, complete, cancel, mark_no_show)
+    STATUS_TRANSITIONS = {
+        'pending': ('confirmed', 'checked_in', 'cancelled', 'no_show', 'rescheduled'),
+        'confirmed': ('checked_in', 'cancelled', 'no_show', 'rescheduled'),
+        'checked_in': ('in_progress', 'completed', 'cancelled'),
+        'in_progress': ('completed', 'cancelled'),
+        'rescheduled': ('cancelled',),
+        'completed': (),
+        'cancelled': (),
+        'no_show': (),
+    }
+    # Campos de ciclo de vida: guardarlos solos no revalida horario ni solapamiento (ver save)
+    LIFECYCLE_FIELDS = frozenset({
+        'status', 'updated_at', 'cancelled_at', 'cancelled_by',
+        'cancellation_reason', 'reminder_sent', 'confirmation_sent'
+    })
+    # Campos necesarios para calcular disponibilidad (ver schedule.services)
+    AVAILABILITY_FIELDS = ('id', 'professional', 'start_datetime', 'end_datetime', 'status')
     status = models.CharField(
         max_length=20, 
         choices=STATUS_CHOICES, 
@@ -131,30 +152,60 @@ class Appointment(models.Model):
             if abs(calculated_duration - self.duration_minutes) > 1:  # 1 minuto de tolerancia
                 raise ValidationError("La duración no coincide con las horas de inicio y fin")
         
+        # Importar aquí para evitar import circular
+        from .validation import AppointmentValidationContext
+        
+        # Reutilizar el contexto precargado por el serializer o la vista (válido para una sola validación)
+        validation_context = self.__dict__.pop('_validation_context', None)
+        if self.professional_id and (validation_context is None or not validation_context.matches(self)):
+            validation_context = AppointmentValidationContext.for_appointment(self)
+        
         # Validar que el profesional pueda realizar el servicio (solo si el servicio existe)
-        if self.professional and self.service:
-            if not self.service.professionals.filter(id=self.professional.id).exists():
+        if self.professional_id and self.service_id:
+            if not validation_context.can_perform_service:
                 raise ValidationError("El profesional seleccionado no puede realizar este servicio")
         
         # NUEVA VALIDACIÓN: Verificar disponibilidad según horario del profesional
-        if self.professional and self.start_datetime and self.service:
-            is_available, reason = self._validate_professional_availability()
+        if self.professional_id and self.start_datetime and self.service_id:
+            is_available, reason = self._validate_professional_availability(validation_context)
             if not is_available:
                 raise ValidationError(f"Horario no disponible: {reason}")
         
         # Validar que no haya solapamiento con otras citas del mismo profesional
-        if self.professional and self.start_datetime and self.end_datetime:
-            overlapping = Appointment.objects.filter(
-                professional=self.professional,
-                start_datetime__lt=self.end_datetime,
-                end_datetime__gt=self.start_datetime,
-                status__in=['pending', 'confirmed', 'checked_in', 'in_progress']
-            ).exclude(id=self.id)
-            
-            if overlapping.exists():
+        if self.professional_id and self.start_datetime and self.end_datetime:
+            if validation_context.has_overlap(self.start_datetime, self.end_datetime, exclude_appointment_id=self.id):
                 raise ValidationError("El profesional ya tiene una cita en este horario")
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Estado guardado: origen de la transición al validar cambios de estado
+        instance._loaded_status = instance.__dict__.get('status')
+        return instance
+    
+    def clean_status_transition(self):
+        """
+        Validar el cambio de estado contra STATUS_TRANSITIONS
+        """
+        if self.status not in self.STATUS_TRANSITIONS:
+            raise ValidationError(f"Estado inválido: {self.status}")
+        
+        previous_status = getattr(self, '_loaded_status', None)
+        if previous_status and previous_status != self.status:
+            if self.status not in self.STATUS_TRANSITIONS.get(previous_status, ()):
+                raise ValidationError(
+                    f"No se puede cambiar el estado de '{previous_status}' a '{self.status}'"
+                )
+    
     def save(self, *args, **kwargs):
+        # Cambios de ciclo de vida (confirmar, check-in, cancelar...): solo se valida la transición
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and not self._state.adding and set(update_fields) <= self.LIFECYCLE_FIELDS:
+            self.clean_status_transition()
+            super().save(*args, **kwargs)
+            self._loaded_status = self.status
+            return
+        
         # Calcular end_datetime si no está definido
         if not self.end_datetime and self.start_datetime and self.duration_minutes:
             self.end_datetime = self.start_datetime + timedelta(minutes=self.duration_minutes)
@@ -169,12 +220,28 @@ class Appointment(models.Model):
         
         # Validar antes de guardar
         try:
-            self.full_clean()
+            self.full_clean(exclude=self._get_prevalidated_fields())
         except ValidationError as e:
             # Re-raise validation errors for proper handling
             raise e
         
         super().save(*args, **kwargs)
+        self._loaded_status = self.status
+    
+    def _get_prevalidated_fields(self):
+        """
+        Campos que full_clean no necesita consultar en la base de datos
+        
+        El id se genera con uuid4 (la unicidad la garantiza la base de datos) y
+        las claves foráneas cuyo objeto relacionado ya fue cargado existen.
+        """
+        fields = ['id']
+        for field in self._meta.concrete_fields:
+            if field.is_relation and field.is_cached(self):
+                related = field.get_cached_value(self)
+                if related is not None and not related._state.adding and related.pk == getattr(self, field.attname):
+                    fields.append(field.name)
+        return fields
     
     @property
     def duration_hours(self):
@@ -269,7 +336,7 @@ class Appointment(models.Model):
             self.status = 'no_show'
             self.save(update_fields=['status', 'updated_at'])
     
-    def _validate_professional_availability(self):
+    def _validate_professional_availability(self, validation_context=None):
         """
         Validar disponibilidad del profesional según su horario configurado
         
@@ -277,18 +344,17 @@ class Appointment(models.Model):
             Tuple[bool, str]: (is_available, reason)
         """
         # Importar aquí para evitar import circular
-        from schedule.services import AvailabilityCalculationService
+        from .validation import AppointmentValidationContext
+        
+        if validation_context is None:
+            validation_context = AppointmentValidationContext.for_appointment(self)
         
         # Si no tiene horario configurado, permitir (backward compatibility)
-        from schedule.models import ProfessionalSchedule
-        try:
-            professional_schedule = ProfessionalSchedule.objects.get(professional=self.professional)
-        except ProfessionalSchedule.DoesNotExist:
+        if not validation_context.schedule:
             return True, "Sin horario configurado"
         
-        # Usar el servicio de cálculo de disponibilidad
-        availability_service = AvailabilityCalculationService(self.professional)
-        return availability_service.is_available_at_time(self.start_datetime, self.service)
+        # Usar el servicio de cálculo de disponibilidad (ignorando esta misma cita)
+        return validation_context.is_available_at_time(self.start_datetime, exclude_appointment_id=self.id)
 
 
 class AppointmentHistory(models.Model):
@@ -357,6 +423,8 @@ class RecurringAppointment(models.Model):
     # Configuración
     auto_confirm = models.BooleanField(default=False)
     advance_booking_days = models.PositiveIntegerField(default=30)
+    # Última fecha ya materializada: la siguiente generación continúa desde aquí
+    generated_until = models.DateField(null=True, blank=True)
     
     # Auditoría
     created_by = models.ForeignKey(User, on_delete=models.CASCADE)
@@ -370,8 +438,61 @@ class RecurringAppointment(models.Model):
         service_name = self.service.name if self.service else "Servicio eliminado"
         return f"{self.client.full_name} - {service_name} - {self.get_frequency_display()}"
     
-    def generate_next_appointments(self, weeks_ahead=4):
-        """Generar las próximas citas basadas en la recurrencia"""
-        # Implementación del algoritmo de generación automática
-        # TODO: Implementar en la siguiente iteración
-        pass
\ No newline at end of file
+    def get_occurrence_dates(self, start_date, end_date):
+        """
+        Fechas de la recurrencia dentro de [start_date, end_date]
+        
+        La primera ocurrencia es start_date (o el primer preferred_day_of_week
+        desde start_date); las mensuales repiten su día del mes, ajustado al
+        último día en meses más cortos.
+        """
+        first_date = self.start_date
+        if self.preferred_day_of_week is not None:
+            first_date += timedelta(days=(self.preferred_day_of_week - first_date.weekday()) % 7)
+        
+        start_date = max(start_date, first_date)
+        if self.end_date:
+            end_date = min(end_date, self.end_date)
+        if start_date > end_date:
+            return []
+        
+        if self.frequency == 'monthly':
+            dates = []
+            months = (start_date.year - first_date.year) * 12 + start_date.month - first_date.month
+            while True:
+                year, month = divmod(first_date.month - 1 + months, 12)
+                year += first_date.year
+                day = min(first_date.day, calendar.monthrange(year, month + 1)[1])
+                occurrence = date(year, month + 1, day)
+                if occurrence > end_date:
+                    return dates
+                if occurrence >= start_date:
+                    dates.append(occurrence)
+                months += 1
+        
+        interval = {'weekly': 7, 'biweekly': 14}.get(self.frequency, max(self.interval_days, 1))
+        # Saltar directamente a la primera ocurrencia del rango
+        offset = -(-(start_date - first_date).days // interval) * interval
+        return [
+            first_date + timedelta(days=days)
+            for days in range(offset, (end_date - first_date).days + 1, interval)
+        ]
+    
+    def generate_next_appointments(self, weeks_ahead=None, changed_by=None):
+        """
+        Generar las próximas citas basadas en la recurrencia
+        
+        Args:
+            weeks_ahead: Semanas a generar (por defecto advance_booking_days)
+            changed_by: Usuario del historial (por defecto quien creó la recurrencia)
+            
+        Returns:
+            Resultado de RecurringAppointmentGenerationService.generate
+        """
+        # Importar aquí para evitar import circular
+        from .services import RecurringAppointmentGenerationService
+        
+        horizon_days = weeks_ahead * 7 if weeks_ahead else None
+        return RecurringAppointmentGenerationService(changed_by=changed_by).generate(
+            [self], horizon_days=horizon_days
+        )
\ No newline at end of file
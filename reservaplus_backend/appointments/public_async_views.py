@@ -0,0 +1,178 @@
+# appointments/public_async_views.py
+
+import threading
+from collections import defaultdict
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Optional
+from django.conf import settings
+from django.http import JsonResponse
+from django.views import View
+from organizations.models import Organization, Professional, Service
+from schedule.budget import ComputeBudget, acompute_with_budget
+from schedule.parallel import get_process_pool
+from schedule.services import MultiProfessionalAvailabilityService
+from .public_views import (
+    add_availability_paging,
+    build_compact_availability_payload,
+    build_public_availability_payload,
+    build_public_organization_payload,
+    get_public_availability_window,
+    serialize_public_service
+)
+
+
+# Tareas de cálculo de slots simultáneas por proceso del servidor
+DEFAULT_PUBLIC_AVAILABILITY_WORKERS = 4
+
+_thread_executor: Optional[ThreadPoolExecutor] = None
+_thread_executor_lock = threading.Lock()
+
+
+def get_availability_executor() -> Executor:
+    """
+    Executor acotado para el cálculo de slots de las vistas asíncronas
+
+    PUBLIC_AVAILABILITY_EXECUTOR='process' usa el pool de procesos de
+    schedule.parallel; por defecto, un pool de hilos compartido.
+    """
+    global _thread_executor
+    workers = getattr(settings, 'PUBLIC_AVAILABILITY_WORKERS', DEFAULT_PUBLIC_AVAILABILITY_WORKERS)
+    if getattr(settings, 'PUBLIC_AVAILABILITY_EXECUTOR', 'thread') == 'process':
+        return get_process_pool(workers)
+    with _thread_executor_lock:
+        if _thread_executor is None:
+            _thread_executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='public-availability')
+        return _thread_executor
+
+
+class AsyncPublicOrganizationDetailView(View):
+    """
+    Versión asíncrona de PublicOrganizationDetailView (misma respuesta)
+
+    Los profesionales de cada servicio se obtienen de la tabla intermedia en
+    una sola consulta, en lugar de una consulta por servicio.
+    """
+
+    async def get(self, request, org_slug):
+        try:
+            organization = await Organization.objects.aget(
+                slug=org_slug,
+                is_active=True
+            )
+        except Organization.DoesNotExist:
+            return JsonResponse({'error': 'Organización no encontrada'}, status=404)
+
+        # Profesionales activos que aceptan reservas
+        professionals = [
+            professional
+            async for professional in Professional.objects.filter(
+                organization=organization,
+                is_active=True,
+                schedule__accepts_bookings=True,
+                schedule__is_active=True
+            ).order_by('name')
+        ]
+        professionals_by_id = {professional.id: professional for professional in professionals}
+
+        services = [
+            service
+            async for service in Service.objects.filter(
+                organization=organization,
+                is_active=True
+            ).order_by('category', 'name')
+        ]
+        professional_ids_by_service = defaultdict(set)
+        async for service_id, professional_id in Service.professionals.through.objects.filter(
+            service_id__in=[service.id for service in services],
+            professional_id__in=professionals_by_id.keys()
+        ).values_list('service_id', 'professional_id'):
+            professional_ids_by_service[service_id].add(professional_id)
+
+        # Agrupar servicios por categoría
+        services_by_category = {}
+        for service in services:
+            category = service.category or 'General'
+            services_by_category.setdefault(category, []).append(serialize_public_service(
+                service,
+                [
+                    professional for professional in professionals
+                    if professional.id in professional_ids_by_service[service.id]
+                ]
+            ))
+
+        return JsonResponse(build_public_organization_payload(organization, professionals, services_by_category))
+
+
+class AsyncPublicAvailabilityView(View):
+    """
+    Versión asíncrona de PublicAvailabilityView (mismos parámetros y respuesta)
+
+    Los datos se cargan con el ORM asíncrono y el cálculo de slots de cada
+    profesional se reparte en un executor acotado (ver get_availability_executor),
+    por lo que una organización lenta no bloquea el proceso del servidor.
+    """
+
+    async def get(self, request, org_slug):
+        try:
+            organization = await Organization.objects.aget(
+                slug=org_slug,
+                is_active=True
+            )
+        except Organization.DoesNotExist:
+            return JsonResponse({'error': 'Organización no encontrada'}, status=404)
+
+        service_id = request.GET.get('service_id')
+        professional_id = request.GET.get('professional_id')
+
+        if not service_id:
+            return JsonResponse({'error': 'service_id es requerido'}, status=400)
+
+        try:
+            service = await Service.objects.aget(
+                id=service_id,
+                organization=organization,
+                is_active=True
+            )
+        except Service.DoesNotExist:
+            return JsonResponse({'error': 'Servicio no encontrado'}, status=404)
+
+        professional_ids = [professional_id] if professional_id else None
+        try:
+            start_date, page_end, requested_end = get_public_availability_window(
+                request.GET,
+                service_id,
+                professional_id,
+                await MultiProfessionalAvailabilityService.aget_booking_horizon(service, professional_ids)
+            )
+        except ValueError as error:
+            return JsonResponse({'error': str(error)}, status=400)
+
+        executor = get_availability_executor()
+
+        async def compute(chunk_start, chunk_end):
+            return await MultiProfessionalAvailabilityService.aget_available_slots_for_service_range(
+                service, chunk_start, chunk_end, professional_ids, executor=executor
+            )
+
+        availability_range, computed_until = await acompute_with_budget(
+            compute, start_date, page_end, ComputeBudget.from_settings()
+        )
+        days_ahead = (computed_until - start_date).days + 1
+
+        if request.GET.get('format') == 'compact':
+            professionals = [
+                professional
+                async for professional in Professional.objects.filter(
+                    id__in=availability_range.keys()
+                ).select_related('schedule')
+            ]
+            payload = build_compact_availability_payload(
+                org_slug, service, professional_id, start_date, days_ahead, availability_range, professionals
+            )
+        else:
+            payload = build_public_availability_payload(
+                org_slug, service, professional_id, start_date, days_ahead, availability_range
+            )
+        return JsonResponse(add_availability_paging(
+            payload, service_id, professional_id, computed_until, page_end, requested_end
+        ))
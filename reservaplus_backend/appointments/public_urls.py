@@ -1,14 +1,23 @@
 # appointments/public_urls.py
 
+from django.conf import settings
 from django.urls import path
-from . import public_views, client_auth
+from . import public_async_views, public_views, client_auth
+
+# Con ASGI, la información y disponibilidad públicas se sirven con las vistas asíncronas
+if getattr(settings, 'PUBLIC_ASYNC_VIEWS', False):
+    organization_detail_view = public_async_views.AsyncPublicOrganizationDetailView.as_view()
+    availability_view = public_async_views.AsyncPublicAvailabilityView.as_view()
+else:
+    organization_detail_view = public_views.PublicOrganizationDetailView.as_view()
+    availability_view = public_views.PublicAvailabilityView.as_view()
 
 urlpatterns = [
     # Información pública de la organización
-    path('org/<str:org_slug>/', public_views.PublicOrganizationDetailView.as_view(), name='public-organization-detail'),
+    path('org/<str:org_slug>/', organization_detail_view, name='public-organization-detail'),
     
     # Disponibilidad pública
-    path('org/<str:org_slug>/availability/', public_views.PublicAvailabilityView.as_view(), name='public-availability'),
+    path('org/<str:org_slug>/availability/', availability_view, name='public-availability'),
     
     # Booking público
     path('org/<str:org_slug>/book/', public_views.PublicBookingView.as_view(), name='public-booking'),
@@ -2,18 +2,105 @@
 
 from datetime import datetime, timedelta
 from django.utils import timezone
-from django.db import transaction
 from django.core.exceptions import ValidationError
 from django.conf import settings
 from rest_framework import status
+from rest_framework.negotiation import DefaultContentNegotiation
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny
 from rest_framework.decorators import permission_classes
 from organizations.models import Organization, Professional, Service, Client
+from appointments.booking import AppointmentConflictError, book_appointment, booking_transaction
 from appointments.models import Appointment
+from appointments.validation import AppointmentValidationContext
 from users.models import User
-from schedule.services import AvailabilityCalculationService, MultiProfessionalAvailabilityService
+from schedule.services import MultiProfessionalAvailabilityService
+from schedule.budget import (
+    ComputeBudget,
+    compute_with_budget,
+    decode_availability_cursor,
+    encode_availability_cursor,
+    get_public_max_days
+)
+from schedule.slots import encode_compact_slots
+
+
+class CompactFormatNegotiation(DefaultContentNegotiation):
+    """
+    Permite ?format=compact: selecciona la representación compacta de la
+    vista (en JSON) en lugar de buscar un renderer con ese formato
+    """
+    
+    def select_renderer(self, request, renderers, format_suffix=None):
+        if request.query_params.get(self.settings.URL_FORMAT_OVERRIDE) == 'compact':
+            format_suffix = 'json'
+        return super().select_renderer(request, renderers, format_suffix)
+
+
+def serialize_public_service(service, professionals):
+    """
+    Datos públicos de un servicio con los profesionales que lo realizan
+    """
+    return {
+        'id': str(service.id),
+        'name': service.name,
+        'description': service.description,
+        'duration_minutes': service.total_duration_minutes,
+        'price': float(service.price),
+        'category': service.category,
+        'professionals': [
+            {
+                'id': str(prof.id),
+                'name': prof.name,
+                'specialty': prof.specialty
+            }
+            for prof in professionals
+        ]
+    }
+
+
+def build_public_organization_payload(organization, professionals, services_by_category):
+    """
+    Respuesta pública de una organización (compartida por las vistas síncrona y asíncrona)
+    """
+    return {
+        'organization': {
+            'id': str(organization.id),
+            'name': organization.name,
+            'slug': organization.slug,
+            'description': organization.description,
+            'industry': organization.get_industry_template_display(),
+            'email': organization.email,
+            'phone': organization.phone,
+            'website': organization.website,
+            'address': organization.address,
+            'city': organization.city,
+            'country': organization.country,
+            'logo': organization.logo,
+            'cover_image': organization.cover_image,
+            'gallery_images': organization.gallery_images,
+            'rating': float(organization.rating),
+            'total_reviews': organization.total_reviews,
+            'is_featured': organization.is_featured
+        },
+        'professionals': [
+            {
+                'id': str(prof.id),
+                'name': prof.name,
+                'specialty': prof.specialty,
+                'bio': prof.bio,
+                'accepts_walk_ins': prof.accepts_walk_ins,
+                'color_code': prof.color_code
+            }
+            for prof in professionals
+        ],
+        'services_by_category': services_by_category,
+        'booking_settings': {
+            'terminology': organization.terminology,
+            'business_rules': organization.business_rules
+        }
+    }
 
 
 class PublicOrganizationDetailView(APIView):
@@ -58,64 +145,192 @@ class PublicOrganizationDetailView(APIView):
             if category not in services_by_category:
                 services_by_category[category] = []
             
-            services_by_category[category].append({
-                'id': str(service.id),
-                'name': service.name,
-                'description': service.description,
-                'duration_minutes': service.total_duration_minutes,
-                'price': float(service.price),
-                'category': service.category,
-                'professionals': [
-                    {
-                        'id': str(prof.id),
-                        'name': prof.name,
-                        'specialty': prof.specialty
-                    }
-                    for prof in service.professionals.filter(
-                        is_active=True,
-                        schedule__accepts_bookings=True,
-                        schedule__is_active=True
-                    )
-                ]
-            })
+            services_by_category[category].append(serialize_public_service(
+                service,
+                service.professionals.filter(
+                    is_active=True,
+                    schedule__accepts_bookings=True,
+                    schedule__is_active=True
+                )
+            ))
         
-        return Response({
-            'organization': {
-                'id': str(organization.id),
-                'name': organization.name,
-                'slug': organization.slug,
-                'description': organization.description,
-                'industry': organization.get_industry_template_display(),
-                'email': organization.email,
-                'phone': organization.phone,
-                'website': organization.website,
-                'address': organization.address,
-                'city': organization.city,
-                'country': organization.country,
-                'logo': organization.logo,
-                'cover_image': organization.cover_image,
-                'gallery_images': organization.gallery_images,
-                'rating': float(organization.rating),
-                'total_reviews': organization.total_reviews,
-                'is_featured': organization.is_featured
-            },
-            'professionals': [
+        return Response(build_public_organization_payload(organization, professionals, services_by_category))
+
+
+def get_public_start_date(date_str):
+    """
+    Fecha de inicio del calendario público (hoy si no se indica o ya pasó)
+    
+    Raises:
+        ValueError: Si la fecha no tiene formato YYYY-MM-DD
+    """
+    today = timezone.now().date()
+    start_date = datetime.strptime(date_str, '%Y-%m-%d').date() if date_str else today
+    return max(start_date, today)
+
+
+def get_availability_cursor_scope(service_id, professional_id):
+    return f'public:{service_id}:{professional_id or ""}'
+
+
+def get_public_availability_window(params, service_id, professional_id, horizon):
+    """
+    Días a calcular en una petición pública
+    
+    Desde date (o el día indicado por cursor) hasta days_ahead días, sin pasar
+    el horizonte de reserva (max_booking_advance) y con páginas de a lo más
+    PUBLIC_AVAILABILITY_MAX_DAYS días.
+    
+    Returns:
+        Tupla (inicio, fin de la página, fin del rango pedido)
+    
+    Raises:
+        ValueError: Con el mensaje de error para el cliente
+    """
+    cursor = params.get('cursor')
+    if cursor:
+        try:
+            start_date, requested_end = decode_availability_cursor(
+                cursor, get_availability_cursor_scope(service_id, professional_id)
+            )
+        except ValueError:
+            raise ValueError('Cursor inválido')
+        start_date = max(start_date, timezone.now().date())
+    else:
+        try:
+            start_date = get_public_start_date(params.get('date'))
+        except ValueError:
+            raise ValueError('Formato de fecha inválido. Use YYYY-MM-DD')
+        try:
+            days_ahead = int(params.get('days_ahead', 7))
+        except ValueError:
+            raise ValueError('days_ahead debe ser un número')
+        requested_end = start_date + timedelta(days=max(days_ahead, 1) - 1)
+    
+    if horizon:
+        requested_end = min(requested_end, horizon)
+    page_end = min(requested_end, start_date + timedelta(days=get_public_max_days() - 1))
+    return start_date, page_end, requested_end
+
+
+def add_availability_paging(payload, service_id, professional_id, computed_until, page_end, requested_end):
+    """
+    Indicar si la página quedó incompleta por el presupuesto y el cursor para continuar
+    """
+    payload['partial'] = computed_until < page_end
+    payload['next_cursor'] = encode_availability_cursor(
+        get_availability_cursor_scope(service_id, professional_id),
+        computed_until + timedelta(days=1),
+        requested_end
+    ) if computed_until < requested_end else None
+    return payload
+
+
+def build_public_availability_payload(org_slug, service, professional_id, start_date, days_ahead, availability_range):
+    """
+    Respuesta pública de disponibilidad: slots libres de todos los profesionales agrupados por día
+    """
+    availability_by_date = {}
+    current_date = start_date
+    
+    for day in range(days_ahead):
+        date_key = current_date.isoformat()
+        
+        # Formatear slots para la respuesta
+        formatted_slots = []
+        for prof_id, slots_by_date in availability_range.items():
+            # Solo slots disponibles: no se calculan motivos de conflicto
+            available_slots = slots_by_date.get(current_date, [])
+            formatted_slots.extend([
                 {
-                    'id': str(prof.id),
-                    'name': prof.name,
-                    'specialty': prof.specialty,
-                    'bio': prof.bio,
-                    'accepts_walk_ins': prof.accepts_walk_ins,
-                    'color_code': prof.color_code
+                    'start_datetime': slot['start_datetime'].isoformat(),
+                    'end_datetime': slot['end_datetime'].isoformat(),
+                    'start_time': slot['start_time'].strftime('%H:%M'),
+                    'end_time': slot['end_time'].strftime('%H:%M'),
+                    'professional_id': slot['professional_id'],
+                    'professional_name': slot['professional_name'],
+                    'duration_minutes': slot['duration_minutes']
                 }
-                for prof in professionals
-            ],
-            'services_by_category': services_by_category,
-            'booking_settings': {
-                'terminology': organization.terminology,
-                'business_rules': organization.business_rules
-            }
-        })
+                for slot in available_slots
+            ])
+        
+        # Ordenar por hora
+        formatted_slots.sort(key=lambda x: x['start_time'])
+        
+        availability_by_date[date_key] = {
+            'date': date_key,
+            'weekday': current_date.strftime('%A'),
+            'total_slots': len(formatted_slots),
+            'slots': formatted_slots
+        }
+        
+        current_date += timedelta(days=1)
+    
+    return {
+        'organization_slug': org_slug,
+        'service': {
+            'id': str(service.id),
+            'name': service.name,
+            'duration_minutes': service.total_duration_minutes,
+            'price': float(service.price)
+        },
+        'professional_filter': professional_id,
+        'date_range': {
+            'start_date': start_date.isoformat(),
+            'end_date': (start_date + timedelta(days=days_ahead-1)).isoformat(),
+            'days_ahead': days_ahead
+        },
+        'availability': availability_by_date
+    }
+
+
+def build_compact_availability_payload(
+    org_slug, service, professional_id, start_date, days_ahead, availability_range, professionals
+):
+    """
+    Respuesta compacta: metadatos de cada profesional una sola vez y, por
+    día y profesional, hora base, paso y cadena de bits de slots libres
+    (ver schedule.slots.encode_compact_slots)
+    
+    Args:
+        professionals: Profesionales con su horario precargado
+    """
+    professionals_metadata = {}
+    for professional in professionals:
+        schedule = getattr(professional, 'schedule', None)
+        professionals_metadata[str(professional.id)] = {
+            'name': professional.name,
+            'timezone': schedule.timezone if schedule else settings.TIME_ZONE
+        }
+    
+    days = {}
+    for day in range(days_ahead):
+        current_date = start_date + timedelta(days=day)
+        encoded_day = {}
+        for prof_id, slots_by_date in availability_range.items():
+            encoded = encode_compact_slots(slots_by_date.get(current_date, []))
+            if encoded:
+                encoded_day[prof_id] = encoded
+        days[current_date.isoformat()] = encoded_day
+    
+    return {
+        'organization_slug': org_slug,
+        'format': 'compact',
+        'service': {
+            'id': str(service.id),
+            'name': service.name,
+            'duration_minutes': service.total_duration_minutes,
+            'price': float(service.price)
+        },
+        'professional_filter': professional_id,
+        'date_range': {
+            'start_date': start_date.isoformat(),
+            'end_date': (start_date + timedelta(days=days_ahead-1)).isoformat(),
+            'days_ahead': days_ahead
+        },
+        'professionals': professionals_metadata,
+        'days': days
+    }
 
 
 class PublicAvailabilityView(APIView):
@@ -123,6 +338,7 @@ class PublicAvailabilityView(APIView):
     Vista pública para obtener disponibilidad de citas
     """
     permission_classes = [AllowAny]
+    content_negotiation_class = CompactFormatNegotiation
     
     def get(self, request, org_slug):
         """
@@ -132,7 +348,14 @@ class PublicAvailabilityView(APIView):
         - service_id: ID del servicio (requerido)
         - professional_id: ID del profesional (opcional)
         - date: Fecha en formato YYYY-MM-DD (opcional, default: hoy)
-        - days_ahead: Días hacia adelante (opcional, default: 7)
+        - days_ahead: Días hacia adelante (opcional, default: 7; acotado por
+          max_booking_advance y PUBLIC_AVAILABILITY_MAX_DAYS por página)
+        - cursor: Token next_cursor de la respuesta anterior para continuar (opcional)
+        - format: 'compact' para recibir, por profesional y día, hora base,
+          paso y cadena de bits de slots libres (opcional)
+        
+        Si el presupuesto de cálculo se agota, la respuesta es parcial
+        (partial=True) y next_cursor permite continuar desde el día siguiente.
         """
         try:
             organization = Organization.objects.get(
@@ -147,8 +370,6 @@ class PublicAvailabilityView(APIView):
         
         service_id = request.query_params.get('service_id')
         professional_id = request.query_params.get('professional_id')
-        date_str = request.query_params.get('date')
-        days_ahead = int(request.query_params.get('days_ahead', 7))
         
         if not service_id:
             return Response(
@@ -169,82 +390,47 @@ class PublicAvailabilityView(APIView):
                 status=status.HTTP_404_NOT_FOUND
             )
         
-        # Determinar fecha de inicio
-        if date_str:
-            try:
-                start_date = datetime.strptime(date_str, '%Y-%m-%d').date()
-            except ValueError:
-                return Response(
-                    {'error': 'Formato de fecha inválido. Use YYYY-MM-DD'},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-        else:
-            start_date = timezone.now().date()
-        
-        # Verificar que la fecha no sea en el pasado
-        if start_date < timezone.now().date():
-            start_date = timezone.now().date()
-        
         # Determinar profesionales
         professional_ids = [professional_id] if professional_id else None
         
-        # Calcular disponibilidad por días
-        availability_by_date = {}
-        current_date = start_date
+        # Días a calcular: no en el pasado, dentro del horizonte de reserva y en páginas acotadas
+        try:
+            start_date, page_end, requested_end = get_public_availability_window(
+                request.query_params,
+                service_id,
+                professional_id,
+                MultiProfessionalAvailabilityService.get_booking_horizon(service, professional_ids)
+            )
+        except ValueError as error:
+            return Response(
+                {'error': str(error)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
-        for day in range(days_ahead):
-            date_key = current_date.isoformat()
-            
-            # Obtener disponibilidad para el día
-            daily_availability = MultiProfessionalAvailabilityService.get_available_slots_for_service(
-                service, current_date, professional_ids
+        def compute(chunk_start, chunk_end):
+            # Misma ruta que la vista asíncrona: lee y escribe la caché versionada por día (la que precalienta el warm-up)
+            return MultiProfessionalAvailabilityService.get_available_slots_for_service_range(
+                service, chunk_start, chunk_end, professional_ids, available_only=True
             )
-            
-            # Formatear slots para la respuesta
-            formatted_slots = []
-            for prof_id, slots in daily_availability.items():
-                available_slots = [slot for slot in slots if slot['is_available']]
-                formatted_slots.extend([
-                    {
-                        'start_datetime': slot['start_datetime'].isoformat(),
-                        'end_datetime': slot['end_datetime'].isoformat(),
-                        'start_time': slot['start_time'].strftime('%H:%M'),
-                        'end_time': slot['end_time'].strftime('%H:%M'),
-                        'professional_id': slot['professional_id'],
-                        'professional_name': slot['professional_name'],
-                        'duration_minutes': slot['duration_minutes']
-                    }
-                    for slot in available_slots
-                ])
-            
-            # Ordenar por hora
-            formatted_slots.sort(key=lambda x: x['start_time'])
-            
-            availability_by_date[date_key] = {
-                'date': date_key,
-                'weekday': current_date.strftime('%A'),
-                'total_slots': len(formatted_slots),
-                'slots': formatted_slots
-            }
-            
-            current_date += timedelta(days=1)
         
-        return Response({
-            'organization_slug': org_slug,
-            'service': {
-                'id': str(service.id),
-                'name': service.name,
-                'duration_minutes': service.total_duration_minutes,
-                'price': float(service.price)
-            },
-            'professional_filter': professional_id,
-            'date_range': {
-                'start_date': start_date.isoformat(),
-                'end_date': (start_date + timedelta(days=days_ahead-1)).isoformat(),
-                'days_ahead': days_ahead
-            },
-            'availability': availability_by_date
-        })
+        # Calcular por bloques de días hasta agotar el presupuesto de la petición
+        availability_range, computed_until = compute_with_budget(
+            compute, start_date, page_end, ComputeBudget.from_settings()
+        )
+        days_ahead = (computed_until - start_date).days + 1
+        
+        if request.query_params.get('format') == 'compact':
+            payload = build_compact_availability_payload(
+                org_slug, service, professional_id, start_date, days_ahead, availability_range,
+                Professional.objects.filter(id__in=availability_range.keys()).select_related('schedule')
+            )
+        else:
+            payload = build_public_availability_payload(
+                org_slug, service, professional_id, start_date, days_ahead, availability_range
+            )
+        return Response(add_availability_paging(
+            payload, service_id, professional_id, computed_until, page_end, requested_end
+        ))
 
 
 class PublicBookingView(APIView):
@@ -359,20 +545,6 @@ class PublicBookingView(APIView):
             )
             print(f"DEBUG: Found professional: {professional.name}")
             
-            # Verificar que el profesional puede realizar el servicio
-            print(f"DEBUG: Checking if professional can perform service...")
-            can_perform = service.professionals.filter(id=professional.id).exists()
-            print(f"DEBUG: Professional can perform service: {can_perform}")
-            
-            if not can_perform:
-                print(f"DEBUG: Professional {professional.name} cannot perform service {service.name}")
-                service_professionals = service.professionals.all()
-                print(f"DEBUG: Service professionals: {[p.name for p in service_professionals]}")
-                return Response(
-                    {'error': 'El profesional no puede realizar este servicio'},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            
             # Parsear fecha
             print(f"DEBUG: Parsing datetime: {start_datetime_str}")
             try:
@@ -385,11 +557,25 @@ class PublicBookingView(APIView):
                     status=status.HTTP_400_BAD_REQUEST
                 )
             
+            # Profesional, horario, capacidad y citas del intervalo en un solo paso (se reutiliza al guardar)
+            validation_context = AppointmentValidationContext(professional, service, start_datetime)
+            
+            # Verificar que el profesional puede realizar el servicio
+            print(f"DEBUG: Checking if professional can perform service...")
+            can_perform = validation_context.can_perform_service
+            print(f"DEBUG: Professional can perform service: {can_perform}")
+            
+            if not can_perform:
+                print(f"DEBUG: Professional {professional.name} cannot perform service {service.name}")
+                return Response(
+                    {'error': 'El profesional no puede realizar este servicio'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            
             # Verificar disponibilidad
             print(f"DEBUG: Checking availability for {start_datetime}")
             try:
-                availability_service = AvailabilityCalculationService(professional)
-                is_available, reason = availability_service.is_available_at_time(start_datetime, service)
+                is_available, reason = validation_context.is_available_at_time(start_datetime)
                 print(f"DEBUG: Availability check result: {is_available}, reason: {reason}")
             except Exception as e:
                 print(f"DEBUG: Error checking availability: {str(e)}")
@@ -407,7 +593,8 @@ class PublicBookingView(APIView):
                     status=status.HTTP_400_BAD_REQUEST
                 )
             
-            with transaction.atomic():
+            # Agenda del profesional bloqueada durante toda la reserva
+            with booking_transaction(professional.id):
                 print(f"DEBUG: Starting transaction for booking creation")
                 
                 # Crear o obtener cliente
@@ -524,9 +711,16 @@ class PublicBookingView(APIView):
                 
                 # Save the appointment with validation
                 print(f"DEBUG: Saving appointment...")
+                appointment._validation_context = validation_context
                 try:
-                    appointment.save()
+                    book_appointment(appointment)
                     print(f"DEBUG: Successfully created appointment: {appointment.id}")
+                except AppointmentConflictError as conflict:
+                    print(f"DEBUG: Appointment conflict: {str(conflict)}")
+                    return Response(
+                        {'error': conflict.messages[0]},
+                        status=status.HTTP_409_CONFLICT
+                    )
                 except ValidationError as ve:
                     print(f"DEBUG: Validation error saving appointment: {str(ve)}")
                     return Response(
@@ -2,7 +2,10 @@
 
 from rest_framework import serializers
 from django.utils import timezone
+from .booking import book_appointment
 from .models import Appointment, AppointmentHistory, RecurringAppointment
+from .services import BulkAppointmentCreationService, BulkStatusTransitionService
+from .validation import AppointmentValidationContext
 from organizations.models import Professional, Service, Client
 
 
@@ -57,7 +60,11 @@ class AppointmentSerializer(serializers.ModelSerializer):
         professional = data.get('professional')
         service = data.get('service')
         if professional and service:
-            if not service.professionals.filter(id=professional.id).exists():
+            # El mismo contexto (profesional, horario y citas) se reutiliza al guardar la cita
+            self._validation_context = AppointmentValidationContext(
+                professional, service, data.get('start_datetime')
+            )
+            if not self._validation_context.can_perform_service:
                 raise serializers.ValidationError(
                     "El profesional seleccionado no puede realizar este servicio"
                 )
@@ -86,7 +93,10 @@ class AppointmentSerializer(serializers.ModelSerializer):
         if not validated_data.get('requires_confirmation'):
             validated_data['requires_confirmation'] = business_rules.get('requires_confirmation', False)
         
-        return super().create(validated_data)
+        appointment = Appointment(**validated_data)
+        appointment._validation_context = getattr(self, '_validation_context', None)
+        book_appointment(appointment)
+        return appointment
     
     def to_representation(self, instance):
         """Personalizar la representación de salida"""
@@ -123,6 +133,43 @@ class AppointmentUpdateSerializer(AppointmentSerializer):
         read_only_fields = ['id', 'organization', 'created_at', 'updated_at']
 
 
+class BulkAppointmentItemSerializer(serializers.Serializer):
+    """
+    Cita de un lote: las referencias se resuelven juntas en el servicio de creación masiva
+    """
+    client = serializers.UUIDField()
+    professional = serializers.UUIDField()
+    service = serializers.UUIDField()
+    start_datetime = serializers.DateTimeField()
+    notes = serializers.CharField(required=False, allow_blank=True, default='')
+    is_walk_in = serializers.BooleanField(required=False, default=False)
+
+
+class BulkAppointmentCreateSerializer(serializers.Serializer):
+    """
+    Serializer para crear citas en lote
+    """
+    mode = serializers.ChoiceField(choices=BulkAppointmentCreationService.MODES, default='atomic')
+    appointments = BulkAppointmentItemSerializer(
+        many=True,
+        allow_empty=False,
+        max_length=BulkAppointmentCreationService.MAX_APPOINTMENTS
+    )
+
+
+class BulkStatusTransitionSerializer(serializers.Serializer):
+    """
+    Serializer para cambiar el estado de varias citas
+    """
+    ids = serializers.ListField(
+        child=serializers.UUIDField(),
+        allow_empty=False,
+        max_length=BulkStatusTransitionService.MAX_APPOINTMENTS
+    )
+    status = serializers.ChoiceField(choices=BulkStatusTransitionService.TARGET_STATUSES)
+    reason = serializers.CharField(required=False, allow_blank=True, default='')
+
+
 class AppointmentHistorySerializer(serializers.ModelSerializer):
     """
     Serializer para el historial de citas
@@ -157,9 +204,9 @@ class RecurringAppointmentSerializer(serializers.ModelSerializer):
             'frequency', 'frequency_display', 'interval_days',
             'preferred_time', 'preferred_day_of_week', 'is_active',
             'start_date', 'end_date', 'auto_confirm', 'advance_booking_days',
-            'created_by', 'created_at', 'updated_at'
+            'generated_until', 'created_by', 'created_at', 'updated_at'
         ]
-        read_only_fields = ['id', 'organization', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'organization', 'generated_until', 'created_at', 'updated_at']
     
     def create(self, validated_data):
         """Crear cita recurrente"""
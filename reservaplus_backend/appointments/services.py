@@ -0,0 +1,660 @@
+# appointments/services.py
+
+from collections import Counter, defaultdict
+from functools import partial
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+from organizations.models import Client, Organization, Professional, Service
+from plans.models import OrganizationSubscription
+from users.models import User
+from .models import Appointment, AppointmentHistory, RecurringAppointment
+
+
+def invalidate_appointment_days(appointments: Iterable[Tuple]) -> None:
+    """
+    Invalidar la disponibilidad de los días de citas escritas sin post_save
+
+    bulk_create y update() no emiten señales (ver schedule.signals): se
+    invalida la caché de los días afectados y los AvailabilitySlot
+    materializados se recalculan al confirmar la transacción. Los días se
+    agrupan en la zona horaria del horario de cada profesional.
+
+    Args:
+        appointments: Pares (professional_id, start_datetime)
+    """
+    # Importar aquí para evitar import circular
+    from schedule.cache import get_professional_timezones, invalidate_professional_dates
+    from schedule.utils import refresh_materialized_availability
+
+    appointments = list(appointments)
+    if not appointments:
+        return
+    timezones = get_professional_timezones(professional_id for professional_id, _ in appointments)
+    dates_by_professional = defaultdict(set)
+    for professional_id, start_datetime in appointments:
+        dates_by_professional[professional_id].add(
+            timezone.localtime(start_datetime, timezones[professional_id]).date()
+        )
+    for professional_id, dates in dates_by_professional.items():
+        invalidate_professional_dates(professional_id, dates)
+        transaction.on_commit(partial(refresh_materialized_availability, professional_id, dates=dates))
+
+
+class RecurringAppointmentGenerationService:
+    """
+    Servicio para materializar citas recurrentes en lote
+
+    Expande cada recurrencia activa en su horizonte (advance_booking_days),
+    evalúa todas las ocurrencias de un profesional contra una sola carga de
+    horario compilado y citas (ver schedule.services) y crea las citas y su
+    historial con bulk_create. La generación continúa desde generated_until,
+    por lo que cada ejecución solo procesa los días nuevos del horizonte.
+    Las agendas de los profesionales quedan bloqueadas mientras se valida y
+    crea (ver appointments.booking), igual que en la creación masiva.
+    """
+
+    BATCH_SIZE = 500
+
+    def __init__(self, changed_by: Optional[User] = None, batch_size: Optional[int] = None):
+        self.changed_by = changed_by
+        self.batch_size = batch_size or self.BATCH_SIZE
+
+    def generate(
+        self,
+        recurring_appointments: Iterable[RecurringAppointment],
+        horizon_days: Optional[int] = None
+    ) -> Dict:
+        """
+        Generar las citas pendientes de varias recurrencias
+
+        Args:
+            recurring_appointments: Recurrencias a procesar (se ignoran las inactivas)
+            horizon_days: Días hacia adelante (por defecto advance_booking_days de cada una)
+
+        Returns:
+            Diccionario con las citas creadas, las ocurrencias omitidas con su
+            motivo y el número de recurrencias procesadas
+
+        Raises:
+            AppointmentConflictError: La restricción de solapamiento rechazó el
+                lote (no se crea ninguna cita)
+        """
+        # Importar aquí para evitar import circular
+        from schedule.services import MultiProfessionalAvailabilityService
+        from .booking import AppointmentConflictError, OVERLAP_MESSAGE, is_overlap_violation, lock_professional_schedules
+
+        today = timezone.localdate()
+        windows = {}
+        for recurring in recurring_appointments:
+            if not recurring.is_active:
+                continue
+            start_date = today
+            if recurring.generated_until and recurring.generated_until >= start_date:
+                start_date = recurring.generated_until + timedelta(days=1)
+            days_ahead = horizon_days if horizon_days is not None else recurring.advance_booking_days
+            end_date = today + timedelta(days=days_ahead)
+            if recurring.end_date:
+                end_date = min(end_date, recurring.end_date)
+            if start_date <= end_date:
+                windows[recurring] = (start_date, end_date)
+
+        result = {'created': [], 'skipped': [], 'processed': len(windows)}
+        if not windows:
+            return result
+
+        professionals = {recurring.professional_id: recurring.professional for recurring in windows}
+        with transaction.atomic():
+            # Bloquear antes de cargar las citas: la validación ve las reservas confirmadas y
+            # ninguna reserva concurrente puede solaparse con las citas generadas
+            lock_professional_schedules(professionals.keys())
+            # Una carga de horarios y citas para todos los profesionales (día anterior y posterior incluidos)
+            availability_services = {
+                availability_service.professional.id: availability_service
+                for availability_service in MultiProfessionalAvailabilityService.build_availability_services(
+                    list(professionals.values()),
+                    min(start for start, _ in windows.values()) - timedelta(days=1),
+                    max(end for _, end in windows.values()) + timedelta(days=1),
+                    with_clients=False
+                )
+            }
+            service_professionals = set(
+                Service.professionals.through.objects.filter(
+                    service_id__in={recurring.service_id for recurring in windows},
+                    professional_id__in=professionals.keys()
+                ).values_list('service_id', 'professional_id')
+            )
+
+            # Citas aceptadas en esta ejecución por profesional: evitan que dos recurrencias se solapen
+            booked = defaultdict(list)
+            appointments = []
+            histories = []
+            processed = []
+            for recurring, (start_date, end_date) in windows.items():
+                availability_service = availability_services[recurring.professional_id]
+                schedule = availability_service.schedule
+                if schedule:
+                    # Las fechas fuera de max_booking_advance quedan para una próxima ejecución
+                    max_advance = timezone.now() + timedelta(minutes=schedule.max_booking_advance)
+                    max_advance_date = max_advance.astimezone(availability_service.get_timezone()).date()
+                    end_date = min(end_date, max_advance_date - timedelta(days=1))
+                processed.append((recurring, end_date))
+
+                occurrence_dates = recurring.get_occurrence_dates(start_date, end_date)
+                if not occurrence_dates:
+                    continue
+
+                reason = self._get_recurrence_skip_reason(recurring, service_professionals)
+                if reason:
+                    result['skipped'].extend(
+                        self._skipped(recurring, occurrence_date, None, reason)
+                        for occurrence_date in occurrence_dates
+                    )
+                    continue
+
+                candidates = [
+                    datetime.combine(occurrence_date, recurring.preferred_time)
+                    for occurrence_date in occurrence_dates
+                ]
+                if schedule:
+                    checks = availability_service.is_available_many(candidates, recurring.service)
+                else:
+                    # Sin horario configurado solo se verifica el solapamiento (igual que Appointment.clean)
+                    checks = self._check_overlaps(availability_service, candidates, recurring.service)
+
+                for occurrence_date, check in zip(occurrence_dates, checks):
+                    start_datetime, end_datetime = check['start_datetime'], check['end_datetime']
+                    if check['is_available'] and any(
+                        booked_start < end_datetime and start_datetime < booked_end
+                        for booked_start, booked_end in booked[recurring.professional_id]
+                    ):
+                        check['is_available'] = False
+                        check['reason'] = "Ya hay una cita programada en este horario"
+                    if not check['is_available']:
+                        result['skipped'].append(self._skipped(recurring, occurrence_date, start_datetime, check['reason']))
+                        continue
+
+                    booked[recurring.professional_id].append((start_datetime, end_datetime))
+                    appointment, history = self._build_appointment(recurring, start_datetime, end_datetime)
+                    appointments.append(appointment)
+                    histories.append(history)
+
+            try:
+                with transaction.atomic():
+                    Appointment.objects.bulk_create(appointments, batch_size=self.batch_size)
+            except IntegrityError as error:
+                if is_overlap_violation(error):
+                    raise AppointmentConflictError(OVERLAP_MESSAGE) from error
+                raise
+            AppointmentHistory.objects.bulk_create(histories, batch_size=self.batch_size)
+            for recurring, end_date in processed:
+                recurring.generated_until = max(end_date, recurring.generated_until or end_date)
+            RecurringAppointment.objects.bulk_update(
+                [recurring for recurring, _ in processed], ['generated_until'], batch_size=self.batch_size
+            )
+
+            # Un incremento del contador mensual por organización (igual que la creación masiva)
+            for organization_id, count in Counter(appointment.organization_id for appointment in appointments).items():
+                OrganizationSubscription.objects.filter(organization_id=organization_id).update(
+                    current_month_appointments_count=F('current_month_appointments_count') + count
+                )
+
+            # bulk_create no emite post_save: invalidar la caché y los slots materializados de los días creados
+            invalidate_appointment_days(
+                (appointment.professional_id, appointment.start_datetime) for appointment in appointments
+            )
+
+        result['created'] = appointments
+        return result
+
+    @staticmethod
+    def _get_recurrence_skip_reason(recurring: RecurringAppointment, service_professionals) -> Optional[str]:
+        """
+        Motivo por el que ninguna ocurrencia de la recurrencia puede generarse
+        """
+        if not recurring.service:
+            return "Servicio eliminado"
+        if not recurring.professional.is_active:
+            return "El profesional no está activo"
+        if (recurring.service_id, recurring.professional_id) not in service_professionals:
+            return "El profesional seleccionado no puede realizar este servicio"
+        return None
+
+    @staticmethod
+    def _check_overlaps(availability_service, candidates: List[datetime], service: Service) -> List[Dict]:
+        """
+        Verificar solo el solapamiento con citas existentes
+        """
+        duration = timedelta(minutes=service.total_duration_minutes)
+        checks = []
+        for candidate in candidates:
+            start_datetime = timezone.make_aware(candidate, availability_service.get_timezone())
+            end_datetime = start_datetime + duration
+            is_available = not availability_service.get_interval_index(
+                start_datetime, end_datetime
+            ).overlaps(start_datetime, end_datetime)
+            checks.append({
+                'start_datetime': start_datetime,
+                'end_datetime': end_datetime,
+                'is_available': is_available,
+                'reason': "Disponible" if is_available else "Ya hay una cita programada en este horario"
+            })
+        return checks
+
+    def _build_appointment(self, recurring: RecurringAppointment, start_datetime: datetime, end_datetime: datetime):
+        """
+        Construir (sin guardar) la cita de una ocurrencia y su entrada de historial
+        """
+        service = recurring.service
+        appointment = Appointment(
+            organization_id=recurring.organization_id,
+            professional=recurring.professional,
+            service=service,
+            client=recurring.client,
+            start_datetime=start_datetime,
+            end_datetime=end_datetime,
+            duration_minutes=service.total_duration_minutes,
+            price=service.price,
+            status='confirmed' if recurring.auto_confirm else 'pending',
+            created_by_id=recurring.created_by_id
+        )
+        history = AppointmentHistory(
+            appointment=appointment,
+            action='created',
+            new_values={
+                'start_datetime': start_datetime.isoformat(),
+                'end_datetime': end_datetime.isoformat(),
+                'status': appointment.status,
+                'recurring_appointment': str(recurring.id)
+            },
+            changed_by_id=self.changed_by.id if self.changed_by else recurring.created_by_id,
+            notes='Cita generada desde cita recurrente'
+        )
+        return appointment, history
+
+    @staticmethod
+    def _skipped(recurring: RecurringAppointment, occurrence_date: date, start_datetime, reason: str) -> Dict:
+        return {
+            'recurring_appointment_id': str(recurring.id),
+            'date': occurrence_date.isoformat(),
+            'start_datetime': start_datetime.isoformat() if start_datetime else None,
+            'reason': reason
+        }
+
+
+class BulkAppointmentCreationService:
+    """
+    Servicio para crear un lote de citas (importaciones, walk-ins de la semana)
+
+    Con las agendas de los profesionales bloqueadas (ver appointments.booking),
+    valida todas las citas contra una sola carga de horario compilado y citas
+    por profesional (ver schedule.services), incluidos los solapamientos entre
+    citas del mismo lote. Las citas y su historial se crean con bulk_create y
+    el contador mensual de la suscripción se actualiza una sola vez. En modo
+    'atomic' una cita inválida cancela el lote completo; en modo 'partial' se
+    crean las válidas hasta agotar el límite mensual del plan y se informan
+    las rechazadas.
+    """
+
+    BATCH_SIZE = 500
+    MAX_APPOINTMENTS = 500
+    MODES = ('atomic', 'partial')
+
+    def __init__(self, organization, created_by: User, mode: str = 'atomic', batch_size: Optional[int] = None):
+        self.organization = organization
+        self.created_by = created_by
+        self.mode = mode
+        self.batch_size = batch_size or self.BATCH_SIZE
+
+    def create(self, items: List[Dict]) -> Dict:
+        """
+        Validar y crear las citas del lote
+
+        Args:
+            items: Citas con client, professional y service (ids), start_datetime
+                y opcionalmente notes e is_walk_in
+
+        Returns:
+            Diccionario con las citas creadas y los errores ({'index', 'error'})
+            de las citas rechazadas
+        """
+        # Importar aquí para evitar import circular
+        from schedule.services import MultiProfessionalAvailabilityService
+        from .booking import AppointmentConflictError, OVERLAP_MESSAGE, is_overlap_violation, lock_professional_schedules
+
+        result = {'created': [], 'errors': []}
+        if not items:
+            return result
+
+        professionals = Professional.objects.filter(
+            organization=self.organization, id__in={item['professional'] for item in items}
+        ).select_related('schedule').in_bulk()
+        services = Service.objects.filter(
+            organization=self.organization, id__in={item['service'] for item in items}
+        ).in_bulk()
+        clients = Client.objects.filter(
+            organization=self.organization, id__in={item['client'] for item in items}
+        ).in_bulk()
+        service_professionals = set(
+            Service.professionals.through.objects.filter(
+                service_id__in=services.keys(),
+                professional_id__in=professionals.keys()
+            ).values_list('service_id', 'professional_id')
+        )
+        business_rules = self.organization.business_rules
+        requires_confirmation = business_rules.get('requires_confirmation', False)
+
+        with transaction.atomic():
+            # Bloquear antes de cargar las citas: la validación ve todas las reservas confirmadas
+            lock_professional_schedules(professionals.keys())
+            local_dates = [timezone.localtime(item['start_datetime']).date() for item in items]
+            availability_services = {
+                availability_service.professional.id: availability_service
+                for availability_service in MultiProfessionalAvailabilityService.build_availability_services(
+                    list(professionals.values()),
+                    min(local_dates) - timedelta(days=1),
+                    max(local_dates) + timedelta(days=1),
+                    with_clients=False
+                )
+            }
+
+            # Citas aceptadas del lote por profesional: evitan solapamientos dentro del lote
+            booked = defaultdict(list)
+            accepted_indexes = []
+            appointments = []
+            histories = []
+            now = timezone.now()
+            for index, item in enumerate(items):
+                professional = professionals.get(item['professional'])
+                service = services.get(item['service'])
+                client = clients.get(item['client'])
+                start_datetime = item['start_datetime']
+                end_datetime = start_datetime + timedelta(minutes=service.total_duration_minutes) if service else None
+
+                if professional is None:
+                    error = "Profesional no encontrado"
+                elif service is None:
+                    error = "Servicio no encontrado"
+                elif client is None:
+                    error = "Cliente no encontrado"
+                elif start_datetime < now:
+                    error = "No se pueden crear citas en el pasado"
+                elif (service.id, professional.id) not in service_professionals:
+                    error = "El profesional seleccionado no puede realizar este servicio"
+                else:
+                    error = self._get_availability_error(
+                        availability_services[professional.id], service, start_datetime, end_datetime
+                    )
+                if error is None and any(
+                    booked_start < end_datetime and start_datetime < booked_end
+                    for booked_start, booked_end in booked[professional.id]
+                ):
+                    error = "Se solapa con otra cita del mismo lote"
+
+                if error:
+                    result['errors'].append({'index': index, 'error': error})
+                    continue
+
+                booked[professional.id].append((start_datetime, end_datetime))
+                accepted_indexes.append(index)
+                appointment = Appointment(
+                    organization=self.organization,
+                    professional=professional,
+                    service=service,
+                    client=client,
+                    start_datetime=start_datetime,
+                    end_datetime=end_datetime,
+                    duration_minutes=service.total_duration_minutes,
+                    price=service.price,
+                    status='pending',
+                    notes=item.get('notes', ''),
+                    is_walk_in=item.get('is_walk_in', False),
+                    requires_confirmation=requires_confirmation,
+                    created_by=self.created_by
+                )
+                appointments.append(appointment)
+                histories.append(AppointmentHistory(
+                    appointment=appointment,
+                    action='created',
+                    new_values={
+                        'start_datetime': start_datetime.isoformat(),
+                        'end_datetime': end_datetime.isoformat(),
+                        'status': appointment.status
+                    },
+                    changed_by=self.created_by,
+                    notes='Cita creada en lote'
+                ))
+
+            if not appointments or (result['errors'] and self.mode == 'atomic'):
+                return result
+
+            if self.mode == 'partial':
+                # El límite mensual se aplica solo a las citas válidas (el modo atomic se verifica en la vista)
+                remaining = self._get_remaining_monthly_appointments()
+                if remaining is not None and len(appointments) > remaining:
+                    result['errors'].extend(
+                        {'index': index, 'error': "Se alcanzó el límite de citas mensuales del plan"}
+                        for index in accepted_indexes[remaining:]
+                    )
+                    result['errors'].sort(key=lambda error: error['index'])
+                    appointments = appointments[:remaining]
+                    histories = histories[:remaining]
+                    if not appointments:
+                        return result
+
+            try:
+                with transaction.atomic():
+                    Appointment.objects.bulk_create(appointments, batch_size=self.batch_size)
+            except IntegrityError as error:
+                if is_overlap_violation(error):
+                    raise AppointmentConflictError(OVERLAP_MESSAGE) from error
+                raise
+            AppointmentHistory.objects.bulk_create(histories, batch_size=self.batch_size)
+
+            # Un solo incremento del contador mensual para todo el lote
+            OrganizationSubscription.objects.filter(organization=self.organization).update(
+                current_month_appointments_count=F('current_month_appointments_count') + len(appointments)
+            )
+
+            # bulk_create no emite post_save: invalidar la caché y los slots materializados de los días creados
+            invalidate_appointment_days(
+                (appointment.professional_id, appointment.start_datetime) for appointment in appointments
+            )
+
+        result['created'] = appointments
+        return result
+
+    def _get_remaining_monthly_appointments(self) -> Optional[int]:
+        """
+        Citas que aún admite el plan este mes (None sin suscripción)
+
+        Bloquea la fila de la suscripción hasta el fin de la transacción para
+        que dos lotes simultáneos no superen juntos el límite.
+        """
+        subscription = (
+            OrganizationSubscription.objects.select_for_update(of=('self',))
+            .select_related('plan')
+            .filter(organization=self.organization)
+            .first()
+        )
+        if subscription is None:
+            return None
+        return max(subscription.plan.max_monthly_appointments - subscription.current_month_appointments_count, 0)
+
+    @staticmethod
+    def _get_availability_error(availability_service, service: Service, start_datetime: datetime, end_datetime: datetime) -> Optional[str]:
+        """
+        Validar horario y solapamiento con las citas existentes (mismas reglas que Appointment.clean)
+        """
+        if availability_service.schedule:
+            is_available, reason = availability_service.is_available_at_time(start_datetime, service)
+            return None if is_available else f"Horario no disponible: {reason}"
+        # Sin horario configurado solo se verifica el solapamiento
+        interval_index = availability_service.get_interval_index(start_datetime, end_datetime)
+        if interval_index.overlaps(start_datetime, end_datetime):
+            return "El profesional ya tiene una cita en este horario"
+        return None
+
+
+class BulkStatusTransitionService:
+    """
+    Servicio para cambiar el estado de varias citas en una operación
+
+    Las transiciones válidas salen de Appointment.STATUS_TRANSITIONS: las
+    citas en un estado de origen permitido pasan al estado destino con un
+    solo UPDATE condicionado por estado, y el historial se crea con
+    bulk_create. update() no llama a save() ni emite post_save, por lo que
+    la disponibilidad de los días afectados se invalida explícitamente.
+    """
+
+    BATCH_SIZE = 500
+    MAX_APPOINTMENTS = 500
+    # Estado destino -> (acción del historial, nota); igual que las acciones individuales de la API
+    HISTORY_ACTIONS = {
+        'confirmed': ('confirmed', 'Cita confirmada'),
+        'checked_in': ('checked_in', 'Cliente llegó'),
+        'in_progress': ('started', 'Servicio iniciado'),
+        'completed': ('completed', 'Cita completada'),
+        'cancelled': ('cancelled', 'Cita cancelada'),
+        'no_show': ('no_show', 'Cliente no asistió'),
+    }
+    TARGET_STATUSES = tuple(HISTORY_ACTIONS)
+
+    def __init__(self, changed_by: User, batch_size: Optional[int] = None):
+        self.changed_by = changed_by
+        self.batch_size = batch_size or self.BATCH_SIZE
+
+    @staticmethod
+    def get_source_statuses(target_status: str) -> List[str]:
+        """
+        Estados desde los que se puede pasar al estado destino
+        """
+        return [
+            source for source, targets in Appointment.STATUS_TRANSITIONS.items()
+            if target_status in targets
+        ]
+
+    def transition(self, queryset, target_status: str, appointment_ids: Optional[Iterable] = None, reason: str = "") -> Dict:
+        """
+        Aplicar la transición a las citas del queryset
+
+        Args:
+            queryset: Citas a las que tiene acceso quien hace el cambio
+            target_status: Estado destino (ver TARGET_STATUSES)
+            appointment_ids: Ids solicitados; los que no estén en el queryset
+                se informan como no encontrados
+            reason: Motivo de cancelación
+
+        Returns:
+            Diccionario con los ids actualizados y los errores ({'id', 'error'})
+            de las citas que no cambiaron de estado
+        """
+        if target_status not in self.TARGET_STATUSES:
+            raise ValueError(f"Estado destino no soportado: {target_status}")
+
+        result = {'updated': [], 'errors': []}
+        if appointment_ids is not None:
+            appointment_ids = list(dict.fromkeys(appointment_ids))
+            queryset = queryset.filter(pk__in=appointment_ids)
+        source_statuses = self.get_source_statuses(target_status)
+        action, notes = self.HISTORY_ACTIONS[target_status]
+        if target_status == 'cancelled':
+            notes = f'{notes}. Razón: {reason}'
+
+        with transaction.atomic():
+            rows = {
+                row['id']: row
+                for row in queryset.select_related(None).prefetch_related(None).order_by('pk')
+                .select_for_update(of=('self',))
+                .values('id', 'status', 'start_datetime', 'professional_id', 'organization_id')
+            }
+            # Ventana de cancelación de cada organización (ver Appointment.can_be_cancelled)
+            cancellation_windows = {}
+            if target_status == 'cancelled':
+                cancellation_windows = {
+                    organization.id: organization.business_rules.get('cancellation_window_hours', 2)
+                    for organization in Organization.objects.filter(
+                        id__in={row['organization_id'] for row in rows.values()}
+                    )
+                }
+            now = timezone.now()
+            transitions = []
+            for appointment_id in (appointment_ids if appointment_ids is not None else rows):
+                row = rows.get(appointment_id)
+                error = self._get_transition_error(row, target_status, source_statuses, cancellation_windows, now)
+                if error:
+                    result['errors'].append({'id': appointment_id, 'error': error})
+                else:
+                    transitions.append(row)
+            if not transitions:
+                return result
+
+            values = {'status': target_status, 'updated_at': now}
+            if target_status == 'cancelled':
+                values.update(cancelled_at=now, cancelled_by=self.changed_by, cancellation_reason=reason)
+            updated_count = Appointment.objects.filter(
+                pk__in=[row['id'] for row in transitions],
+                status__in=source_statuses
+            ).update(**values)
+
+            if updated_count != len(transitions):
+                # Otra transacción cambió alguna cita entre la lectura y el UPDATE (bases sin SELECT ... FOR UPDATE)
+                current = dict(
+                    Appointment.objects.filter(pk__in=[row['id'] for row in transitions])
+                    .values_list('id', 'updated_at')
+                )
+                changed = [row for row in transitions if current.get(row['id']) == now]
+                result['errors'].extend(
+                    {'id': row['id'], 'error': "La cita cambió de estado durante la operación"}
+                    for row in transitions if current.get(row['id']) != now
+                )
+                transitions = changed
+
+            AppointmentHistory.objects.bulk_create([
+                AppointmentHistory(
+                    appointment_id=row['id'],
+                    action=action,
+                    old_values={'status': row['status']},
+                    new_values={'status': target_status},
+                    changed_by=self.changed_by,
+                    notes=notes
+                )
+                for row in transitions
+            ], batch_size=self.batch_size)
+
+            # update() no emite post_save: invalidar los días de las citas que liberan u ocupan la agenda
+            # (confirmar, check-in e iniciar no cambian la disponibilidad, igual que en schedule.signals)
+            target_active = target_status in Appointment.ACTIVE_STATUSES
+            invalidate_appointment_days(
+                (row['professional_id'], row['start_datetime'])
+                for row in transitions
+                if (row['status'] in Appointment.ACTIVE_STATUSES) != target_active
+            )
+
+        result['updated'] = [row['id'] for row in transitions]
+        return result
+
+    @staticmethod
+    def _get_transition_error(
+        row: Optional[Dict],
+        target_status: str,
+        source_statuses: List[str],
+        cancellation_windows: Dict,
+        now: datetime
+    ) -> Optional[str]:
+        """
+        Motivo por el que la cita no puede pasar al estado destino (mismas reglas que las acciones individuales)
+        """
+        if row is None:
+            return "Cita no encontrada"
+        if row['status'] not in source_statuses:
+            return f"No se puede cambiar el estado de '{row['status']}' a '{target_status}'"
+        if target_status == 'cancelled':
+            hours_until_appointment = (row['start_datetime'] - now).total_seconds() / 3600
+            if hours_until_appointment < cancellation_windows[row['organization_id']]:
+                return "Esta cita no puede ser cancelada"
+        if target_status == 'no_show' and row['start_datetime'] >= now:
+            return "Solo se pueden marcar como no-show citas pasadas"
+        return None
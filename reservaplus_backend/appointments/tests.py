@@ -1,3 +1,439 @@
-from django.test import TestCase
+# appointments/tests.py
 
-# Create your tests here.
+import json
+import uuid
+from datetime import datetime, time, timedelta
+from django.contrib import admin
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db import connection
+from django.test import RequestFactory, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from organizations.models import Organization, Professional, Service, Client
+from plans.models import Plan, OrganizationSubscription
+from users.models import User
+from appointments.admin import AppointmentAdmin
+from appointments.booking import AppointmentConflictError, book_appointment
+from appointments.models import Appointment, AppointmentHistory
+from appointments.services import BulkAppointmentCreationService, BulkStatusTransitionService
+from appointments.validation import AppointmentValidationContext
+from schedule.compiled import clear_compiled_schedule_cache
+from schedule.models import ProfessionalSchedule, WeeklySchedule
+
+
+class AppointmentTestCase(TestCase):
+    """
+    Datos compartidos: organización, owner, profesional con horario de lunes a viernes (9:00-17:00), servicio y cliente
+    """
+    
+    @classmethod
+    def setUpTestData(cls):
+        cls.organization = Organization.objects.create(
+            name="Salón Citas",
+            slug="salon-citas",
+            industry_template="salon",
+            email="citas@test.com",
+            is_active=True
+        )
+        cls.owner = User.objects.create_user(
+            username="owner",
+            password="testpass123",
+            email="owner@test.com",
+            organization=cls.organization,
+            role="owner"
+        )
+        cls.professional = Professional.objects.create(
+            organization=cls.organization,
+            name="María González",
+            email="maria@test.com",
+            is_active=True
+        )
+        cls.service = Service.objects.create(
+            organization=cls.organization,
+            name="Corte de Cabello",
+            duration_minutes=60,
+            price=25000,
+            category="Cabello",
+            is_active=True
+        )
+        cls.service.professionals.add(cls.professional)
+        cls.schedule = ProfessionalSchedule.objects.create(
+            professional=cls.professional,
+            min_booking_notice=60,
+            max_booking_advance=10080,
+            slot_duration=30,
+            accepts_bookings=True
+        )
+        for weekday in range(5):
+            WeeklySchedule.objects.create(
+                professional_schedule=cls.schedule,
+                weekday=weekday,
+                start_time=time(9, 0),
+                end_time=time(17, 0),
+                is_active=True
+            )
+        cls.customer = Client.objects.create(
+            organization=cls.organization,
+            first_name="Juan",
+            last_name="Pérez",
+            email="juan@test.com",
+            phone="+56900000001"
+        )
+    
+    def setUp(self):
+        clear_compiled_schedule_cache()
+        cache.clear()
+        
+        # Próximo día hábil
+        self.target_date = timezone.localdate() + timedelta(days=1)
+        while self.target_date.weekday() > 4:
+            self.target_date += timedelta(days=1)
+    
+    def at(self, hour, minute=0):
+        return timezone.make_aware(datetime.combine(self.target_date, time(hour, minute)))
+    
+    def create_appointment(self, start_datetime, **kwargs):
+        values = {
+            'organization': self.organization,
+            'professional': self.professional,
+            'service': self.service,
+            'client': self.customer,
+            'start_datetime': start_datetime,
+            'duration_minutes': 60,
+            'price': 25000,
+            'created_by': self.owner,
+        }
+        values.update(kwargs)
+        return Appointment.objects.create(**values)
+
+
+class AppointmentStatusTransitionTests(AppointmentTestCase):
+    """
+    Tests de cambios de estado individuales (confirmar, check-in, completar, no show)
+    """
+    
+    def create_started_appointment(self):
+        # La cita ya comenzó: la anticipación mínima no impide cambiar su estado
+        appointment = self.create_appointment(self.at(10))
+        past_start = timezone.now() - timedelta(minutes=30)
+        Appointment.objects.filter(pk=appointment.pk).update(
+            start_datetime=past_start,
+            end_datetime=past_start + timedelta(minutes=60)
+        )
+        return Appointment.objects.get(pk=appointment.pk)
+    
+    def test_occupancy_neutral_transitions_single_update(self):
+        """Confirmar y hacer check-in: un UPDATE, sin invalidación ni recálculo al confirmar la transacción"""
+        appointment = self.create_started_appointment()
+        
+        with self.assertNumQueries(1), self.captureOnCommitCallbacks(execute=True) as callbacks:
+            appointment.confirm()
+        self.assertEqual(callbacks, [])
+        with self.assertNumQueries(1), self.captureOnCommitCallbacks(execute=True) as callbacks:
+            appointment.check_in()
+        self.assertEqual(callbacks, [])
+        self.assertEqual(Appointment.objects.get(pk=appointment.pk).status, 'checked_in')
+    
+    def test_completing_invalidates_availability(self):
+        """Completar libera la agenda: se invalidan los días de la cita"""
+        appointment = self.create_started_appointment()
+        Appointment.objects.filter(pk=appointment.pk).update(status='checked_in')
+        appointment = Appointment.objects.get(pk=appointment.pk)
+        
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with self.assertNumQueries(1):
+                appointment.complete()
+        self.assertTrue(callbacks)
+        self.assertEqual(Appointment.objects.get(pk=appointment.pk).status, 'completed')
+    
+    def test_invalid_transitions_rejected(self):
+        """La máquina de estados se valida también en guardados de solo estado"""
+        appointment = self.create_started_appointment()
+        Appointment.objects.filter(pk=appointment.pk).update(status='completed')
+        appointment = Appointment.objects.get(pk=appointment.pk)
+        
+        appointment.status = 'pending'
+        with self.assertRaisesMessage(ValidationError, "No se puede cambiar el estado"):
+            appointment.save(update_fields=['status', 'updated_at'])
+        appointment.status = 'archived'
+        with self.assertRaisesMessage(ValidationError, "Estado inválido"):
+            appointment.save(update_fields=['status', 'updated_at'])
+    
+    def test_past_appointment_marked_no_show(self):
+        """Una cita pasada sin atender puede marcarse como no show"""
+        appointment = self.create_started_appointment()
+        appointment.confirm()
+        appointment.mark_no_show()
+        self.assertEqual(Appointment.objects.get(pk=appointment.pk).status, 'no_show')
+
+
+class AppointmentBookingLockTests(AppointmentTestCase):
+    """
+    Tests de reservas concurrentes: el solapamiento se verifica con la agenda bloqueada
+    """
+    
+    def build_appointment(self, start_datetime):
+        return Appointment(
+            organization=self.organization,
+            professional=self.professional,
+            service=self.service,
+            client=self.customer,
+            start_datetime=start_datetime,
+            duration_minutes=60,
+            price=25000,
+            created_by=self.owner
+        )
+    
+    def test_stale_validation_context_conflicts(self):
+        """El contexto se cargó antes de que otra reserva confirmara el mismo horario"""
+        appointment = self.build_appointment(self.at(10))
+        appointment._validation_context = AppointmentValidationContext(
+            self.professional, self.service, self.at(10)
+        )
+        self.create_appointment(self.at(10))
+        
+        with self.assertRaisesMessage(AppointmentConflictError, "ya tiene una cita"):
+            book_appointment(appointment)
+        self.assertEqual(Appointment.objects.filter(professional=self.professional).count(), 1)
+    
+    def test_cancelled_appointment_frees_agenda(self):
+        """Una cita cancelada no ocupa la agenda"""
+        self.create_appointment(self.at(10), status='cancelled')
+        
+        book_appointment(self.build_appointment(self.at(10)))
+        self.assertEqual(
+            Appointment.objects.filter(professional=self.professional, status='pending').count(), 1
+        )
+    
+    def test_api_overlap_returns_conflict(self):
+        """La API de citas responde 409 ante un solapamiento"""
+        self.create_appointment(self.at(10))
+        self.client.force_login(self.owner)
+        
+        response = self.client.post(
+            '/api/appointments/',
+            data=json.dumps({
+                'client': str(self.customer.id),
+                'professional': str(self.professional.id),
+                'service': str(self.service.id),
+                'start_datetime': self.at(10, 30).isoformat()
+            }),
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 409)
+        self.assertIn('error', response.json())
+
+
+class BulkAppointmentCreationTests(AppointmentTestCase):
+    """
+    Tests de creación masiva de citas (POST /api/appointments/bulk/)
+    """
+    
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.plan = Plan.objects.create(
+            name="Plan Lote",
+            description="Plan de prueba",
+            price_monthly=29990,
+            max_users=5,
+            max_professionals=5,
+            max_services=20,
+            max_monthly_appointments=10,
+            max_clients=1000
+        )
+        cls.subscription = OrganizationSubscription.objects.create(
+            organization=cls.organization,
+            plan=cls.plan,
+            status='active',
+            current_period_start=timezone.now(),
+            current_period_end=timezone.now() + timedelta(days=30)
+        )
+    
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.owner)
+    
+    def item(self, hour, minute=0):
+        return {
+            'client': str(self.customer.id),
+            'professional': str(self.professional.id),
+            'service': str(self.service.id),
+            'start_datetime': self.at(hour, minute).isoformat()
+        }
+    
+    def post_bulk(self, mode, items):
+        return self.client.post(
+            '/api/appointments/bulk/',
+            data=json.dumps({'mode': mode, 'appointments': items}),
+            content_type='application/json'
+        )
+    
+    def test_atomic_mode_rejects_whole_batch(self):
+        """Modo atomic: una cita que se solapa con otra del lote cancela el lote completo"""
+        response = self.post_bulk('atomic', [self.item(9), self.item(11), self.item(9, 30)])
+        
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['errors'], [{'index': 2, 'error': "Se solapa con otra cita del mismo lote"}])
+        self.assertFalse(Appointment.objects.exists())
+    
+    def test_partial_mode_creates_valid_items(self):
+        """Modo partial: se crean las válidas con su historial y el contador sube una vez por cita creada"""
+        response = self.post_bulk('partial', [self.item(9), self.item(11), self.item(9, 30)])
+        
+        self.assertEqual(response.status_code, 201)
+        data = response.json()
+        self.assertEqual(data['created_count'], 2)
+        self.assertEqual([error['index'] for error in data['errors']], [2])
+        self.assertEqual(Appointment.objects.count(), 2)
+        self.assertEqual(AppointmentHistory.objects.filter(action='created').count(), 2)
+        self.subscription.refresh_from_db()
+        self.assertEqual(self.subscription.current_month_appointments_count, 2)
+    
+    def test_existing_appointments_block_batch(self):
+        """Las citas ya creadas ocupan la agenda"""
+        self.create_appointment(self.at(11))
+        
+        response = self.post_bulk('partial', [self.item(11)])
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("Horario no disponible", response.json()['errors'][0]['error'])
+    
+    def test_monthly_limit_applies_to_whole_batch(self):
+        """Modo atomic: el lote completo se compara con el límite mensual del plan"""
+        OrganizationSubscription.objects.filter(pk=self.subscription.pk).update(current_month_appointments_count=9)
+        
+        response = self.post_bulk('atomic', [self.item(9), self.item(11)])
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(response.json()['code'], 'MONTHLY_APPOINTMENTS_LIMIT_EXCEEDED')
+        self.assertFalse(Appointment.objects.exists())
+    
+    def test_partial_mode_limits_valid_items(self):
+        """Modo partial: el límite mensual se aplica a las citas válidas y el excedente se informa por índice"""
+        OrganizationSubscription.objects.filter(pk=self.subscription.pk).update(current_month_appointments_count=8)
+        
+        response = self.post_bulk('partial', [self.item(9), self.item(9, 30), self.item(11), self.item(13)])
+        self.assertEqual(response.status_code, 201)
+        data = response.json()
+        self.assertEqual(data['created_count'], 2)
+        self.assertEqual(
+            data['errors'],
+            [
+                {'index': 1, 'error': "Se solapa con otra cita del mismo lote"},
+                {'index': 3, 'error': "Se alcanzó el límite de citas mensuales del plan"}
+            ]
+        )
+        self.subscription.refresh_from_db()
+        self.assertEqual(self.subscription.current_month_appointments_count, 10)
+    
+    def test_query_count_independent_of_batch_size(self):
+        """El número de consultas no crece con el tamaño del lote"""
+        def run(hours):
+            service = BulkAppointmentCreationService(self.organization, self.owner, mode='partial')
+            batch = [
+                {
+                    'client': self.customer.id,
+                    'professional': self.professional.id,
+                    'service': self.service.id,
+                    'start_datetime': self.at(hour)
+                }
+                for hour in hours
+            ]
+            with CaptureQueriesContext(connection) as queries:
+                result = service.create(batch)
+            Appointment.objects.filter(id__in=[appointment.id for appointment in result['created']]).delete()
+            return len(queries), len(result['created'])
+        
+        # Primera ejecución: calienta el horario compilado y la zona horaria cacheada
+        run([13])
+        few_queries, few_created = run([13])
+        many_queries, many_created = run([9, 13, 14, 15, 16])
+        self.assertEqual((few_created, many_created), (1, 5))
+        self.assertEqual(many_queries, few_queries)
+
+
+class BulkStatusTransitionTests(AppointmentTestCase):
+    """
+    Tests de cambios de estado en lote (POST /api/appointments/bulk-transition/ y acciones del admin)
+    """
+    
+    def setUp(self):
+        super().setUp()
+        self.appointments = [self.create_appointment(self.at(hour)) for hour in (9, 11, 13)]
+        self.ids = [str(appointment.id) for appointment in self.appointments]
+        self.client.force_login(self.owner)
+    
+    def post_transition(self, payload):
+        return self.client.post(
+            '/api/appointments/bulk-transition/',
+            data=json.dumps(payload),
+            content_type='application/json'
+        )
+    
+    def free_slots(self):
+        response = self.client.get(f'/public/booking/org/{self.organization.slug}/availability/', {
+            'service_id': str(self.service.id),
+            'date': self.target_date.isoformat(),
+            'days_ahead': 1
+        })
+        return response.json()['availability'][self.target_date.isoformat()]['total_slots']
+    
+    def test_single_update_per_target_status(self):
+        """Un UPDATE para todo el lote, historial por cita y errores por id"""
+        missing_id = str(uuid.uuid4())
+        
+        with CaptureQueriesContext(connection) as queries:
+            response = self.post_transition({'ids': self.ids + [missing_id], 'status': 'confirmed'})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['updated'], self.ids)
+        self.assertEqual(data['errors'], [{'id': missing_id, 'error': "Cita no encontrada"}])
+        updates = [query for query in queries if query['sql'].startswith('UPDATE "appointments_appointment"')]
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(AppointmentHistory.objects.filter(action='confirmed').count(), 3)
+    
+    def test_occupancy_neutral_transition_skips_invalidation(self):
+        """Confirmar en lote no invalida la disponibilidad ni recalcula los slots materializados"""
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            result = BulkStatusTransitionService(self.owner).transition(
+                Appointment.objects.all(), 'confirmed', appointment_ids=[appointment.id for appointment in self.appointments]
+            )
+        self.assertEqual(len(result['updated']), 3)
+        self.assertEqual(callbacks, [])
+    
+    def test_invalid_transition_reported(self):
+        """Las transiciones no permitidas por la máquina de estados se informan sin cambiar la cita"""
+        response = self.post_transition({'ids': self.ids[:1], 'status': 'in_progress'})
+        
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            response.json()['errors'][0]['error'],
+            "No se puede cambiar el estado de 'pending' a 'in_progress'"
+        )
+        self.assertEqual(Appointment.objects.get(pk=self.appointments[0].pk).status, 'pending')
+    
+    def test_cancel_records_metadata_and_frees_slots(self):
+        """Cancelar guarda quién, cuándo y por qué, y libera la agenda aunque esté en caché"""
+        slots_before = self.free_slots()
+        
+        response = self.post_transition({'ids': self.ids[:2], 'status': 'cancelled', 'reason': "Cierre del local"})
+        self.assertEqual(response.status_code, 200)
+        cancelled = Appointment.objects.get(pk=self.appointments[0].pk)
+        self.assertEqual(cancelled.status, 'cancelled')
+        self.assertEqual(cancelled.cancelled_by, self.owner)
+        self.assertIsNotNone(cancelled.cancelled_at)
+        self.assertEqual(cancelled.cancellation_reason, "Cierre del local")
+        self.assertGreater(self.free_slots(), slots_before)
+    
+    def test_admin_actions_use_service(self):
+        """Las acciones del admin aplican la transición en lote"""
+        Appointment.objects.filter(pk=self.appointments[2].pk).update(status='in_progress')
+        request = RequestFactory().post('/admin/appointments/appointment/')
+        request.user = self.owner
+        request._messages = CookieStorage(request)
+        
+        AppointmentAdmin(Appointment, admin.site).mark_completed(request, Appointment.objects.all())
+        self.assertEqual(Appointment.objects.get(pk=self.appointments[2].pk).status, 'completed')
+        self.assertEqual(Appointment.objects.get(pk=self.appointments[0].pk).status, 'pending')
+        self.assertEqual(AppointmentHistory.objects.filter(action='completed').count(), 1)
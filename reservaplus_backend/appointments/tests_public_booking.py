@@ -2,14 +2,19 @@
 
 import json
 from datetime import datetime, time, date, timedelta
-from django.test import TestCase, Client as TestClient
+from asgiref.sync import async_to_sync
+from django.core.exceptions import ValidationError
+from django.test import TestCase, Client as TestClient, RequestFactory, override_settings
 from django.utils import timezone
 from django.urls import reverse
 from organizations.models import Organization, Professional, Service, Client
 from users.models import User
 from appointments.models import Appointment
+from appointments.validation import AppointmentValidationContext
+from schedule.cache import lookup_cached_slots
 from schedule.models import ProfessionalSchedule, WeeklySchedule
 from appointments.client_auth import ClientAuthService
+from appointments.public_async_views import AsyncPublicAvailabilityView, AsyncPublicOrganizationDetailView
 
 
 class PublicBookingTests(TestCase):
@@ -141,6 +146,133 @@ class PublicBookingTests(TestCase):
         # Verificar que hay slots disponibles
         first_day = list(availability.values())[0]
         self.assertGreater(first_day['total_slots'], 0)
+        
+        # "Cualquier profesional" usa la caché versionada por día (la misma que precalienta el warm-up)
+        cache_lookup = lookup_cached_slots(
+            self.professional.id, tomorrow, tomorrow, self.service.total_duration_minutes, available_only=True
+        )
+        self.assertEqual(cache_lookup.missing_dates, [])
+    
+    def test_get_public_availability_compact(self):
+        """Test disponibilidad pública en formato compacto (mismos slots que el formato completo)"""
+        tomorrow = timezone.now().date() + timedelta(days=1)
+        while tomorrow.weekday() > 4:
+            tomorrow += timedelta(days=1)
+        
+        url = f'/public/booking/org/{self.organization.slug}/availability/'
+        params = {
+            'service_id': str(self.service.id),
+            'date': tomorrow.isoformat(),
+            'days_ahead': 5
+        }
+        full = self.client.get(url, params).json()
+        response = self.client.get(url, {**params, 'format': 'compact'})
+        
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['format'], 'compact')
+        self.assertEqual(
+            data['professionals'],
+            {str(self.professional.id): {'name': self.professional.name, 'timezone': self.schedule.timezone}}
+        )
+        
+        # Decodificar hora base + paso + bits y comparar con las horas del formato completo
+        for date_key, day in full['availability'].items():
+            decoded = []
+            for encoded in data['days'][date_key].values():
+                hours, minutes = map(int, encoded['base'].split(':'))
+                base = hours * 60 + minutes
+                decoded.extend(
+                    f'{(base + index * encoded["step"]) // 60:02d}:{(base + index * encoded["step"]) % 60:02d}'
+                    for index, bit in enumerate(encoded['slots']) if bit == '1'
+                )
+            self.assertEqual(sorted(decoded), [slot['start_time'] for slot in day['slots']])
+        
+        self.assertLess(len(response.content), len(self.client.get(url, params).content) / 5)
+    
+    def test_public_availability_paging_and_budget(self):
+        """Test disponibilidad pública acotada: horizonte de reserva, páginas y presupuesto"""
+        today = timezone.now().date()
+        horizon = timezone.localtime(timezone.now() + timedelta(minutes=self.schedule.max_booking_advance)).date()
+        url = f'/public/booking/org/{self.organization.slug}/availability/'
+        params = {'service_id': str(self.service.id), 'days_ahead': 365}
+        
+        # Páginas de 3 días hasta el horizonte de max_booking_advance
+        pages = []
+        with override_settings(PUBLIC_AVAILABILITY_MAX_DAYS=3):
+            data = self.client.get(url, params).json()
+            pages.append(data)
+            while data['next_cursor']:
+                data = self.client.get(url, {**params, 'cursor': data['next_cursor']}).json()
+                pages.append(data)
+        dates = [date_key for page in pages for date_key in page['availability']]
+        self.assertEqual(dates[0], today.isoformat())
+        self.assertEqual(dates[-1], horizon.isoformat())
+        self.assertEqual(len(dates), len(set(dates)))
+        self.assertEqual(len(pages), -(-len(dates) // 3))
+        self.assertFalse(any(page['partial'] for page in pages))
+        
+        # Con el presupuesto agotado se responde solo el primer bloque y un cursor para continuar
+        monday = today + timedelta(days=(7 - today.weekday()) % 7)
+        with override_settings(AVAILABILITY_BUDGET_SLOTS=1, AVAILABILITY_BUDGET_CHUNK_DAYS=2):
+            data = self.client.get(url, {**params, 'date': monday.isoformat()}).json()
+            self.assertTrue(data['partial'])
+            self.assertEqual(list(data['availability']), [monday.isoformat(), (monday + timedelta(days=1)).isoformat()])
+            data = self.client.get(url, {**params, 'cursor': data['next_cursor']}).json()
+            self.assertEqual(list(data['availability'])[0], (monday + timedelta(days=2)).isoformat())
+        
+        # Un cursor alterado se rechaza
+        response = self.client.get(url, {**params, 'cursor': pages[0]['next_cursor'] + 'x'})
+        self.assertEqual(response.status_code, 400)
+    
+    def test_async_public_views_match_sync(self):
+        """Test vistas públicas asíncronas: misma respuesta que las síncronas"""
+        tomorrow = timezone.now().date() + timedelta(days=1)
+        while tomorrow.weekday() > 4:
+            tomorrow += timedelta(days=1)
+        start_datetime = timezone.make_aware(datetime.combine(tomorrow, time(11, 0)))
+        Appointment.objects.create(
+            organization=self.organization,
+            professional=self.professional,
+            service=self.service,
+            client=Client.objects.create(
+                organization=self.organization,
+                first_name="Ana",
+                last_name="Soto",
+                phone="123456789"
+            ),
+            start_datetime=start_datetime,
+            end_datetime=start_datetime + timedelta(minutes=60),
+            duration_minutes=60,
+            price=25000,
+            created_by=self.owner
+        )
+        factory = RequestFactory()
+        
+        url = f'/public/booking/org/{self.organization.slug}/'
+        response = async_to_sync(AsyncPublicOrganizationDetailView.as_view())(
+            factory.get(url), org_slug=self.organization.slug
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content), self.client.get(url).json())
+        
+        url = f'/public/booking/org/{self.organization.slug}/availability/'
+        for params in (
+            {'service_id': str(self.service.id), 'date': tomorrow.isoformat(), 'days_ahead': 5},
+            {'service_id': str(self.service.id), 'professional_id': str(self.professional.id), 'days_ahead': 3},
+            {'service_id': str(self.service.id), 'date': tomorrow.isoformat(), 'format': 'compact'},
+        ):
+            # Primero la vista asíncrona (caché vacía) y luego la síncrona (desde la caché)
+            response = async_to_sync(AsyncPublicAvailabilityView.as_view())(
+                factory.get(url, params), org_slug=self.organization.slug
+            )
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(json.loads(response.content), self.client.get(url, params).json())
+        
+        response = async_to_sync(AsyncPublicAvailabilityView.as_view())(
+            factory.get(url, {'service_id': str(self.service.id), 'date': 'mañana'}), org_slug=self.organization.slug
+        )
+        self.assertEqual(response.status_code, 400)
     
     def test_guest_booking_success(self):
         """Test booking exitoso como cliente guest"""
@@ -297,6 +429,64 @@ class PublicBookingTests(TestCase):
         self.assertIn('error', data)
         self.assertIn('no disponible', data['error'].lower())
     
+    def test_booking_validation_constant_queries(self):
+        """Test de validación: un contexto precargado y un número fijo de consultas por reserva"""
+        tomorrow = timezone.now().date() + timedelta(days=1)
+        while tomorrow.weekday() > 4:
+            tomorrow += timedelta(days=1)
+        
+        client = Client.objects.create(
+            organization=self.organization,
+            first_name="Cliente",
+            last_name="Frecuente",
+            email="frecuente@test.com",
+            phone="+56900000001"
+        )
+        professional = Professional.objects.get(pk=self.professional.pk)
+        service = Service.objects.get(pk=self.service.pk)
+        
+        def build(hour):
+            start_datetime = timezone.make_aware(datetime.combine(tomorrow, time(hour, 0)))
+            return Appointment(
+                organization=self.organization,
+                professional=professional,
+                service=service,
+                client=client,
+                start_datetime=start_datetime,
+                duration_minutes=60,
+                price=25000,
+                created_by=self.owner
+            )
+        
+        # Profesional + capacidad, versión del horario compilado y citas del intervalo
+        AppointmentValidationContext(professional, service, build(9).start_datetime)
+        for hour in (9, 11, 13):
+            appointment = build(hour)
+            with self.assertNumQueries(3):
+                appointment._validation_context = AppointmentValidationContext(
+                    professional, service, appointment.start_datetime
+                )
+            # Con el contexto adjunto, guardar solo inserta la cita
+            with self.assertNumQueries(1):
+                appointment.save()
+        
+        # El contexto es de un solo uso: una segunda validación vuelve a consultar las citas
+        overlapping = build(9)
+        overlapping.start_datetime += timedelta(minutes=30)
+        with self.assertRaisesMessage(ValidationError, "Horario no disponible"):
+            overlapping.save()
+        
+        other_service = Service.objects.create(
+            organization=self.organization,
+            name="Tintura",
+            duration_minutes=60,
+            price=30000,
+            is_active=True
+        )
+        context = AppointmentValidationContext(professional, other_service)
+        self.assertFalse(context.can_perform_service)
+        self.assertTrue(AppointmentValidationContext(professional, service).can_perform_service)
+    
     def test_client_login(self):
         """Test login de cliente registrado"""
         # Crear cliente registrado
@@ -0,0 +1,298 @@
+# appointments/tests_recurring.py
+
+from datetime import date, datetime, time, timedelta
+from io import StringIO
+from unittest.mock import patch
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from organizations.models import Organization, Professional, Service, Client
+from plans.models import Plan, OrganizationSubscription
+from users.models import User
+from appointments import booking
+from appointments.models import Appointment, AppointmentHistory, RecurringAppointment
+from appointments.services import RecurringAppointmentGenerationService
+from schedule.compiled import clear_compiled_schedule_cache
+from schedule.models import ProfessionalSchedule, WeeklySchedule, ScheduleBreak
+
+
+class RecurringAppointmentGenerationTests(TestCase):
+    """
+    Tests para la materialización de citas recurrentes
+    """
+    
+    def setUp(self):
+        """Configurar datos de prueba"""
+        clear_compiled_schedule_cache()
+        cache.clear()
+        
+        self.organization = Organization.objects.create(
+            name="Test Salon",
+            industry_template="salon"
+        )
+        self.user = User.objects.create_user(
+            username="testuser",
+            password="testpass123",
+            email="test@test.com",
+            organization=self.organization,
+            role="owner"
+        )
+        self.service = Service.objects.create(
+            organization=self.organization,
+            name="Corte de Cabello",
+            duration_minutes=60,
+            price=25000,
+            category="Cabello"
+        )
+        
+        self.professionals = []
+        for index in range(3):
+            professional = Professional.objects.create(
+                organization=self.organization,
+                name=f"Profesional {index}",
+                email=f"profesional{index}@test.com"
+            )
+            self.service.professionals.add(professional)
+            schedule = ProfessionalSchedule.objects.create(
+                professional=professional,
+                min_booking_notice=60,
+                max_booking_advance=60 * 24 * 60,  # 60 días
+                slot_duration=30
+            )
+            for weekday in range(5):
+                weekly_schedule = WeeklySchedule.objects.create(
+                    professional_schedule=schedule,
+                    weekday=weekday,
+                    start_time=time(9, 0),
+                    end_time=time(17, 0)
+                )
+                ScheduleBreak.objects.create(
+                    weekly_schedule=weekly_schedule,
+                    start_time=time(12, 0),
+                    end_time=time(13, 0),
+                    name="Almuerzo"
+                )
+            self.professionals.append(professional)
+        
+        self.client = Client.objects.create(
+            organization=self.organization,
+            first_name="Juan",
+            last_name="Pérez",
+            email="juan@test.com",
+            phone="123456789"
+        )
+        
+        # Próximo lunes (al menos 2 días adelante)
+        self.monday = timezone.localdate() + timedelta(days=2)
+        while self.monday.weekday() != 0:
+            self.monday += timedelta(days=1)
+    
+    def _create_recurring(self, professional, preferred_time=time(10, 0), **kwargs):
+        values = {
+            'organization': self.organization,
+            'professional': professional,
+            'service': self.service,
+            'client': self.client,
+            'frequency': 'weekly',
+            'preferred_time': preferred_time,
+            'preferred_day_of_week': 0,
+            'start_date': self.monday,
+            'advance_booking_days': 28,
+            'created_by': self.user,
+        }
+        values.update(kwargs)
+        return RecurringAppointment.objects.create(**values)
+    
+    def test_occurrence_dates(self):
+        """Test de expansión de fechas por frecuencia"""
+        recurring = RecurringAppointment(
+            frequency='weekly', start_date=date(2025, 1, 1), preferred_day_of_week=0, interval_days=7
+        )
+        self.assertEqual(
+            recurring.get_occurrence_dates(date(2025, 1, 10), date(2025, 1, 31)),
+            [date(2025, 1, 13), date(2025, 1, 20), date(2025, 1, 27)]
+        )
+        
+        recurring.frequency = 'biweekly'
+        self.assertEqual(
+            recurring.get_occurrence_dates(date(2025, 1, 10), date(2025, 2, 28)),
+            [date(2025, 1, 20), date(2025, 2, 3), date(2025, 2, 17)]
+        )
+        
+        recurring.frequency = 'custom'
+        recurring.interval_days = 10
+        recurring.end_date = date(2025, 1, 30)
+        self.assertEqual(
+            recurring.get_occurrence_dates(date(2025, 1, 1), date(2025, 3, 1)),
+            [date(2025, 1, 6), date(2025, 1, 16), date(2025, 1, 26)]
+        )
+        
+        # Mensual: el día 31 se ajusta al último día de los meses cortos
+        recurring = RecurringAppointment(frequency='monthly', start_date=date(2025, 1, 31), interval_days=7)
+        self.assertEqual(
+            recurring.get_occurrence_dates(date(2025, 2, 1), date(2025, 5, 31)),
+            [date(2025, 2, 28), date(2025, 3, 31), date(2025, 4, 30), date(2025, 5, 31)]
+        )
+    
+    def test_generate_creates_appointments_and_reports_skipped(self):
+        """Test de generación: crea citas e historial y reporta ocurrencias omitidas"""
+        professional = self.professionals[0]
+        recurring = self._create_recurring(professional)
+        in_break = self._create_recurring(professional, preferred_time=time(12, 0))
+        
+        # Una cita existente bloquea la segunda ocurrencia
+        blocked_start = timezone.make_aware(
+            datetime.combine(self.monday + timedelta(days=7), time(10, 0))
+        )
+        Appointment.objects.create(
+            organization=self.organization,
+            professional=professional,
+            service=self.service,
+            client=self.client,
+            start_datetime=blocked_start,
+            end_datetime=blocked_start + timedelta(minutes=60),
+            duration_minutes=60,
+            price=25000,
+            created_by=self.user
+        )
+        
+        result = recurring.generate_next_appointments(weeks_ahead=4)
+        created_dates = sorted(timezone.localtime(a.start_datetime).date() for a in result['created'])
+        expected_dates = [
+            occurrence for occurrence in (self.monday + timedelta(days=7 * week) for week in range(5))
+            if occurrence != self.monday + timedelta(days=7) and occurrence <= timezone.localdate() + timedelta(days=28)
+        ]
+        self.assertEqual(created_dates, expected_dates)
+        self.assertEqual(
+            [skipped['reason'] for skipped in result['skipped']],
+            ["Ya hay una cita programada en este horario"]
+        )
+        self.assertEqual(
+            AppointmentHistory.objects.filter(appointment__in=result['created'], action='created').count(),
+            len(result['created'])
+        )
+        
+        recurring.refresh_from_db()
+        self.assertEqual(recurring.generated_until, timezone.localdate() + timedelta(days=28))
+        
+        # Incremental: una segunda ejecución no vuelve a generar las mismas fechas
+        self.assertEqual(recurring.generate_next_appointments(weeks_ahead=4)['created'], [])
+        
+        result = in_break.generate_next_appointments(weeks_ahead=4)
+        self.assertEqual(result['created'], [])
+        self.assertTrue(all(skipped['reason'] == "En horario de descanso" for skipped in result['skipped']))
+    
+    def test_generate_avoids_overlaps_within_run(self):
+        """Test de generación: dos recurrencias al mismo horario no se solapan entre sí"""
+        professional = self.professionals[0]
+        first = self._create_recurring(professional)
+        second = self._create_recurring(professional)
+        
+        result = RecurringAppointmentGenerationService().generate(
+            RecurringAppointment.objects.filter(id__in=[first.id, second.id])
+            .select_related('professional__schedule', 'service', 'client')
+        )
+        self.assertTrue(result['created'])
+        self.assertEqual(len(result['created']), len(result['skipped']))
+        self.assertEqual(
+            Appointment.objects.filter(professional=professional).count(),
+            len(result['created'])
+        )
+    
+    def test_generate_rechecks_bookings_under_lock(self):
+        """Test de generación: las citas se validan con las agendas bloqueadas"""
+        professional = self.professionals[0]
+        recurring = self._create_recurring(professional)
+        booked_start = timezone.make_aware(datetime.combine(self.monday, time(10, 0)))
+        lock_professional_schedules = booking.lock_professional_schedules
+        
+        def book_then_lock(professional_ids):
+            # Una reserva confirmada justo antes de obtener el bloqueo
+            Appointment.objects.create(
+                organization=self.organization,
+                professional=professional,
+                service=self.service,
+                client=self.client,
+                start_datetime=booked_start,
+                duration_minutes=60,
+                price=25000,
+                created_by=self.user
+            )
+            lock_professional_schedules(professional_ids)
+        
+        with patch.object(booking, 'lock_professional_schedules', side_effect=book_then_lock) as lock:
+            result = RecurringAppointmentGenerationService().generate([recurring])
+        self.assertEqual(list(lock.call_args.args[0]), [professional.id])
+        self.assertNotIn(booked_start, [appointment.start_datetime for appointment in result['created']])
+        self.assertEqual(
+            [skipped['reason'] for skipped in result['skipped']],
+            ["Ya hay una cita programada en este horario"]
+        )
+        self.assertEqual(
+            Appointment.objects.filter(professional=professional, start_datetime=booked_start).count(), 1
+        )
+    
+    def test_generate_constant_queries(self):
+        """Test de generación: el número de consultas no crece con las recurrencias"""
+        def run(recurring_ids):
+            cache.clear()
+            clear_compiled_schedule_cache()
+            recurring_appointments = RecurringAppointment.objects.filter(
+                id__in=recurring_ids
+            ).select_related('professional__schedule', 'service', 'client')
+            with CaptureQueriesContext(connection) as queries:
+                result = RecurringAppointmentGenerationService().generate(recurring_appointments)
+            return len(queries), result
+        
+        few = [self._create_recurring(self.professionals[0]).id]
+        many = [
+            self._create_recurring(professional, preferred_time=time(hour, 0)).id
+            for professional in self.professionals
+            for hour in (9, 14, 15)
+        ]
+        
+        few_queries, few_result = run(few)
+        many_queries, many_result = run(many)
+        self.assertEqual(len(many_result['created']), len(few_result['created']) * len(many))
+        self.assertEqual(many_queries, few_queries)
+    
+    def test_generate_increments_monthly_counter(self):
+        """Test de generación: las citas generadas cuentan para el límite mensual del plan"""
+        plan = Plan.objects.create(
+            name="Plan Recurrente",
+            description="Plan de prueba",
+            price_monthly=29990,
+            max_users=5,
+            max_professionals=5,
+            max_services=20,
+            max_monthly_appointments=500,
+            max_clients=1000
+        )
+        subscription = OrganizationSubscription.objects.create(
+            organization=self.organization,
+            plan=plan,
+            status='active',
+            current_period_start=timezone.now(),
+            current_period_end=timezone.now() + timedelta(days=30),
+            current_month_appointments_count=3
+        )
+        recurring = self._create_recurring(self.professionals[0])
+        
+        result = RecurringAppointmentGenerationService().generate([recurring])
+        self.assertTrue(result['created'])
+        subscription.refresh_from_db()
+        self.assertEqual(subscription.current_month_appointments_count, 3 + len(result['created']))
+    
+    def test_management_command(self):
+        """Test del comando de generación nocturna"""
+        self._create_recurring(self.professionals[0])
+        self._create_recurring(self.professionals[1], is_active=False)
+        
+        output = StringIO()
+        call_command('generate_recurring_appointments', stdout=output)
+        self.assertIn('Test Salon: 1 recurrencias', output.getvalue())
+        self.assertEqual(Appointment.objects.filter(professional=self.professionals[1]).count(), 0)
+        self.assertTrue(Appointment.objects.filter(professional=self.professionals[0]).exists())
@@ -16,6 +16,7 @@ urlpatterns = [
     # Nuevas vistas de disponibilidad inteligente
     path('smart-availability/', views.SmartAvailabilityView.as_view(), name='smart-availability'),
     path('conflict-detection/', views.ConflictDetectionView.as_view(), name='conflict-detection'),
+    path('availability-check/', views.BatchAvailabilityCheckView.as_view(), name='availability-check'),
     
     # URLs del router
     path('', include(router.urls)),
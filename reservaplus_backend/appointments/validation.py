@@ -0,0 +1,135 @@
+# appointments/validation.py
+
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+from django.db.models import BooleanField, Exists, OuterRef, Value
+from organizations.models import Professional, Service
+from schedule.cache import remember_professional_timezones
+from schedule.services import AvailabilityCalculationService
+
+
+class AppointmentValidationContext:
+    """
+    Datos para validar una cita, cargados en un solo paso
+
+    Una consulta trae el profesional con su horario y si puede realizar el
+    servicio; el horario compilado y las citas activas alrededor del
+    intervalo se cargan una vez en el servicio de disponibilidad (ver
+    schedule.services). El serializer y las vistas de reserva construyen el
+    contexto y lo adjuntan a la cita, y Appointment.clean lo reutiliza, por
+    lo que validar una reserva cuesta un número fijo de consultas.
+    """
+
+    def __init__(
+        self,
+        professional,
+        service: Optional[Service],
+        start_datetime: Optional[datetime] = None,
+        end_datetime: Optional[datetime] = None
+    ):
+        """
+        Args:
+            professional: Profesional (instancia o id)
+            service: Servicio a agendar (opcional)
+            start_datetime: Inicio de la cita; si se indica, las citas del
+                intervalo se precargan de inmediato
+            end_datetime: Fin de la cita (por defecto según la duración del servicio)
+        """
+        self.professional_id = getattr(professional, 'pk', professional)
+        self.service = service
+        self.professional = None
+        self.can_perform_service = None
+        self.availability_service = None
+        self._load()
+
+        if self.availability_service and start_datetime:
+            if end_datetime is None and service:
+                end_datetime = start_datetime + timedelta(minutes=service.total_duration_minutes)
+            if end_datetime:
+                self.availability_service.get_interval_index(start_datetime, end_datetime)
+
+    @classmethod
+    def for_appointment(cls, appointment) -> 'AppointmentValidationContext':
+        """
+        Contexto para validar una cita a partir de sus propios campos
+        """
+        return cls(
+            appointment.professional_id,
+            appointment.service if appointment.service_id else None,
+            appointment.start_datetime,
+            appointment.end_datetime
+        )
+
+    def _load(self) -> None:
+        """
+        Cargar profesional, horario y capacidad para el servicio en una consulta
+        """
+        if self.professional_id is None:
+            return
+
+        if self.service is not None:
+            can_perform_service = Exists(
+                Service.professionals.through.objects.filter(
+                    service_id=self.service.pk,
+                    professional_id=OuterRef('pk')
+                )
+            )
+        else:
+            can_perform_service = Value(None, output_field=BooleanField())
+
+        self.professional = (
+            Professional.objects.filter(pk=self.professional_id)
+            .select_related('schedule')
+            .annotate(can_perform_service=can_perform_service)
+            .first()
+        )
+        if self.professional is not None:
+            self.can_perform_service = self.professional.can_perform_service
+            self.availability_service = AvailabilityCalculationService(self.professional)
+            # La invalidación tras guardar la cita agrupa los días en la zona horaria del horario
+            remember_professional_timezones([self.availability_service.schedule])
+
+    @property
+    def schedule(self):
+        return self.availability_service.schedule if self.availability_service else None
+
+    def matches(self, appointment) -> bool:
+        """
+        ¿El contexto corresponde al profesional y servicio de la cita?
+        """
+        return (
+            self.professional_id == appointment.professional_id
+            and getattr(self.service, 'pk', None) == appointment.service_id
+        )
+
+    def is_available_at_time(
+        self,
+        start_datetime: datetime,
+        exclude_appointment_id=None
+    ) -> Tuple[bool, str]:
+        """
+        Verificar el horario del profesional con los datos precargados
+
+        Returns:
+            Tupla (is_available, reason), igual que
+            AvailabilityCalculationService.is_available_at_time
+        """
+        if self.availability_service is None:
+            return False, "Profesional no encontrado"
+        return self.availability_service.is_available_at_time(
+            start_datetime, self.service, exclude_appointment_id=exclude_appointment_id
+        )
+
+    def has_overlap(
+        self,
+        start_datetime: datetime,
+        end_datetime: datetime,
+        exclude_appointment_id=None
+    ) -> bool:
+        """
+        ¿Se solapa el intervalo con otra cita activa del profesional?
+        """
+        if self.availability_service is None:
+            return False
+        interval_index = self.availability_service.get_interval_index(start_datetime, end_datetime)
+        return interval_index.overlaps(start_datetime, end_datetime, exclude_appointment_id)
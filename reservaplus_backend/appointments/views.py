@@ -8,13 +8,18 @@ from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
+from .booking import AppointmentConflictError
 from .models import Appointment, AppointmentHistory, RecurringAppointment
 from .serializers import (
     AppointmentSerializer, AppointmentCreateSerializer, AppointmentUpdateSerializer,
     AppointmentHistorySerializer, RecurringAppointmentSerializer,
-    AppointmentCalendarSerializer, AvailabilitySlotSerializer
+    AppointmentCalendarSerializer, AvailabilitySlotSerializer,
+    BulkAppointmentCreateSerializer, BulkStatusTransitionSerializer
 )
+from .services import BulkAppointmentCreationService, BulkStatusTransitionService
 from organizations.models import Professional, Service
+from plans.models import OrganizationSubscription
+from schedule.budget import decode_availability_cursor, encode_availability_cursor
 
 
 class AppointmentViewSet(viewsets.ModelViewSet):
@@ -31,6 +36,10 @@ class AppointmentViewSet(viewsets.ModelViewSet):
             return AppointmentUpdateSerializer
         elif self.action == 'calendar':
             return AppointmentCalendarSerializer
+        elif self.action == 'bulk':
+            return BulkAppointmentCreateSerializer
+        elif self.action == 'bulk_transition':
+            return BulkStatusTransitionSerializer
         return AppointmentSerializer
     
     def get_queryset(self):
@@ -49,6 +58,13 @@ class AppointmentViewSet(viewsets.ModelViewSet):
             'created_by', 'cancelled_by'
         ).prefetch_related('history')
     
+    def create(self, request, *args, **kwargs):
+        """Crear cita; un solapamiento detectado con la agenda bloqueada responde 409"""
+        try:
+            return super().create(request, *args, **kwargs)
+        except AppointmentConflictError as error:
+            return Response({'error': error.messages[0]}, status=status.HTTP_409_CONFLICT)
+    
     def perform_create(self, serializer):
         """Crear cita con validaciones adicionales"""
         appointment = serializer.save()
@@ -236,6 +252,102 @@ class AppointmentViewSet(viewsets.ModelViewSet):
             'appointment': AppointmentSerializer(appointment).data
         })
     
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        """
+        Crear varias citas en una sola operación (importaciones, walk-ins)
+        
+        Body:
+        {
+            "mode": "atomic" | "partial",
+            "appointments": [
+                {"client": "uuid", "professional": "uuid", "service": "uuid",
+                 "start_datetime": "2024-01-15T10:00:00Z", "notes": "", "is_walk_in": false}
+            ]
+        }
+        
+        En modo atomic una cita inválida cancela el lote; en modo partial se
+        crean las válidas (hasta el límite mensual del plan) y las rechazadas
+        se informan por índice.
+        """
+        organization = request.user.organization
+        if not organization:
+            return Response(
+                {'error': 'El usuario no pertenece a una organización'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        mode = serializer.validated_data['mode']
+        items = serializer.validated_data['appointments']
+        
+        # Límite mensual del plan para el lote completo (en modo partial el servicio lo aplica a las citas válidas)
+        subscription = OrganizationSubscription.objects.filter(
+            organization=organization
+        ).select_related('plan').first() if mode == 'atomic' else None
+        if subscription and subscription.current_month_appointments_count + len(items) > subscription.plan.max_monthly_appointments:
+            return Response({
+                'error': f'El lote supera el límite de {subscription.plan.max_monthly_appointments} citas mensuales para tu plan {subscription.plan.name}',
+                'code': 'MONTHLY_APPOINTMENTS_LIMIT_EXCEEDED',
+                'limit': subscription.plan.max_monthly_appointments,
+                'current': subscription.current_month_appointments_count,
+                'upgrade_required': True
+            }, status=status.HTTP_403_FORBIDDEN)
+        
+        try:
+            result = BulkAppointmentCreationService(organization, request.user, mode).create(items)
+        except AppointmentConflictError as error:
+            return Response({'error': error.messages[0]}, status=status.HTTP_409_CONFLICT)
+        
+        # El servicio ya actualizó el contador mensual (ver SubscriptionCounterMiddleware)
+        request._request.subscription_counters_updated = True
+        
+        created = result['created']
+        return Response({
+            'message': f'{len(created)} citas creadas',
+            'mode': mode,
+            'created_count': len(created),
+            'error_count': len(result['errors']),
+            'appointments': AppointmentSerializer(created, many=True).data,
+            'errors': result['errors']
+        }, status=status.HTTP_201_CREATED if created else status.HTTP_400_BAD_REQUEST)
+    
+    @action(detail=False, methods=['post'], url_path='bulk-transition')
+    def bulk_transition(self, request):
+        """
+        Cambiar el estado de varias citas en una sola operación
+        
+        Body:
+        {
+            "ids": ["uuid", ...],
+            "status": "confirmed" | "checked_in" | "in_progress" | "completed" | "cancelled" | "no_show",
+            "reason": "Motivo (solo cancelación)"
+        }
+        
+        Las citas que no admiten la transición se informan por id sin detener el resto.
+        """
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        target_status = serializer.validated_data['status']
+        
+        result = BulkStatusTransitionService(request.user).transition(
+            self.get_queryset(),
+            target_status,
+            appointment_ids=serializer.validated_data['ids'],
+            reason=serializer.validated_data['reason']
+        )
+        
+        updated = result['updated']
+        return Response({
+            'message': f'{len(updated)} citas actualizadas',
+            'status': target_status,
+            'updated_count': len(updated),
+            'error_count': len(result['errors']),
+            'updated': updated,
+            'errors': result['errors']
+        }, status=status.HTTP_200_OK if updated else status.HTTP_400_BAD_REQUEST)
+    
     @action(detail=False, methods=['get'])
     def calendar(self, request):
         """Vista de calendario con filtros"""
@@ -400,6 +512,7 @@ class SmartAvailabilityView(APIView):
     Vista avanzada para obtener disponibilidad inteligente
     """
     permission_classes = [IsAuthenticated]
+    max_range_days = 92
     
     def get(self, request):
         """
@@ -412,6 +525,7 @@ class SmartAvailabilityView(APIView):
         - end_date: Fecha fin búsqueda (opcional, default: +30 días)
         - max_slots: Máximo slots a retornar (opcional, default: 20)
         - mode: Modo de búsqueda ('next_available', 'date_range', 'earliest')
+        - cursor: Token next_cursor de una respuesta date_range para continuar (opcional)
         """
         service_id = request.query_params.get('service_id')
         professional_id = request.query_params.get('professional_id')
@@ -461,19 +575,29 @@ class SmartAvailabilityView(APIView):
             })
         
         elif mode == 'date_range':
-            # Búsqueda en rango de fechas
+            # Búsqueda en rango de fechas (o continuación desde un cursor)
+            cursor_scope = f'smart:{service.id}:{professional_id or ""}'
             try:
-                start_date = datetime.strptime(start_date_str, '%Y-%m-%d').date() if start_date_str else timezone.now().date()
-                end_date = datetime.strptime(end_date_str, '%Y-%m-%d').date() if end_date_str else start_date + timedelta(days=30)
+                if request.query_params.get('cursor'):
+                    start_date, end_date = decode_availability_cursor(request.query_params['cursor'], cursor_scope)
+                else:
+                    start_date = datetime.strptime(start_date_str, '%Y-%m-%d').date() if start_date_str else timezone.now().date()
+                    end_date = datetime.strptime(end_date_str, '%Y-%m-%d').date() if end_date_str else start_date + timedelta(days=30)
             except ValueError:
                 return Response(
-                    {'error': 'Formato de fecha inválido. Use YYYY-MM-DD'},
+                    {'error': 'Formato de fecha o cursor inválido. Use YYYY-MM-DD'},
                     status=status.HTTP_400_BAD_REQUEST
                 )
             
+            # Acotar al horizonte de reserva y a páginas de max_range_days días
+            horizon = MultiProfessionalAvailabilityService.get_booking_horizon(service, professional_ids)
+            if horizon:
+                end_date = min(end_date, horizon)
+            page_end = min(end_date, start_date + timedelta(days=self.max_range_days - 1))
+            
             # Obtener resumen de disponibilidad
             availability_summary = MultiProfessionalAvailabilityService.get_availability_summary(
-                service, start_date, end_date, professional_ids
+                service, start_date, page_end, professional_ids
             )
             
             return Response({
@@ -485,9 +609,12 @@ class SmartAvailabilityView(APIView):
                 },
                 'date_range': {
                     'start_date': start_date.isoformat(),
-                    'end_date': end_date.isoformat()
+                    'end_date': page_end.isoformat()
                 },
-                'availability_summary': availability_summary
+                'availability_summary': availability_summary,
+                'next_cursor': encode_availability_cursor(
+                    cursor_scope, page_end + timedelta(days=1), end_date
+                ) if page_end < end_date else None
             })
         
         else:  # mode == 'next_available'
@@ -508,20 +635,11 @@ class SmartAvailabilityView(APIView):
                         status=status.HTTP_404_NOT_FOUND
                     )
             else:
-                # Buscar en todos los profesionales que pueden realizar el servicio
-                next_slots = []
-                professionals = service.professionals.filter(is_active=True)[:5]  # Limitar a 5 profesionales
-                
-                for professional in professionals:
-                    availability_service = AvailabilityCalculationService(professional)
-                    prof_slots = availability_service.get_next_available_slots(
-                        service, days_ahead=30, max_slots=max_slots//len(professionals)
-                    )
-                    next_slots.extend(prof_slots)
-                
-                # Ordenar por fecha
-                next_slots.sort(key=lambda x: x['start_datetime'])
-                next_slots = next_slots[:max_slots]
+                # Buscar en todos los profesionales que pueden realizar el servicio;
+                # la búsqueda se detiene al reunir max_slots slots
+                next_slots = MultiProfessionalAvailabilityService.get_next_available_slots_for_service(
+                    service, days_ahead=30, max_slots=max_slots
+                )
             
             return Response({
                 'mode': mode,
@@ -587,46 +705,14 @@ class ConflictDetectionView(APIView):
                 status=status.HTTP_404_NOT_FOUND
             )
         
-        # Verificar disponibilidad
+        # Verificar disponibilidad y solapamiento con un solo índice de citas
         from schedule.services import AvailabilityCalculationService
         
         availability_service = AvailabilityCalculationService(professional)
-        is_available, reason = availability_service.is_available_at_time(start_datetime, service)
-        
-        conflicts = []
-        
-        if not is_available:
-            conflicts.append({
-                'type': 'schedule_conflict',
-                'reason': reason,
-                'severity': 'high'
-            })
-        
-        # Verificar solapamiento con citas existentes
-        end_datetime = start_datetime + timedelta(minutes=service.total_duration_minutes)
-        overlapping_appointments = Appointment.objects.filter(
-            professional=professional,
-            start_datetime__lt=end_datetime,
-            end_datetime__gt=start_datetime,
-            status__in=['pending', 'confirmed', 'checked_in', 'in_progress']
+        conflicts = availability_service.detect_conflicts(
+            start_datetime, service, exclude_appointment_id
         )
-        
-        if exclude_appointment_id:
-            overlapping_appointments = overlapping_appointments.exclude(id=exclude_appointment_id)
-        
-        for appointment in overlapping_appointments:
-            conflicts.append({
-                'type': 'appointment_conflict',
-                'reason': f'Conflicto con cita de {appointment.client.full_name}',
-                'severity': 'high',
-                'conflicting_appointment': {
-                    'id': str(appointment.id),
-                    'client_name': appointment.client.full_name,
-                    'service_name': appointment.service.name,
-                    'start_datetime': appointment.start_datetime.isoformat(),
-                    'end_datetime': appointment.end_datetime.isoformat()
-                }
-            })
+        end_datetime = start_datetime + timedelta(minutes=service.total_duration_minutes)
         
         return Response({
             'has_conflicts': len(conflicts) > 0,
@@ -643,6 +729,96 @@ class ConflictDetectionView(APIView):
         })
 
 
+class BatchAvailabilityCheckView(APIView):
+    """
+    Vista para verificar la disponibilidad de varios horarios candidatos
+    (citas recurrentes, reprogramación en el calendario, sugerir alternativas)
+    """
+    permission_classes = [IsAuthenticated]
+    max_candidates = 200
+    
+    def post(self, request):
+        """
+        Verificar disponibilidad para una lista de horarios propuestos
+        
+        Body:
+        {
+            "professional_id": "uuid",
+            "service_id": "uuid",
+            "candidates": ["2024-01-15T10:00:00Z", "2024-01-22T10:00:00Z"],
+            "exclude_appointment_id": "uuid" (opcional, para reprogramaciones)
+        }
+        """
+        professional_id = request.data.get('professional_id')
+        service_id = request.data.get('service_id')
+        candidate_strs = request.data.get('candidates')
+        exclude_appointment_id = request.data.get('exclude_appointment_id')
+        
+        if not all([professional_id, service_id, candidate_strs]) or not isinstance(candidate_strs, list):
+            return Response(
+                {'error': 'professional_id, service_id y candidates (lista) son requeridos'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        if len(candidate_strs) > self.max_candidates:
+            return Response(
+                {'error': f'Máximo {self.max_candidates} candidatos por consulta'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        candidates = []
+        for candidate_str in candidate_strs:
+            try:
+                candidates.append(datetime.fromisoformat(str(candidate_str).replace('Z', '+00:00')))
+            except ValueError:
+                return Response(
+                    {'error': f'Formato de fecha inválido: {candidate_str}. Use ISO format'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+        
+        # Obtener objetos
+        try:
+            professional = Professional.objects.get(
+                id=professional_id,
+                organization=request.user.organization
+            )
+            service = Service.objects.get(
+                id=service_id,
+                organization=request.user.organization
+            )
+        except (Professional.DoesNotExist, Service.DoesNotExist):
+            return Response(
+                {'error': 'Profesional o servicio no encontrado'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        
+        # Todos los candidatos se evalúan contra un solo horario e índice de citas
+        from schedule.services import AvailabilityCalculationService
+        
+        availability_service = AvailabilityCalculationService(professional)
+        results = availability_service.is_available_many(
+            candidates, service, exclude_appointment_id
+        )
+        
+        return Response({
+            'professional_id': professional_id,
+            'professional_name': professional.name,
+            'service_id': service_id,
+            'service_name': service.name,
+            'duration_minutes': service.total_duration_minutes,
+            'available_count': sum(1 for result in results if result['is_available']),
+            'results': [
+                {
+                    'start_datetime': result['start_datetime'].isoformat(),
+                    'end_datetime': result['end_datetime'].isoformat(),
+                    'is_available': result['is_available'],
+                    'reason': result['reason']
+                }
+                for result in results
+            ]
+        })
+
+
 class AppointmentHistoryViewSet(viewsets.ReadOnlyModelViewSet):
     """
     ViewSet para ver historial de citas (solo lectura)
@@ -680,12 +856,22 @@ class RecurringAppointmentViewSet(viewsets.ModelViewSet):
     def generate_appointments(self, request, pk=None):
         """Generar citas basadas en la recurrencia"""
         recurring = self.get_object()
-        weeks_ahead = int(request.data.get('weeks_ahead', 4))
+        weeks_ahead = request.data.get('weeks_ahead')
+        try:
+            weeks_ahead = int(weeks_ahead) if weeks_ahead is not None else None
+        except (TypeError, ValueError):
+            return Response(
+                {'error': 'weeks_ahead debe ser un número entero'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
-        # TODO: Implementar algoritmo de generación automática
-        # recurring.generate_next_appointments(weeks_ahead)
+        result = recurring.generate_next_appointments(weeks_ahead, changed_by=request.user)
+        horizon = f'{weeks_ahead} semanas' if weeks_ahead else f'{recurring.advance_booking_days} días'
         
         return Response({
-            'message': f'Generando citas para las próximas {weeks_ahead} semanas',
+            'message': f'{len(result["created"])} citas generadas para los próximos {horizon}',
+            'created_count': len(result['created']),
+            'appointments': AppointmentCalendarSerializer(result['created'], many=True).data,
+            'skipped': result['skipped'],
             'recurring_appointment': self.get_serializer(recurring).data
         })
\ No newline at end of file
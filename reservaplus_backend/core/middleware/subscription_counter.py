@@ -23,6 +23,11 @@ class SubscriptionCounterMiddleware(MiddlewareMixin):
             logger.debug("Response status not 201 or 204, skipping counter update")
             return response
         
+        # Las vistas que ya actualizaron los contadores (creación masiva de citas) lo indican en el request
+        if getattr(request, 'subscription_counters_updated', False):
+            logger.debug("Counters already updated by the view, skipping counter update")
+            return response
+        
         # Solo procesar si el usuario está autenticado y tiene organización
         if (not hasattr(request, 'user') or 
             not request.user.is_authenticated or 
@@ -85,6 +85,56 @@ DATABASES = {
     }
 }
 
+# Cache
+# Redis en producción (REDIS_URL); memoria local en desarrollo
+REDIS_URL = config('REDIS_URL', default='')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django_redis.cache.RedisCache',
+            'LOCATION': REDIS_URL,
+            'OPTIONS': {
+                'CLIENT_CLASS': 'django_redis.client.DefaultClient',
+            },
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'reservaplus',
+        }
+    }
+
+# Segundos que se mantienen los slots de disponibilidad cacheados (0 deshabilita la caché)
+AVAILABILITY_CACHE_TIMEOUT = config('AVAILABILITY_CACHE_TIMEOUT', default=3600, cast=int)
+
+# Segundos que se mantienen las claves de versión de la caché de disponibilidad (como mínimo el doble que los slots)
+AVAILABILITY_VERSION_TIMEOUT = config('AVAILABILITY_VERSION_TIMEOUT', default=604800, cast=int)
+
+# Días de disponibilidad que precalcula warm_availability_cache y si el precálculo tras editar horarios corre en segundo plano
+AVAILABILITY_WARMUP_DAYS = config('AVAILABILITY_WARMUP_DAYS', default=14, cast=int)
+AVAILABILITY_WARMUP_IN_BACKGROUND = config('AVAILABILITY_WARMUP_IN_BACKGROUND', default=True, cast=bool)
+
+# Profesionales × días desde los que los resúmenes de disponibilidad usan un pool de procesos (0 lo deshabilita)
+AVAILABILITY_PARALLEL_THRESHOLD = config('AVAILABILITY_PARALLEL_THRESHOLD', default=5000, cast=int)
+AVAILABILITY_PARALLEL_WORKERS = config('AVAILABILITY_PARALLEL_WORKERS', default=0, cast=int)
+
+# Vistas públicas asíncronas (despliegue con ASGI) y executor acotado para el cálculo de slots ('thread' o 'process')
+PUBLIC_ASYNC_VIEWS = config('PUBLIC_ASYNC_VIEWS', default=False, cast=bool)
+PUBLIC_AVAILABILITY_EXECUTOR = config('PUBLIC_AVAILABILITY_EXECUTOR', default='thread')
+PUBLIC_AVAILABILITY_WORKERS = config('PUBLIC_AVAILABILITY_WORKERS', default=4, cast=int)
+
+# Límites de la disponibilidad pública: días por página y presupuesto por petición (milisegundos, slots y días por bloque)
+PUBLIC_AVAILABILITY_MAX_DAYS = config('PUBLIC_AVAILABILITY_MAX_DAYS', default=31, cast=int)
+AVAILABILITY_BUDGET_MS = config('AVAILABILITY_BUDGET_MS', default=500, cast=int)
+AVAILABILITY_BUDGET_SLOTS = config('AVAILABILITY_BUDGET_SLOTS', default=5000, cast=int)
+AVAILABILITY_BUDGET_CHUNK_DAYS = config('AVAILABILITY_BUDGET_CHUNK_DAYS', default=7, cast=int)
+
+# Reintentos (y espera base en milisegundos) cuando una reserva no obtiene el bloqueo de escritura de SQLite
+BOOKING_LOCK_RETRIES = config('BOOKING_LOCK_RETRIES', default=3, cast=int)
+BOOKING_LOCK_RETRY_DELAY_MS = config('BOOKING_LOCK_RETRY_DELAY_MS', default=50, cast=int)
+
 # Custom User Model
 AUTH_USER_MODEL = 'users.User'
 
@@ -11,6 +11,17 @@ DATABASES = {
     }
 }
 
+# Caché en memoria local durante tests
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'reservaplus-tests',
+    }
+}
+
+# Precálculo de disponibilidad en el mismo hilo (la base en memoria no se comparte entre hilos)
+AVAILABILITY_WARMUP_IN_BACKGROUND = False
+
 # Deshabilitar middlewares problemáticos durante tests
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
@@ -4,7 +4,9 @@ from .models import (
     WeeklySchedule,
     ScheduleBreak,
     ScheduleException,
-    AvailabilitySlot
+    AvailabilitySlot,
+    AvailabilityBitmap,
+    DailyAvailability
 )
 
 
@@ -104,6 +106,22 @@ class ScheduleExceptionAdmin(admin.ModelAdmin):
         )
 
 
+@admin.register(AvailabilityBitmap)
+class AvailabilityBitmapAdmin(admin.ModelAdmin):
+    list_display = [
+        'professional_schedule', 'date', 'cell_minutes', 'version', 'updated_at'
+    ]
+    list_filter = ['date']
+    search_fields = ['professional_schedule__professional__name']
+    readonly_fields = ['id', 'version', 'updated_at']
+    date_hierarchy = 'date'
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related(
+            'professional_schedule__professional'
+        )
+
+
 @admin.register(AvailabilitySlot)
 class AvailabilitySlotAdmin(admin.ModelAdmin):
     list_display = [
@@ -119,3 +137,19 @@ class AvailabilitySlotAdmin(admin.ModelAdmin):
         return super().get_queryset(request).select_related(
             'professional_schedule__professional'
         )
+
+
+@admin.register(DailyAvailability)
+class DailyAvailabilityAdmin(admin.ModelAdmin):
+    list_display = [
+        'professional_schedule', 'date', 'free_minutes', 'earliest_free_time', 'updated_at'
+    ]
+    list_filter = ['date', 'organization']
+    search_fields = ['professional_schedule__professional__name']
+    readonly_fields = ['id', 'updated_at']
+    date_hierarchy = 'date'
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related(
+            'professional_schedule__professional'
+        )
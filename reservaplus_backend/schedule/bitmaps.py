@@ -0,0 +1,80 @@
+# schedule/bitmaps.py
+
+from math import gcd
+from typing import Iterable, Iterator, Tuple
+
+
+MINUTES_PER_DAY = 24 * 60
+
+
+def get_cell_minutes(slot_duration: int, slot_starts: Iterable[int] = ()) -> int:
+    """
+    Tamaño de celda (minutos) en que caben exactamente todos los slots del día
+
+    Es el máximo común divisor de la duración del slot y de los minutos de
+    inicio de cada slot (normalmente la propia duración).
+    """
+    cell_minutes = gcd(slot_duration, MINUTES_PER_DAY)
+    for start_minute in slot_starts:
+        cell_minutes = gcd(cell_minutes, start_minute)
+    return cell_minutes or MINUTES_PER_DAY
+
+
+def cells_in(start_minute: int, end_minute: int, cell_minutes: int) -> int:
+    """
+    Máscara de las celdas completamente contenidas en [start_minute, end_minute)
+    """
+    first_cell = -(-max(start_minute, 0) // cell_minutes)
+    last_cell = min(end_minute, MINUTES_PER_DAY) // cell_minutes
+    if last_cell <= first_cell:
+        return 0
+    return ((1 << (last_cell - first_cell)) - 1) << first_cell
+
+
+def cells_touching(start_minute: int, end_minute: int, cell_minutes: int) -> int:
+    """
+    Máscara de las celdas que se solapan con [start_minute, end_minute)
+    """
+    first_cell = max(start_minute, 0) // cell_minutes
+    last_cell = -(-min(end_minute, MINUTES_PER_DAY) // cell_minutes)
+    if last_cell <= first_cell:
+        return 0
+    return ((1 << (last_cell - first_cell)) - 1) << first_cell
+
+
+def iter_runs(mask: int) -> Iterator[Tuple[int, int]]:
+    """
+    Rangos [primera, última) de celdas consecutivas activas
+    """
+    while mask:
+        first_cell = (mask & -mask).bit_length() - 1
+        shifted = mask >> first_cell
+        length = (shifted ^ (shifted + 1)).bit_length() - 1
+        yield first_cell, first_cell + length
+        mask &= ~(((1 << length) - 1) << first_cell)
+
+
+def remap_cells(mask: int, old_cell_minutes: int, new_cell_minutes: int) -> int:
+    """
+    Convertir una máscara a otro tamaño de celda (conservando solo celdas completas)
+    """
+    if old_cell_minutes == new_cell_minutes:
+        return mask
+    remapped = 0
+    for first_cell, last_cell in iter_runs(mask):
+        remapped |= cells_in(first_cell * old_cell_minutes, last_cell * old_cell_minutes, new_cell_minutes)
+    return remapped
+
+
+def pack_cells(mask: int, cell_minutes: int) -> bytes:
+    """
+    Serializar una máscara (bit i = celda i desde la medianoche)
+    """
+    return mask.to_bytes((MINUTES_PER_DAY // cell_minutes + 7) // 8, 'little')
+
+
+def unpack_cells(data) -> int:
+    """
+    Leer una máscara serializada con pack_cells
+    """
+    return int.from_bytes(bytes(data or b''), 'little')
@@ -0,0 +1,144 @@
+# schedule/budget.py
+
+import time
+from datetime import date, timedelta
+from typing import Awaitable, Callable, Dict, Iterator, List, Optional, Tuple
+from django.conf import settings
+from django.core import signing
+
+
+# Límites por defecto de las consultas de disponibilidad (ver settings)
+DEFAULT_PUBLIC_AVAILABILITY_MAX_DAYS = 31
+DEFAULT_AVAILABILITY_BUDGET_MS = 500
+DEFAULT_AVAILABILITY_BUDGET_SLOTS = 5000
+DEFAULT_AVAILABILITY_BUDGET_CHUNK_DAYS = 7
+
+CURSOR_SALT = 'schedule.availability.cursor'
+
+AvailabilityRange = Dict[str, Dict[date, List]]
+
+
+class ComputeBudget:
+    """
+    Presupuesto de cálculo de una petición de disponibilidad
+
+    Se agota al superar el tiempo (milisegundos) o la cantidad de slots
+    calculados; None deshabilita cada límite.
+    """
+
+    def __init__(self, milliseconds: Optional[int] = None, max_slots: Optional[int] = None):
+        self.milliseconds = milliseconds
+        self.max_slots = max_slots
+        self.slots = 0
+        self._started = time.monotonic()
+
+    @classmethod
+    def from_settings(cls) -> 'ComputeBudget':
+        return cls(
+            getattr(settings, 'AVAILABILITY_BUDGET_MS', DEFAULT_AVAILABILITY_BUDGET_MS),
+            getattr(settings, 'AVAILABILITY_BUDGET_SLOTS', DEFAULT_AVAILABILITY_BUDGET_SLOTS)
+        )
+
+    @property
+    def elapsed_ms(self) -> float:
+        return (time.monotonic() - self._started) * 1000
+
+    def charge(self, slots: int) -> None:
+        self.slots += slots
+
+    @property
+    def exhausted(self) -> bool:
+        if self.max_slots is not None and self.slots >= self.max_slots:
+            return True
+        return self.milliseconds is not None and self.elapsed_ms >= self.milliseconds
+
+
+def get_public_max_days() -> int:
+    return getattr(settings, 'PUBLIC_AVAILABILITY_MAX_DAYS', DEFAULT_PUBLIC_AVAILABILITY_MAX_DAYS)
+
+
+def iter_day_chunks(start_date: date, end_date: date, chunk_days: Optional[int] = None) -> Iterator[Tuple[date, date]]:
+    """
+    Dividir [start_date, end_date] en bloques consecutivos de chunk_days días
+    """
+    chunk_days = chunk_days or getattr(settings, 'AVAILABILITY_BUDGET_CHUNK_DAYS', DEFAULT_AVAILABILITY_BUDGET_CHUNK_DAYS)
+    chunk_start = start_date
+    while chunk_start <= end_date:
+        chunk_end = min(chunk_start + timedelta(days=chunk_days - 1), end_date)
+        yield chunk_start, chunk_end
+        chunk_start = chunk_end + timedelta(days=1)
+
+
+def _merge_chunk(availability_range: AvailabilityRange, chunk_range: AvailabilityRange, budget: ComputeBudget) -> None:
+    for professional_id, slots_by_date in chunk_range.items():
+        availability_range.setdefault(professional_id, {}).update(slots_by_date)
+        budget.charge(sum(len(slots) for slots in slots_by_date.values()))
+
+
+def compute_with_budget(
+    compute: Callable[[date, date], AvailabilityRange],
+    start_date: date,
+    end_date: date,
+    budget: ComputeBudget
+) -> Tuple[AvailabilityRange, date]:
+    """
+    Calcular la disponibilidad por bloques de días hasta agotar el presupuesto
+
+    El primer bloque siempre se calcula, para que cada página avance.
+
+    Returns:
+        Tupla (disponibilidad calculada, último día calculado)
+    """
+    availability_range = {}
+    computed_until = start_date - timedelta(days=1)
+    for chunk_start, chunk_end in iter_day_chunks(start_date, end_date):
+        _merge_chunk(availability_range, compute(chunk_start, chunk_end), budget)
+        computed_until = chunk_end
+        if budget.exhausted:
+            break
+    return availability_range, computed_until
+
+
+async def acompute_with_budget(
+    compute: Callable[[date, date], Awaitable[AvailabilityRange]],
+    start_date: date,
+    end_date: date,
+    budget: ComputeBudget
+) -> Tuple[AvailabilityRange, date]:
+    """
+    Versión asíncrona de compute_with_budget
+    """
+    availability_range = {}
+    computed_until = start_date - timedelta(days=1)
+    for chunk_start, chunk_end in iter_day_chunks(start_date, end_date):
+        _merge_chunk(availability_range, await compute(chunk_start, chunk_end), budget)
+        computed_until = chunk_end
+        if budget.exhausted:
+            break
+    return availability_range, computed_until
+
+
+def encode_availability_cursor(scope: str, next_date: date, end_date: date) -> str:
+    """
+    Token de continuación firmado: próximo día a calcular y fin del rango pedido
+
+    Args:
+        scope: Identifica la consulta (servicio y profesional) para no reutilizar el token en otra
+    """
+    return signing.dumps({'scope': scope, 'next': next_date.isoformat(), 'end': end_date.isoformat()}, salt=CURSOR_SALT)
+
+
+def decode_availability_cursor(token: str, scope: str) -> Tuple[date, date]:
+    """
+    Leer un token de continuación
+
+    Raises:
+        ValueError: Si el token es inválido o pertenece a otra consulta
+    """
+    try:
+        data = signing.loads(token, salt=CURSOR_SALT)
+        if data['scope'] != scope:
+            raise ValueError('cursor de otra consulta')
+        return date.fromisoformat(data['next']), date.fromisoformat(data['end'])
+    except (signing.BadSignature, KeyError, TypeError) as error:
+        raise ValueError('cursor inválido') from error
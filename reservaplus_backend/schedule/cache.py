@@ -0,0 +1,219 @@
+# schedule/cache.py
+
+import time
+from datetime import date, timedelta, tzinfo
+from typing import Dict, Iterable, List
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from .slots import get_timezone_by_name
+
+
+# Duración por defecto (segundos) de los slots cacheados; 0 deshabilita la caché
+DEFAULT_AVAILABILITY_CACHE_TIMEOUT = 60 * 60
+
+# Duración por defecto (segundos) de las claves de versión por profesional y por día
+DEFAULT_AVAILABILITY_VERSION_TIMEOUT = 7 * 24 * 60 * 60
+
+
+def get_availability_cache_timeout():
+    return getattr(settings, 'AVAILABILITY_CACHE_TIMEOUT', DEFAULT_AVAILABILITY_CACHE_TIMEOUT)
+
+
+def get_availability_version_timeout() -> int:
+    """
+    Duración de las claves de versión, siempre mayor que la de los slots
+
+    Las versiones expiran para no acumular una clave por profesional y día
+    consultado. Una versión expirada se reemplaza por un valor nuevo, por lo
+    que los slots guardados bajo la anterior simplemente dejan de leerse.
+    """
+    version_timeout = getattr(settings, 'AVAILABILITY_VERSION_TIMEOUT', DEFAULT_AVAILABILITY_VERSION_TIMEOUT)
+    return max(version_timeout, 2 * get_availability_cache_timeout())
+
+
+def is_availability_cache_enabled() -> bool:
+    """
+    Indicar si la caché de disponibilidad está habilitada
+    """
+    return get_availability_cache_timeout() != 0
+
+
+def _professional_version_key(professional_id) -> str:
+    return f'availability:version:{professional_id}'
+
+
+def _day_version_key(professional_id, target_date: date) -> str:
+    return f'availability:version:{professional_id}:{target_date.isoformat()}'
+
+
+def _professional_timezone_key(professional_id) -> str:
+    return f'availability:timezone:{professional_id}'
+
+
+def _new_version() -> int:
+    # Un valor nuevo (y no 0) evita reutilizar entradas antiguas si la versión fue desalojada
+    return time.time_ns()
+
+
+class AvailabilityCacheLookup:
+    """
+    Resultado de consultar la caché de slots de un profesional para un rango de fechas
+
+    Las claves incluyen la versión del profesional (horario semanal y descansos)
+    y la versión de cada día (citas y excepciones), por lo que una modificación
+    solo invalida los días afectados.
+    """
+
+    def __init__(self, dates: List[date], keys: Dict[date, str], hits: Dict[date, List[Dict]]):
+        self.dates = dates
+        self.keys = keys
+        self.hits = hits
+
+    @property
+    def missing_dates(self) -> List[date]:
+        return [target_date for target_date in self.dates if target_date not in self.hits]
+
+    def store(self, slots_by_date: Dict[date, List[Dict]]) -> None:
+        """
+        Guardar los slots calculados bajo las versiones leídas en la consulta
+        """
+        self.hits.update(slots_by_date)
+        entries = {
+            self.keys[target_date]: slots
+            for target_date, slots in slots_by_date.items()
+            if target_date in self.keys
+        }
+        if entries:
+            cache.set_many(entries, timeout=get_availability_cache_timeout())
+
+    def slots_by_date(self) -> Dict[date, List[Dict]]:
+        return {target_date: self.hits.get(target_date, []) for target_date in self.dates}
+
+
+def lookup_cached_slots(
+    professional_id,
+    start_date: date,
+    end_date: date,
+    duration_minutes: int,
+    available_only: bool = False
+) -> AvailabilityCacheLookup:
+    """
+    Obtener los slots cacheados de un profesional para un rango de fechas
+
+    Los slots completos (con motivo de conflicto) y los de solo disponibles
+    se guardan bajo claves distintas.
+    """
+    dates = [start_date + timedelta(days=offset) for offset in range((end_date - start_date).days + 1)]
+    if not is_availability_cache_enabled() or not dates:
+        return AvailabilityCacheLookup(dates, {}, {})
+
+    professional_key = _professional_version_key(professional_id)
+    day_keys = {target_date: _day_version_key(professional_id, target_date) for target_date in dates}
+    versions = cache.get_many([professional_key, *day_keys.values()])
+
+    for version_key in [professional_key, *day_keys.values()]:
+        if version_key not in versions:
+            version = _new_version()
+            if not cache.add(version_key, version, timeout=get_availability_version_timeout()):
+                version = cache.get(version_key, version)
+            versions[version_key] = version
+
+    professional_version = versions[professional_key]
+    mode = 'available' if available_only else 'all'
+    keys = {
+        target_date: (
+            f'availability:slots:{mode}:{professional_id}:{target_date.isoformat()}:{duration_minutes}:'
+            f'{professional_version}:{versions[day_key]}'
+        )
+        for target_date, day_key in day_keys.items()
+    }
+    cached = cache.get_many(keys.values())
+    hits = {
+        target_date: cached[key]
+        for target_date, key in keys.items()
+        if key in cached
+    }
+    return AvailabilityCacheLookup(dates, keys, hits)
+
+
+def remember_professional_timezones(schedules) -> None:
+    """
+    Guardar la zona horaria de horarios ya cargados (evita consultarla al invalidar)
+    """
+    entries = {
+        _professional_timezone_key(schedule.professional_id): schedule.timezone or ''
+        for schedule in schedules
+        if schedule is not None
+    }
+    if entries:
+        cache.set_many(entries, timeout=get_availability_version_timeout())
+
+
+def forget_professional_timezone(professional_id) -> None:
+    cache.delete(_professional_timezone_key(professional_id))
+
+
+def get_professional_timezones(professional_ids: Iterable) -> Dict[object, tzinfo]:
+    """
+    Zona horaria del horario de cada profesional, en la que se agrupan sus días
+
+    Se lee de la caché; las que faltan se cargan con una sola consulta.
+    """
+    # Importar aquí para evitar import circular
+    from .models import ProfessionalSchedule
+
+    keys = {professional_id: _professional_timezone_key(professional_id) for professional_id in set(professional_ids)}
+    cached = cache.get_many(keys.values())
+    names = {professional_id: cached[key] for professional_id, key in keys.items() if key in cached}
+    missing = [professional_id for professional_id in keys if professional_id not in names]
+    if missing:
+        loaded = {
+            str(professional_id): name
+            for professional_id, name in ProfessionalSchedule.objects.filter(
+                professional_id__in=missing
+            ).values_list('professional_id', 'timezone')
+        }
+        for professional_id in missing:
+            names[professional_id] = loaded.get(str(professional_id)) or ''
+        cache.set_many(
+            {keys[professional_id]: names[professional_id] for professional_id in missing},
+            timeout=get_availability_version_timeout()
+        )
+    return {professional_id: get_timezone_by_name(name) for professional_id, name in names.items()}
+
+
+def invalidate_professional_availability(professional_id) -> None:
+    """
+    Invalidar todos los días cacheados de un profesional (cambios de horario semanal)
+    """
+    _bump_versions([_professional_version_key(professional_id)])
+
+
+def invalidate_professional_dates(professional_id, dates: Iterable[date]) -> None:
+    """
+    Invalidar días específicos de un profesional (citas y excepciones)
+    """
+    _bump_versions([_day_version_key(professional_id, target_date) for target_date in set(dates)])
+
+
+def _bump_versions(version_keys: List[str]) -> None:
+    """
+    Incrementar versiones ahora y nuevamente al confirmar la transacción
+
+    El segundo incremento descarta slots calculados por otras peticiones
+    antes de que los cambios fueran visibles en la base de datos.
+    """
+    if not version_keys or not is_availability_cache_enabled():
+        return
+
+    def bump():
+        version_timeout = get_availability_version_timeout()
+        for version_key in version_keys:
+            try:
+                cache.incr(version_key)
+            except ValueError:
+                cache.set(version_key, _new_version(), timeout=version_timeout)
+
+    bump()
+    transaction.on_commit(bump)
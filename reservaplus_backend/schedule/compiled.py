@@ -0,0 +1,290 @@
+# schedule/compiled.py
+
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import date, time
+from types import MappingProxyType
+from typing import Dict, Iterable, List, Mapping, Optional, Tuple
+from django.db.models import Count, Max, OuterRef, Subquery
+from .models import (
+    ProfessionalSchedule,
+    WeeklySchedule,
+    ScheduleBreak,
+    ScheduleException
+)
+
+
+# Máximo de horarios compilados mantenidos en memoria por proceso
+COMPILED_SCHEDULE_CACHE_SIZE = 1024
+
+_compiled_cache: 'OrderedDict[object, CompiledSchedule]' = OrderedDict()
+_compiled_cache_lock = threading.Lock()
+
+
+@dataclass(frozen=True)
+class CompiledBreak:
+    """
+    Descanso de un horario semanal
+    """
+    start_time: time
+    end_time: time
+    name: str
+
+
+@dataclass(frozen=True)
+class CompiledException:
+    """
+    Excepción de horario para una fecha específica
+    """
+    exception_type: str
+    start_time: Optional[time]
+    end_time: Optional[time]
+    reason: str
+
+    @property
+    def is_day_off(self) -> bool:
+        """
+        Todas las excepciones salvo los horarios especiales bloquean el día completo
+        """
+        return self.exception_type != 'special_hours'
+
+
+@dataclass(frozen=True)
+class CompiledSchedule:
+    """
+    Representación inmutable de un ProfessionalSchedule lista para calcular disponibilidad
+
+    Los índices de las tuplas por día corresponden a WeeklySchedule.weekday (0=Lunes).
+    """
+    schedule_id: object
+    version: tuple
+    working_hours: Tuple[Tuple[Tuple[time, time], ...], ...]
+    breaks: Tuple[Tuple[CompiledBreak, ...], ...]
+    free_intervals: Tuple[Tuple[Tuple[time, time], ...], ...]
+    exceptions: Mapping[date, CompiledException]
+
+    def get_exception(self, target_date: date) -> Optional[CompiledException]:
+        """
+        Obtener excepción activa para una fecha
+        """
+        return self.exceptions.get(target_date)
+
+    def working_hours_for_date(self, target_date: date) -> Tuple[Tuple[time, time], ...]:
+        """
+        Períodos de trabajo de una fecha, considerando excepciones
+        """
+        exception = self.exceptions.get(target_date)
+        if exception:
+            if exception.is_day_off:
+                return ()
+            return ((exception.start_time, exception.end_time),)
+        return self.working_hours[target_date.weekday()]
+
+    def breaks_for_date(self, target_date: date) -> Tuple[CompiledBreak, ...]:
+        """
+        Descansos de una fecha; las excepciones no aplican descansos semanales
+        """
+        if target_date in self.exceptions:
+            return ()
+        return self.breaks[target_date.weekday()]
+
+    def free_intervals_for_date(self, target_date: date) -> Tuple[Tuple[time, time], ...]:
+        """
+        Intervalos de trabajo de una fecha con los descansos ya descontados
+        """
+        exception = self.exceptions.get(target_date)
+        if exception:
+            if exception.is_day_off:
+                return ()
+            return ((exception.start_time, exception.end_time),)
+        return self.free_intervals[target_date.weekday()]
+
+    def __reduce__(self):
+        # MappingProxyType no se puede serializar: las excepciones viajan como dict (ver schedule.parallel)
+        return _restore_compiled_schedule, (
+            self.schedule_id,
+            self.version,
+            self.working_hours,
+            self.breaks,
+            self.free_intervals,
+            dict(self.exceptions)
+        )
+
+
+def _restore_compiled_schedule(schedule_id, version, working_hours, breaks, free_intervals, exceptions):
+    return CompiledSchedule(
+        schedule_id=schedule_id,
+        version=version,
+        working_hours=working_hours,
+        breaks=breaks,
+        free_intervals=free_intervals,
+        exceptions=MappingProxyType(exceptions)
+    )
+
+
+def get_compiled_schedule(schedule: ProfessionalSchedule) -> CompiledSchedule:
+    """
+    Obtener el horario compilado de un profesional desde la caché del proceso
+    """
+    return get_compiled_schedules([schedule.id])[schedule.id]
+
+
+def get_compiled_schedules(schedule_ids: Iterable) -> Dict[object, CompiledSchedule]:
+    """
+    Obtener horarios compilados para varios horarios
+
+    Una consulta obtiene la versión actual (id, updated_at y timestamps/conteos
+    de horarios semanales, descansos y excepciones) de todos los horarios; solo
+    los que cambiaron desde la última compilación se vuelven a cargar.
+    """
+    schedule_ids = list(schedule_ids)
+    if not schedule_ids:
+        return {}
+
+    versions = _get_schedule_versions(schedule_ids)
+
+    compiled = {}
+    stale_ids = []
+    with _compiled_cache_lock:
+        for schedule_id, version in versions.items():
+            cached = _compiled_cache.get(schedule_id)
+            if cached is not None and cached.version == version:
+                _compiled_cache.move_to_end(schedule_id)
+                compiled[schedule_id] = cached
+            else:
+                stale_ids.append(schedule_id)
+
+    if stale_ids:
+        fresh = _compile_schedules(stale_ids, versions)
+        with _compiled_cache_lock:
+            for schedule_id, compiled_schedule in fresh.items():
+                _compiled_cache[schedule_id] = compiled_schedule
+                _compiled_cache.move_to_end(schedule_id)
+            while len(_compiled_cache) > COMPILED_SCHEDULE_CACHE_SIZE:
+                _compiled_cache.popitem(last=False)
+        compiled.update(fresh)
+
+    return compiled
+
+
+def clear_compiled_schedule_cache() -> None:
+    """
+    Vaciar la caché de horarios compilados del proceso
+    """
+    with _compiled_cache_lock:
+        _compiled_cache.clear()
+
+
+def _get_schedule_versions(schedule_ids: List) -> Dict[object, tuple]:
+    """
+    Calcular la versión de cada horario en una sola consulta
+    """
+    def aggregate_subquery(queryset, outer_field, aggregate):
+        return Subquery(
+            queryset.filter(**{outer_field: OuterRef('pk')})
+            .order_by()
+            .values(outer_field)
+            .annotate(value=aggregate)
+            .values('value')[:1]
+        )
+
+    weekly = WeeklySchedule.objects.all()
+    breaks = ScheduleBreak.objects.all()
+    exceptions = ScheduleException.objects.all()
+    breaks_outer = 'weekly_schedule__professional_schedule'
+
+    rows = ProfessionalSchedule.objects.filter(pk__in=schedule_ids).annotate(
+        weekly_updated=aggregate_subquery(weekly, 'professional_schedule', Max('updated_at')),
+        weekly_count=aggregate_subquery(weekly, 'professional_schedule', Count('id')),
+        breaks_updated=aggregate_subquery(breaks, breaks_outer, Max('updated_at')),
+        breaks_count=aggregate_subquery(breaks, breaks_outer, Count('id')),
+        exceptions_updated=aggregate_subquery(exceptions, 'professional_schedule', Max('updated_at')),
+        exceptions_count=aggregate_subquery(exceptions, 'professional_schedule', Count('id')),
+    ).values_list(
+        'id', 'updated_at',
+        'weekly_updated', 'weekly_count',
+        'breaks_updated', 'breaks_count',
+        'exceptions_updated', 'exceptions_count'
+    )
+
+    return {row[0]: tuple(row) for row in rows}
+
+
+def _compile_schedules(schedule_ids: List, versions: Dict[object, tuple]) -> Dict[object, CompiledSchedule]:
+    """
+    Cargar y compilar horarios semanales, descansos y excepciones activas
+    """
+    weekly_by_schedule = {schedule_id: [] for schedule_id in schedule_ids}
+    weekly_schedules = WeeklySchedule.objects.filter(
+        professional_schedule_id__in=schedule_ids,
+        is_active=True
+    ).prefetch_related('breaks').order_by('weekday', 'start_time')
+    for weekly_schedule in weekly_schedules:
+        weekly_by_schedule[weekly_schedule.professional_schedule_id].append(weekly_schedule)
+
+    exceptions_by_schedule = {schedule_id: {} for schedule_id in schedule_ids}
+    exceptions = ScheduleException.objects.filter(
+        professional_schedule_id__in=schedule_ids,
+        is_active=True
+    )
+    for exception in exceptions:
+        exceptions_by_schedule[exception.professional_schedule_id][exception.date] = CompiledException(
+            exception_type=exception.exception_type,
+            start_time=exception.start_time,
+            end_time=exception.end_time,
+            reason=exception.reason
+        )
+
+    compiled = {}
+    for schedule_id in schedule_ids:
+        working_hours = [[] for _ in range(7)]
+        breaks = [[] for _ in range(7)]
+        for weekly_schedule in weekly_by_schedule[schedule_id]:
+            weekday = weekly_schedule.weekday
+            working_hours[weekday].append((weekly_schedule.start_time, weekly_schedule.end_time))
+            for break_item in weekly_schedule.breaks.all():
+                if break_item.is_active:
+                    breaks[weekday].append(CompiledBreak(
+                        start_time=break_item.start_time,
+                        end_time=break_item.end_time,
+                        name=break_item.name
+                    ))
+
+        for day_breaks in breaks:
+            day_breaks.sort(key=lambda break_item: break_item.start_time)
+
+        compiled[schedule_id] = CompiledSchedule(
+            schedule_id=schedule_id,
+            version=versions.get(schedule_id, ()),
+            working_hours=tuple(tuple(periods) for periods in working_hours),
+            breaks=tuple(tuple(day_breaks) for day_breaks in breaks),
+            free_intervals=tuple(
+                _subtract_breaks(working_hours[weekday], breaks[weekday])
+                for weekday in range(7)
+            ),
+            exceptions=MappingProxyType(exceptions_by_schedule[schedule_id])
+        )
+
+    return compiled
+
+
+def _subtract_breaks(
+    periods: List[Tuple[time, time]],
+    breaks: List[CompiledBreak]
+) -> Tuple[Tuple[time, time], ...]:
+    """
+    Descontar los descansos de los períodos de trabajo
+    """
+    free = []
+    for period_start, period_end in sorted(periods):
+        cursor = period_start
+        for break_item in breaks:
+            if break_item.end_time <= cursor or break_item.start_time >= period_end:
+                continue
+            if break_item.start_time > cursor:
+                free.append((cursor, break_item.start_time))
+            cursor = max(cursor, break_item.end_time)
+        if cursor < period_end:
+            free.append((cursor, period_end))
+    return tuple(free)
@@ -0,0 +1,87 @@
+# schedule/heatmap.py
+
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from .models import DailyAvailability
+from .services import AvailabilityCalculationService
+
+
+# Duraciones (minutos) para las que se cuentan slots reservables por día
+DEFAULT_HEATMAP_DURATIONS = (30, 60, 90)
+
+
+def get_heatmap_durations() -> List[int]:
+    return list(getattr(settings, 'AVAILABILITY_HEATMAP_DURATIONS', DEFAULT_HEATMAP_DURATIONS))
+
+
+def refresh_daily_availability(professional_schedule, dates: Iterable[date]) -> Dict:
+    """
+    Recalcular el mapa de calor de un profesional para fechas específicas
+
+    Carga horario compilado y citas una sola vez, resume cada día por conteo
+    (sin construir slots) y escribe solo las filas que cambiaron.
+
+    Returns:
+        Diccionario con los días creados, actualizados y el total
+    """
+    dates = sorted(set(dates))
+    result = {'created': 0, 'updated': 0, 'total': len(dates)}
+    if not dates:
+        return result
+
+    professional = professional_schedule.professional
+    availability_service = AvailabilityCalculationService(professional)
+    availability_service.load_range(dates[0], dates[-1], with_clients=False)
+    durations = get_heatmap_durations()
+
+    existing = {
+        row.date: row
+        for row in DailyAvailability.objects.filter(
+            professional_schedule=professional_schedule,
+            date__in=dates
+        )
+    }
+
+    to_create = []
+    to_update = []
+    now = timezone.now()
+    for target_date in dates:
+        summary = availability_service.summarize_date(target_date, durations)
+        earliest_minute = summary['earliest_free_minute']
+        values = {
+            'free_minutes': summary['free_minutes'],
+            'slot_counts': {str(duration): count for duration, count in summary['slot_counts'].items()},
+            'earliest_free_time': (
+                (datetime.min + timedelta(minutes=earliest_minute)).time()
+                if earliest_minute is not None else None
+            )
+        }
+
+        row = existing.get(target_date)
+        if row is None:
+            to_create.append(DailyAvailability(
+                organization_id=professional.organization_id,
+                professional_schedule=professional_schedule,
+                date=target_date,
+                **values
+            ))
+        elif any(getattr(row, field) != value for field, value in values.items()):
+            for field, value in values.items():
+                setattr(row, field, value)
+            row.updated_at = now
+            to_update.append(row)
+
+    if to_create or to_update:
+        with transaction.atomic():
+            if to_update:
+                DailyAvailability.objects.bulk_update(
+                    to_update, ['free_minutes', 'slot_counts', 'earliest_free_time', 'updated_at']
+                )
+            if to_create:
+                DailyAvailability.objects.bulk_create(to_create)
+
+    result.update(created=len(to_create), updated=len(to_update))
+    return result
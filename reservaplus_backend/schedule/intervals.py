@@ -0,0 +1,82 @@
+# schedule/intervals.py
+
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta
+from typing import Iterable, List
+
+
+class AppointmentIntervalIndex:
+    """
+    Índice ordenado en memoria de las citas de un profesional
+
+    Se construye una vez a partir de citas ya cargadas (una consulta por rango)
+    y responde con búsqueda binaria:
+    - overlaps/overlapping: citas que se solapan con [inicio, fin)
+    - next_free_gap: primer momento libre a partir de t con una duración mínima
+    """
+
+    def __init__(self, appointments: Iterable):
+        self._appointments = sorted(
+            appointments,
+            key=lambda appointment: (appointment.start_datetime, appointment.end_datetime)
+        )
+        self._starts = [appointment.start_datetime for appointment in self._appointments]
+        self._ends = [appointment.end_datetime for appointment in self._appointments]
+
+        # Máximo fin acumulado: permite descartar de una vez las citas que terminan antes
+        self._max_ends = []
+        max_end = None
+        for end_datetime in self._ends:
+            max_end = end_datetime if max_end is None or end_datetime > max_end else max_end
+            self._max_ends.append(max_end)
+
+        # Bloques ocupados fusionados, para buscar huecos libres
+        self._block_starts = []
+        self._block_ends = []
+        for start_datetime, end_datetime in zip(self._starts, self._ends):
+            if self._block_ends and start_datetime <= self._block_ends[-1]:
+                self._block_ends[-1] = max(self._block_ends[-1], end_datetime)
+            else:
+                self._block_starts.append(start_datetime)
+                self._block_ends.append(end_datetime)
+
+    def __len__(self):
+        return len(self._appointments)
+
+    def overlapping(self, start_datetime: datetime, end_datetime: datetime, exclude_id=None) -> List:
+        """
+        Citas que se solapan con [start_datetime, end_datetime), en orden cronológico
+        """
+        # Solo las citas que comienzan antes del fin pueden solaparse
+        index = bisect_left(self._starts, end_datetime) - 1
+        exclude_id = str(exclude_id) if exclude_id else None
+        overlapping = []
+        while index >= 0 and self._max_ends[index] > start_datetime:
+            appointment = self._appointments[index]
+            if self._ends[index] > start_datetime and (exclude_id is None or str(appointment.id) != exclude_id):
+                overlapping.append(appointment)
+            index -= 1
+        overlapping.reverse()
+        return overlapping
+
+    def overlaps(self, start_datetime: datetime, end_datetime: datetime, exclude_id=None) -> bool:
+        """
+        Indicar si alguna cita se solapa con [start_datetime, end_datetime)
+        """
+        if exclude_id:
+            return bool(self.overlapping(start_datetime, end_datetime, exclude_id))
+        index = bisect_left(self._starts, end_datetime) - 1
+        return index >= 0 and self._max_ends[index] > start_datetime
+
+    def next_free_gap(self, after: datetime, min_duration: timedelta = timedelta(0)) -> datetime:
+        """
+        Primer momento >= after desde el que hay min_duration libre de citas
+        """
+        index = bisect_right(self._block_ends, after)
+        candidate = after
+        while index < len(self._block_starts) and (
+            self._block_starts[index] <= candidate or self._block_starts[index] - candidate < min_duration
+        ):
+            candidate = max(candidate, self._block_ends[index])
+            index += 1
+        return candidate
@@ -0,0 +1 @@
+# schedule/management/__init__.py
\ No newline at end of file
@@ -0,0 +1 @@
+# schedule/management/commands/__init__.py
\ No newline at end of file
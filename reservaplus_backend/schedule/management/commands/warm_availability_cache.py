@@ -0,0 +1,53 @@
+# schedule/management/commands/warm_availability_cache.py
+
+import os
+from django.core.management.base import BaseCommand
+from schedule.cache import is_availability_cache_enabled
+from schedule.warmup import get_bookable_professional_ids, get_warmup_days, warm_availability
+
+
+class Command(BaseCommand):
+    help = 'Precalcular la disponibilidad cacheada de los profesionales reservables (tras despliegues y periódicamente)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--organization',
+            type=str,
+            help='Procesar solo una organización específica (UUID)',
+        )
+        parser.add_argument(
+            '--days',
+            type=int,
+            help='Días hacia adelante a precalcular (por defecto AVAILABILITY_WARMUP_DAYS)',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='Procesos en paralelo (1 para ejecutar en el mismo proceso)',
+        )
+
+    def handle(self, *args, **options):
+        if not is_availability_cache_enabled():
+            self.stdout.write(
+                self.style.WARNING('⚠️ La caché de disponibilidad está deshabilitada (AVAILABILITY_CACHE_TIMEOUT=0)')
+            )
+            return
+
+        days = options.get('days') or get_warmup_days()
+        professional_ids = get_bookable_professional_ids(options.get('organization'))
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'🔥 Precalculando {days} días de disponibilidad para {len(professional_ids)} profesionales...'
+            )
+        )
+
+        stats = warm_availability(professional_ids, days=days, workers=max(options['workers'], 1))
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"\n✅ {stats['computed_days']} días calculados para {stats['professionals']} profesionales "
+                f"con {stats['workers']} procesos en {stats['seconds']:.2f}s"
+            )
+        )
@@ -0,0 +1,36 @@
+# Generated by Django 4.2.7 on 2026-10-17 03:29
+
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schedule', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AvailabilityBitmap',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('date', models.DateField()),
+                ('cell_minutes', models.PositiveSmallIntegerField()),
+                ('free_cells', models.BinaryField()),
+                ('blocked_cells', models.BinaryField()),
+                ('blocked_reasons', models.JSONField(blank=True, default=dict)),
+                ('version', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('professional_schedule', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='availability_bitmaps', to='schedule.professionalschedule')),
+            ],
+            options={
+                'verbose_name': 'Mapa de Disponibilidad',
+                'verbose_name_plural': 'Mapas de Disponibilidad',
+                'db_table': 'schedule_availability_bitmap',
+                'ordering': ['date'],
+                'unique_together': {('professional_schedule', 'date')},
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 4.2.7 on 2026-10-17 03:33
+
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('organizations', '0006_clientnote_clientfile'),
+        ('schedule', '0002_availabilitybitmap'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyAvailability',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('date', models.DateField()),
+                ('free_minutes', models.PositiveIntegerField(default=0)),
+                ('slot_counts', models.JSONField(blank=True, default=dict)),
+                ('earliest_free_time', models.TimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('organization', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_availability', to='organizations.organization')),
+                ('professional_schedule', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_availability', to='schedule.professionalschedule')),
+            ],
+            options={
+                'verbose_name': 'Disponibilidad Diaria',
+                'verbose_name_plural': 'Disponibilidad Diaria',
+                'db_table': 'schedule_daily_availability',
+                'ordering': ['date'],
+                'indexes': [models.Index(fields=['organization', 'date'], name='schedule_da_organiz_b40929_idx')],
+                'unique_together': {('professional_schedule', 'date')},
+            },
+        ),
+    ]
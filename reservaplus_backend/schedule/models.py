@@ -3,6 +3,7 @@ import uuid
 from django.core.exceptions import ValidationError
 from datetime import datetime, time, timedelta
 from django.utils import timezone
+from .bitmaps import unpack_cells
 
 # Create your models here.
 
@@ -264,3 +265,93 @@ class AvailabilitySlot(models.Model):
     
     def __str__(self):
         return f"{self.date} {self.start_time} - {self.end_time}"
+
+
+class DailyAvailability(models.Model):
+    """
+    Resumen diario de disponibilidad por profesional (mapa de calor)
+    Tabla desnormalizada para selectores de mes y marketplace: se mantiene
+    actualizada de forma incremental (ver schedule.heatmap)
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    
+    organization = models.ForeignKey(
+        'organizations.Organization',
+        on_delete=models.CASCADE,
+        related_name='daily_availability'
+    )
+    professional_schedule = models.ForeignKey(
+        ProfessionalSchedule,
+        on_delete=models.CASCADE,
+        related_name='daily_availability'
+    )
+    date = models.DateField()
+    
+    # Resumen del día
+    free_minutes = models.PositiveIntegerField(default=0)
+    slot_counts = models.JSONField(default=dict, blank=True)  # Duración (minutos) -> slots disponibles
+    earliest_free_time = models.TimeField(null=True, blank=True)
+    
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'schedule_daily_availability'
+        verbose_name = 'Disponibilidad Diaria'
+        verbose_name_plural = 'Disponibilidad Diaria'
+        unique_together = ['professional_schedule', 'date']
+        ordering = ['date']
+        indexes = [
+            models.Index(fields=['organization', 'date']),
+        ]
+    
+    def __str__(self):
+        return f"{self.professional_schedule} - {self.date}: {self.free_minutes} min libres"
+
+
+class AvailabilityBitmap(models.Model):
+    """
+    Disponibilidad de un profesional en una fecha como mapa de bits
+    Una fila por día en lugar de una fila por slot: cada bit es una celda de
+    cell_minutes minutos desde la medianoche local (ver schedule.bitmaps)
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    
+    professional_schedule = models.ForeignKey(
+        ProfessionalSchedule,
+        on_delete=models.CASCADE,
+        related_name='availability_bitmaps'
+    )
+    date = models.DateField()
+    
+    # Grilla y celdas
+    cell_minutes = models.PositiveSmallIntegerField()
+    free_cells = models.BinaryField()  # Horario de trabajo sin descansos ni citas
+    blocked_cells = models.BinaryField()  # Bloqueos manuales
+    blocked_reasons = models.JSONField(default=dict, blank=True)  # Minuto de inicio -> motivo
+    
+    # Se incrementa con cada cambio del día
+    version = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'schedule_availability_bitmap'
+        verbose_name = 'Mapa de Disponibilidad'
+        verbose_name_plural = 'Mapas de Disponibilidad'
+        unique_together = ['professional_schedule', 'date']
+        ordering = ['date']
+    
+    def __str__(self):
+        return f"{self.professional_schedule} - {self.date} (v{self.version})"
+    
+    @property
+    def free_mask(self) -> int:
+        return unpack_cells(self.free_cells)
+    
+    @property
+    def blocked_mask(self) -> int:
+        return unpack_cells(self.blocked_cells)
+    
+    @property
+    def available_mask(self) -> int:
+        """Celdas libres y no bloqueadas"""
+        return self.free_mask & ~self.blocked_mask
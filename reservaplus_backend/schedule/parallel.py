@@ -0,0 +1,230 @@
+# schedule/parallel.py
+
+import math
+import os
+import threading
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from typing import Dict, List, Optional, Tuple
+import django
+from django.conf import settings
+from organizations.models import Professional
+from .compiled import CompiledSchedule
+from .models import ProfessionalSchedule
+from .services import AvailabilityCalculationService
+from .slots import Slot
+
+
+# Profesionales × días desde los que se reparte el cálculo en procesos; 0 lo deshabilita
+DEFAULT_AVAILABILITY_PARALLEL_THRESHOLD = 5000
+
+# Tareas por proceso: bloques más pequeños reparten mejor la carga entre procesos
+TASKS_PER_WORKER = 4
+
+# Cita reducida a lo que necesita el cálculo de disponibilidad
+SnapshotAppointment = namedtuple('SnapshotAppointment', ['start_datetime', 'end_datetime'])
+
+
+def get_parallel_threshold() -> int:
+    return getattr(settings, 'AVAILABILITY_PARALLEL_THRESHOLD', DEFAULT_AVAILABILITY_PARALLEL_THRESHOLD)
+
+
+def get_parallel_workers() -> int:
+    return getattr(settings, 'AVAILABILITY_PARALLEL_WORKERS', None) or min(os.cpu_count() or 1, 4)
+
+
+@dataclass(frozen=True)
+class AvailabilitySnapshot:
+    """
+    Horario compilado y citas de un profesional para un rango de días
+
+    Solo contiene valores serializables, por lo que los procesos del pool
+    calculan la disponibilidad sin acceder a la base de datos.
+    """
+    professional_id: str
+    professional_name: str
+    schedule_id: object
+    slot_duration: int
+    timezone: str
+    compiled: CompiledSchedule
+    start_date: date
+    end_date: date
+    appointments: Tuple[Tuple[float, float], ...]
+
+    @classmethod
+    def from_service(
+        cls,
+        availability_service: AvailabilityCalculationService,
+        start_date: date,
+        end_date: date
+    ) -> 'AvailabilitySnapshot':
+        """
+        Crear el snapshot de un servicio con el rango ya precargado
+        """
+        schedule = availability_service.schedule
+        return cls(
+            professional_id=str(availability_service.professional.id),
+            professional_name=availability_service.professional.name,
+            schedule_id=schedule.id,
+            slot_duration=schedule.slot_duration,
+            timezone=schedule.timezone,
+            compiled=availability_service._get_compiled_schedule(),
+            start_date=start_date,
+            end_date=end_date,
+            # Timestamps POSIX: se serializan mucho más rápido que datetimes con zona horaria
+            appointments=tuple(
+                (appointment.start_datetime.timestamp(), appointment.end_datetime.timestamp())
+                for appointment_date, appointments in availability_service._appointments_by_date.items()
+                if start_date <= appointment_date <= end_date
+                for appointment in appointments
+            )
+        )
+
+    def restore(self) -> AvailabilityCalculationService:
+        """
+        Reconstruir un servicio de disponibilidad en memoria (sin consultas)
+        """
+        professional = Professional(id=self.professional_id, name=self.professional_name)
+        ProfessionalSchedule(
+            id=self.schedule_id,
+            professional=professional,
+            slot_duration=self.slot_duration,
+            timezone=self.timezone
+        )
+        availability_service = AvailabilityCalculationService(professional)
+        availability_service._compiled = self.compiled
+        availability_service._set_range_data(
+            self.start_date,
+            self.end_date,
+            [
+                SnapshotAppointment(
+                    datetime.fromtimestamp(start_timestamp, dt_timezone.utc),
+                    datetime.fromtimestamp(end_timestamp, dt_timezone.utc)
+                )
+                for start_timestamp, end_timestamp in self.appointments
+            ],
+            with_clients=False
+        )
+        return availability_service
+
+
+def count_snapshot_slots(snapshot: AvailabilitySnapshot, duration_minutes: int) -> List[Tuple[int, int]]:
+    """
+    Contar slots totales y disponibles de cada día del snapshot
+    """
+    availability_service = snapshot.restore()
+    return [
+        availability_service.count_slots_for_date(snapshot.start_date + timedelta(days=offset), duration_minutes)
+        for offset in range((snapshot.end_date - snapshot.start_date).days + 1)
+    ]
+
+
+def render_snapshot_slots(snapshot: AvailabilitySnapshot, duration_minutes: int) -> Dict[date, List[Slot]]:
+    """
+    Calcular los slots libres de cada día del snapshot
+    """
+    availability_service = snapshot.restore()
+    return {
+        target_date: availability_service._calculate_slots_for_date(target_date, duration_minutes, available_only=True)
+        for target_date in (
+            snapshot.start_date + timedelta(days=offset)
+            for offset in range((snapshot.end_date - snapshot.start_date).days + 1)
+        )
+    }
+
+
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_workers = 0
+_executor_lock = threading.Lock()
+
+
+def get_process_pool(workers: int) -> ProcessPoolExecutor:
+    """
+    Pool de procesos compartido por el proceso actual (se crea al primer uso)
+    """
+    global _executor, _executor_workers
+    with _executor_lock:
+        if _executor is None or _executor_workers != workers:
+            if _executor is not None:
+                _executor.shutdown(wait=False)
+            # django.setup prepara los procesos creados con spawn; con fork no hace nada nuevo
+            _executor = ProcessPoolExecutor(max_workers=workers, initializer=django.setup)
+            _executor_workers = workers
+        return _executor
+
+
+def _reset_executor() -> None:
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False)
+        _executor = None
+
+
+def count_slots_range(
+    availability_services: List[AvailabilityCalculationService],
+    start_date: date,
+    end_date: date,
+    duration_minutes: int,
+    parallel: Optional[bool] = None,
+    workers: Optional[int] = None
+) -> Dict[str, List[Tuple[int, int]]]:
+    """
+    Contar slots por profesional y día, en serie o en un pool de procesos
+
+    Los servicios deben tener el rango precargado. Con parallel=None el pool
+    solo se usa si profesionales × días supera AVAILABILITY_PARALLEL_THRESHOLD;
+    cada tarea recibe un snapshot de un profesional y un bloque de días.
+
+    Returns:
+        Diccionario professional_id -> lista de tuplas (total, disponibles) por día
+    """
+    days = (end_date - start_date).days + 1
+    counts = {
+        str(availability_service.professional.id): [(0, 0)] * max(days, 0)
+        for availability_service in availability_services
+    }
+    scheduled = [availability_service for availability_service in availability_services if availability_service.schedule]
+    if days <= 0 or not scheduled:
+        return counts
+
+    workers = workers or get_parallel_workers()
+    if parallel is None:
+        threshold = get_parallel_threshold()
+        parallel = bool(threshold) and len(scheduled) * days >= threshold
+    if not parallel or workers < 2:
+        for availability_service in scheduled:
+            counts[str(availability_service.professional.id)] = [
+                availability_service.count_slots_for_date(start_date + timedelta(days=offset), duration_minutes)
+                for offset in range(days)
+            ]
+        return counts
+
+    # Bloques de días tales que haya unas TASKS_PER_WORKER tareas por proceso
+    chunk_days = max(1, math.ceil(len(scheduled) * days / (workers * TASKS_PER_WORKER)))
+    snapshots = [
+        AvailabilitySnapshot.from_service(
+            availability_service,
+            start_date + timedelta(days=offset),
+            min(start_date + timedelta(days=offset + chunk_days - 1), end_date)
+        )
+        for availability_service in scheduled
+        for offset in range(0, days, chunk_days)
+    ]
+
+    try:
+        results = list(get_process_pool(workers).map(
+            count_snapshot_slots, snapshots, [duration_minutes] * len(snapshots)
+        ))
+    except BrokenProcessPool:
+        # Un proceso murió: se descarta el pool y se calcula en serie
+        _reset_executor()
+        results = [count_snapshot_slots(snapshot, duration_minutes) for snapshot in snapshots]
+
+    for snapshot, snapshot_counts in zip(snapshots, results):
+        offset = (snapshot.start_date - start_date).days
+        counts[snapshot.professional_id][offset:offset + len(snapshot_counts)] = snapshot_counts
+    return counts
@@ -7,7 +7,8 @@ from .models import (
     WeeklySchedule,
     ScheduleBreak,
     ScheduleException,
-    AvailabilitySlot
+    AvailabilitySlot,
+    AvailabilityBitmap
 )
 
 
@@ -114,6 +115,29 @@ class AvailabilitySlotSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at', 'updated_at']
 
 
+class AvailabilityBitmapSerializer(serializers.ModelSerializer):
+    """
+    Serializer para mapas de bits de disponibilidad
+    Las celdas se envían en hexadecimal (bit i = celda i desde la medianoche)
+    """
+    free_cells = serializers.SerializerMethodField()
+    blocked_cells = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = AvailabilityBitmap
+        fields = [
+            'date', 'cell_minutes', 'free_cells', 'blocked_cells',
+            'blocked_reasons', 'version'
+        ]
+        read_only_fields = fields
+    
+    def get_free_cells(self, obj):
+        return bytes(obj.free_cells).hex()
+    
+    def get_blocked_cells(self, obj):
+        return bytes(obj.blocked_cells).hex()
+
+
 class WeeklyScheduleCreateSerializer(serializers.ModelSerializer):
     """
     Serializer para crear horarios semanales con sus breaks
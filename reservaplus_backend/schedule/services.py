@@ -1,15 +1,23 @@
 # schedule/services.py
 
+import asyncio
+import heapq
+from concurrent.futures import Executor
 from datetime import datetime, timedelta, time, date
-from typing import List, Dict, Optional, Tuple
+from itertools import islice
+from typing import Iterator, List, Dict, Optional, Tuple
+from asgiref.sync import sync_to_async
 from django.utils import timezone
-from django.db.models import Q
-from .models import (
-    ProfessionalSchedule, 
-    WeeklySchedule, 
-    ScheduleBreak, 
-    ScheduleException
+from django.db.models import Max, QuerySet
+from .compiled import (
+    CompiledSchedule,
+    CompiledException,
+    get_compiled_schedule,
+    get_compiled_schedules
 )
+from .cache import AvailabilityCacheLookup, lookup_cached_slots
+from .intervals import AppointmentIntervalIndex
+from .slots import Slot, SlotDay, get_schedule_timezone, local_day_bounds, to_minutes
 from organizations.models import Professional, Service
 from appointments.models import Appointment
 
@@ -23,11 +31,20 @@ class AvailabilityCalculationService:
         self.professional = professional
         self.schedule = getattr(professional, 'schedule', None)
         
+        # Horario compilado (ver schedule.compiled) y citas precargadas (ver load_range)
+        self._compiled: Optional[CompiledSchedule] = None
+        self._loaded_range: Optional[Tuple[date, date]] = None
+        self._clients_loaded = False
+        self._appointments_by_date: Dict[date, List[Appointment]] = {}
+        self._interval_index: Optional[AppointmentIntervalIndex] = None
+        self._tzinfo = None
+    
     def get_available_slots(
         self,
         target_date: date,
         service: Service,
-        slot_duration_minutes: Optional[int] = None
+        slot_duration_minutes: Optional[int] = None,
+        available_only: bool = False
     ) -> List[Dict]:
         """
         Calcular slots disponibles para un día específico
@@ -36,47 +53,422 @@ class AvailabilityCalculationService:
             target_date: Fecha objetivo
             service: Servicio a agendar
             slot_duration_minutes: Duración del slot en minutos (opcional)
+            available_only: Omitir slots ocupados y el motivo del conflicto
             
         Returns:
             Lista de diccionarios con información de slots disponibles
         """
-        if not self.schedule:
-            return []
+        slots_by_date = self.get_available_slots_range(
+            target_date, target_date, service, slot_duration_minutes, available_only
+        )
+        return slots_by_date.get(target_date, [])
+    
+    def get_available_slots_range(
+        self,
+        start_date: date,
+        end_date: date,
+        service: Service,
+        slot_duration_minutes: Optional[int] = None,
+        available_only: bool = False
+    ) -> Dict[date, List[Dict]]:
+        """
+        Calcular slots para todos los días de un rango de fechas
+        
+        Carga horarios semanales, descansos, excepciones y citas del rango
+        completo con un número constante de consultas, en lugar de repetir
+        las consultas por cada día. Los días ya calculados se obtienen de la
+        caché de disponibilidad (ver schedule.cache).
+        
+        Args:
+            start_date: Fecha de inicio (inclusive)
+            end_date: Fecha de fin (inclusive)
+            service: Servicio a agendar
+            slot_duration_minutes: Duración del slot en minutos (opcional)
+            available_only: Retornar solo slots libres, sin cargar clientes
+                para explicar los conflictos (calendarios públicos)
+            
+        Returns:
+            Diccionario con la fecha como clave y la lista de slots del día como valor
+        """
+        if not self.schedule or end_date < start_date:
+            return {}
         
         # Obtener duración del servicio
         duration_minutes = slot_duration_minutes or service.total_duration_minutes
         
+        cache_lookup = lookup_cached_slots(
+            self.professional.id, start_date, end_date, duration_minutes, available_only
+        )
+        return self._resolve_cached_slots(cache_lookup, duration_minutes, available_only)
+    
+    def _resolve_cached_slots(
+        self,
+        cache_lookup: AvailabilityCacheLookup,
+        duration_minutes: int,
+        available_only: bool = False
+    ) -> Dict[date, List[Dict]]:
+        """
+        Calcular solo los días ausentes de la caché y guardarlos
+        """
+        missing_dates = cache_lookup.missing_dates
+        if missing_dates:
+            self._ensure_range_loaded(missing_dates[0], missing_dates[-1], with_clients=not available_only)
+            cache_lookup.store({
+                target_date: self._calculate_slots_for_date(target_date, duration_minutes, available_only)
+                for target_date in missing_dates
+            })
+        
+        return cache_lookup.slots_by_date()
+    
+    def iter_available_slots(
+        self,
+        service: Service,
+        start_date: date,
+        end_date: date,
+        not_before: Optional[datetime] = None
+    ) -> Iterator[Dict]:
+        """
+        Generar los slots disponibles en orden cronológico, calculando un día a la vez
+        
+        Los datos del rango se cargan una sola vez; los días solo se calculan a
+        medida que se consumen, por lo que detener la iteración temprano evita
+        calcular el resto del horizonte.
+        
+        Args:
+            service: Servicio a agendar
+            start_date: Fecha de inicio (inclusive)
+            end_date: Fecha de fin (inclusive)
+            not_before: Omitir slots que comiencen antes de este momento (opcional)
+        """
+        if not self.schedule or end_date < start_date:
+            return
+        
+        self._ensure_range_loaded(start_date, end_date, with_clients=False)
+        duration_minutes = service.total_duration_minutes
+        current_date = start_date
+        
+        while current_date <= end_date:
+            daily_slots = self._calculate_slots_for_date(current_date, duration_minutes, available_only=True)
+            daily_slots.sort(key=lambda slot: slot.start_minute)
+            for slot in daily_slots:
+                if not_before is not None and slot['start_datetime'] < not_before:
+                    continue
+                yield slot
+            current_date += timedelta(days=1)
+    
+    def load_range(self, start_date: date, end_date: date, with_clients: bool = True) -> None:
+        """
+        Precargar el horario compilado y las citas activas para un rango de fechas
+        
+        Args:
+            with_clients: Cargar también el cliente y el servicio de cada cita (solo necesario
+                para explicar conflictos)
+        """
+        # Sin horario igual se cargan las citas: el índice de solapamiento las necesita
+        if self.schedule:
+            self._get_compiled_schedule()
+        range_start, range_end = local_day_bounds(start_date, end_date, self.get_timezone())
+        appointments = Appointment.objects.filter(
+            professional=self.professional,
+            start_datetime__gte=range_start,
+            start_datetime__lt=range_end,
+            status__in=Appointment.ACTIVE_STATUSES
+        )
+        appointments = (
+            appointments.select_related('client', 'service') if with_clients
+            else appointments.only(*Appointment.AVAILABILITY_FIELDS)
+        ).order_by('start_datetime')
+        
+        self._set_range_data(start_date, end_date, appointments, with_clients)
+    
+    def _ensure_range_loaded(self, start_date: date, end_date: date, with_clients: bool = True) -> None:
+        """
+        Cargar el rango solo si no está cubierto por los datos precargados
+        """
+        if self._loaded_range and (self._clients_loaded or not with_clients):
+            loaded_start, loaded_end = self._loaded_range
+            if loaded_start <= start_date and end_date <= loaded_end:
+                return
+        self.load_range(start_date, end_date, with_clients)
+    
+    def _get_compiled_schedule(self) -> CompiledSchedule:
+        """
+        Obtener el horario compilado (cacheado por proceso y versión del horario)
+        """
+        if self._compiled is None:
+            self._compiled = get_compiled_schedule(self.schedule)
+        return self._compiled
+    
+    def _set_range_data(self, start_date: date, end_date: date, appointments, with_clients: bool = True) -> None:
+        """
+        Indexar citas precargadas por fecha
+        """
+        tz = self.get_timezone()
+        self._appointments_by_date = {}
+        for appointment in appointments:
+            appointment_date = appointment.start_datetime.astimezone(tz).date()
+            self._appointments_by_date.setdefault(appointment_date, []).append(appointment)
+        self._loaded_range = (start_date, end_date)
+        self._clients_loaded = with_clients
+        self._interval_index = None
+    
+    def get_timezone(self):
+        """
+        Zona horaria del horario del profesional
+        """
+        if self._tzinfo is None:
+            self._tzinfo = get_schedule_timezone(self.schedule)
+        return self._tzinfo
+    
+    def _calculate_slots_for_date(
+        self,
+        target_date: date,
+        duration_minutes: int,
+        available_only: bool = False
+    ) -> List[Slot]:
+        """
+        Generar los slots de un día usando los datos precargados
+        
+        El cálculo trabaja con minutos enteros desde la medianoche local; los
+        slots resultantes son registros compactos (ver schedule.slots).
+        """
+        compiled = self._get_compiled_schedule()
+        
         # Obtener horarios de trabajo para el día
-        working_hours = self._get_working_hours_for_date(target_date)
+        working_hours = compiled.working_hours_for_date(target_date)
         if not working_hours:
             return []
         
-        # Obtener descansos para el día
-        breaks = self._get_breaks_for_date(target_date)
+        slot_day = SlotDay(
+            target_date,
+            self.get_timezone(),
+            duration_minutes,
+            str(self.professional.id),
+            self.professional.name
+        )
         
-        # Obtener citas existentes
-        existing_appointments = self._get_existing_appointments(target_date)
+        # Descansos y citas del día como intervalos en minutos, ordenados por inicio
+        busy_breaks = sorted(
+            (to_minutes(break_item.start_time), to_minutes(break_item.end_time), break_item.name)
+            for break_item in compiled.breaks_for_date(target_date)
+        )
+        busy_appointments = sorted(
+            (
+                (*slot_day.minutes_between(appointment.start_datetime, appointment.end_datetime), appointment)
+                for appointment in self._get_existing_appointments(target_date)
+            ),
+            key=lambda busy: busy[0]
+        )
         
         # Generar slots disponibles
         available_slots = []
         
-        for work_period in working_hours:
+        for start_time, end_time in working_hours:
             slots = self._generate_slots_for_period(
-                target_date,
-                work_period['start_time'],
-                work_period['end_time'],
-                duration_minutes,
-                breaks,
-                existing_appointments
+                slot_day,
+                to_minutes(start_time),
+                to_minutes(end_time),
+                busy_breaks,
+                busy_appointments,
+                available_only
             )
             available_slots.extend(slots)
         
         return available_slots
     
+    def count_slots_for_date(self, target_date: date, duration_minutes: int) -> Tuple[int, int]:
+        """
+        Contar slots totales y disponibles de un día sin construirlos
+        
+        El total sale del largo de cada período y la grilla de slots; los
+        disponibles, de los huecos entre descansos y citas (intervalos ocupados
+        fusionados), contando los inicios de la grilla en los que cabe el servicio.
+        
+        Returns:
+            Tupla (total_slots, available_slots)
+        """
+        compiled = self._get_compiled_schedule()
+        working_hours = compiled.working_hours_for_date(target_date)
+        if not working_hours:
+            return 0, 0
+        
+        step = self.schedule.slot_duration
+        busy_intervals = self._get_busy_minutes_for_date(target_date, compiled)
+        total_slots = 0
+        available_slots = 0
+        
+        for start_time, end_time in working_hours:
+            period_start = to_minutes(start_time)
+            period_end = to_minutes(end_time)
+            last_start = period_end - duration_minutes
+            if last_start < period_start:
+                continue
+            total_slots += (last_start - period_start) // step + 1
+            
+            # Recorrer los huecos libres del período
+            cursor = period_start
+            for busy_start, busy_end in busy_intervals + [(period_end, period_end)]:
+                if busy_end <= cursor and busy_start < period_end:
+                    continue
+                gap_end = min(busy_start, period_end)
+                available_slots += self._count_grid_starts(
+                    period_start, step, cursor, gap_end - duration_minutes
+                )
+                cursor = max(cursor, busy_end)
+                if cursor >= period_end:
+                    break
+        
+        return total_slots, available_slots
+    
+    def _get_busy_minutes_for_date(self, target_date: date, compiled: CompiledSchedule) -> List[Tuple[int, int]]:
+        """
+        Descansos y citas de un día como intervalos en minutos, ordenados y fusionados
+        """
+        slot_day = SlotDay(target_date, self.get_timezone(), 0, '', '')
+        busy_intervals = sorted(
+            [
+                (to_minutes(break_item.start_time), to_minutes(break_item.end_time))
+                for break_item in compiled.breaks_for_date(target_date)
+            ] + [
+                slot_day.minutes_between(appointment.start_datetime, appointment.end_datetime)
+                for appointment in self._get_existing_appointments(target_date)
+            ]
+        )
+        
+        merged = []
+        for busy_start, busy_end in busy_intervals:
+            if merged and busy_start < merged[-1][1]:
+                merged[-1] = (merged[-1][0], max(merged[-1][1], busy_end))
+            else:
+                merged.append((busy_start, busy_end))
+        return merged
+    
+    def summarize_date(self, target_date: date, durations: List[int]) -> Dict:
+        """
+        Resumir la disponibilidad de un día sin construir slots
+        
+        Returns:
+            Diccionario con minutos libres, slots disponibles por duración y
+            primer minuto libre del día (None si no hay)
+        """
+        summary = {
+            'free_minutes': 0,
+            'slot_counts': {duration: 0 for duration in durations},
+            'earliest_free_minute': None
+        }
+        if not self.schedule:
+            return summary
+        
+        compiled = self._get_compiled_schedule()
+        busy_intervals = self._get_busy_minutes_for_date(target_date, compiled)
+        for start_time, end_time in compiled.working_hours_for_date(target_date):
+            cursor = to_minutes(start_time)
+            period_end = to_minutes(end_time)
+            for busy_start, busy_end in busy_intervals + [(period_end, period_end)]:
+                if busy_end <= cursor and busy_start < period_end:
+                    continue
+                gap_end = min(busy_start, period_end)
+                if gap_end > cursor:
+                    summary['free_minutes'] += gap_end - cursor
+                    if summary['earliest_free_minute'] is None or cursor < summary['earliest_free_minute']:
+                        summary['earliest_free_minute'] = cursor
+                cursor = max(cursor, busy_end)
+                if cursor >= period_end:
+                    break
+        
+        for duration in durations:
+            summary['slot_counts'][duration] = self.count_slots_for_date(target_date, duration)[1]
+        return summary
+    
+    @staticmethod
+    def _count_grid_starts(origin: int, step: int, first_start: int, last_start: int) -> int:
+        """
+        Cantidad de inicios origin + k * step dentro de [first_start, last_start]
+        """
+        if last_start < first_start:
+            return 0
+        first_on_grid = origin - ((origin - first_start) // step) * step
+        if first_on_grid > last_start:
+            return 0
+        return (last_start - first_on_grid) // step + 1
+    
+    def get_interval_index(
+        self,
+        start_datetime: datetime,
+        end_datetime: datetime,
+        with_clients: bool = False
+    ) -> AppointmentIntervalIndex:
+        """
+        Obtener el índice de citas del profesional que cubre [start_datetime, end_datetime)
+        
+        Se construye una sola vez sobre las citas del rango cargado (incluye el
+        día anterior, por citas que cruzan la medianoche) y se comparte entre
+        las validaciones de disponibilidad y detección de conflictos.
+        """
+        tz = self.get_timezone()
+        start_date = start_datetime.astimezone(tz).date() - timedelta(days=1)
+        end_date = end_datetime.astimezone(tz).date()
+        
+        previous_range = self._loaded_range
+        self._ensure_range_loaded(start_date, end_date, with_clients)
+        if self._interval_index is None or self._loaded_range != previous_range:
+            self._interval_index = AppointmentIntervalIndex(
+                appointment
+                for appointments in self._appointments_by_date.values()
+                for appointment in appointments
+            )
+        return self._interval_index
+    
+    def detect_conflicts(
+        self,
+        start_datetime: datetime,
+        service: Service,
+        exclude_appointment_id=None
+    ) -> List[Dict]:
+        """
+        Detectar conflictos de horario y de citas para una cita propuesta
+        
+        Returns:
+            Lista de conflictos (schedule_conflict y appointment_conflict)
+        """
+        conflicts = []
+        if timezone.is_naive(start_datetime):
+            start_datetime = timezone.make_aware(start_datetime, self.get_timezone())
+        end_datetime = start_datetime + timedelta(minutes=service.total_duration_minutes)
+        
+        # Índice con clientes: lo reutiliza is_available_at_time y explica los conflictos
+        interval_index = self.get_interval_index(start_datetime, end_datetime, with_clients=True)
+        
+        is_available, reason = self.is_available_at_time(start_datetime, service, exclude_appointment_id)
+        if not is_available:
+            conflicts.append({
+                'type': 'schedule_conflict',
+                'reason': reason,
+                'severity': 'high'
+            })
+        
+        # Verificar solapamiento con citas existentes
+        for appointment in interval_index.overlapping(start_datetime, end_datetime, exclude_appointment_id):
+            conflicts.append({
+                'type': 'appointment_conflict',
+                'reason': f'Conflicto con cita de {appointment.client.full_name}',
+                'severity': 'high',
+                'conflicting_appointment': {
+                    'id': str(appointment.id),
+                    'client_name': appointment.client.full_name,
+                    'service_name': appointment.service.name if appointment.service else None,
+                    'start_datetime': appointment.start_datetime.isoformat(),
+                    'end_datetime': appointment.end_datetime.isoformat()
+                }
+            })
+        
+        return conflicts
+    
     def is_available_at_time(
         self,
         target_datetime: datetime,
-        service: Service
+        service: Service,
+        exclude_appointment_id=None
     ) -> Tuple[bool, str]:
         """
         Verificar si el profesional está disponible en un momento específico
@@ -84,6 +476,7 @@ class AvailabilityCalculationService:
         Args:
             target_datetime: Fecha y hora objetivo
             service: Servicio a agendar
+            exclude_appointment_id: Cita a ignorar (al validar la misma cita que se modifica)
             
         Returns:
             Tupla (is_available, reason)
@@ -97,7 +490,7 @@ class AvailabilityCalculationService:
         
         # Asegurar que target_datetime sea timezone-aware
         if timezone.is_naive(target_datetime):
-            target_datetime = timezone.make_aware(target_datetime)
+            target_datetime = timezone.make_aware(target_datetime, self.get_timezone())
         
         # Verificar tiempo mínimo de anticipación
         min_notice = timedelta(minutes=self.schedule.min_booking_notice)
@@ -109,13 +502,15 @@ class AvailabilityCalculationService:
         if target_datetime > timezone.now() + max_advance:
             return False, f"No se puede reservar con más de {self.schedule.max_booking_advance} minutos de anticipación"
         
-        target_date = target_datetime.date()
-        target_time = target_datetime.time()
+        # Fecha y hora locales en la zona horaria del horario
+        local_datetime = target_datetime.astimezone(self.get_timezone())
+        target_date = local_datetime.date()
+        target_time = local_datetime.time()
         
         # Verificar excepciones de horario
         exception = self._get_schedule_exception(target_date)
         if exception:
-            if exception.exception_type == 'unavailable':
+            if exception.is_day_off:
                 return False, f"No disponible: {exception.reason}"
             elif exception.exception_type == 'special_hours':
                 if not (exception.start_time <= target_time <= exception.end_time):
@@ -133,15 +528,53 @@ class AvailabilityCalculationService:
         
         # Verificar solapamiento con citas existentes
         end_datetime = target_datetime + timedelta(minutes=service.total_duration_minutes)
-        existing_appointments = self._get_existing_appointments(target_date)
-        
-        for appointment in existing_appointments:
-            if (target_datetime < appointment.end_datetime and 
-                end_datetime > appointment.start_datetime):
-                return False, "Ya hay una cita programada en este horario"
+        interval_index = self.get_interval_index(target_datetime, end_datetime)
+        if interval_index.overlaps(target_datetime, end_datetime, exclude_appointment_id):
+            return False, "Ya hay una cita programada en este horario"
         
         return True, "Disponible"
     
+    def is_available_many(
+        self,
+        candidates: List[datetime],
+        service: Service,
+        exclude_appointment_id=None
+    ) -> List[Dict]:
+        """
+        Verificar la disponibilidad de varios horarios candidatos
+        
+        Carga una sola vez el horario compilado y el índice de citas que cubre
+        todos los candidatos; cada candidato se evalúa luego en memoria con las
+        mismas reglas que is_available_at_time.
+        
+        Args:
+            candidates: Fechas y horas de inicio propuestas
+            service: Servicio a agendar
+            exclude_appointment_id: Cita a ignorar (al reprogramar la misma cita)
+            
+        Returns:
+            Lista de resultados en el orden de los candidatos
+        """
+        duration = timedelta(minutes=service.total_duration_minutes)
+        candidates = [
+            timezone.make_aware(candidate, self.get_timezone()) if timezone.is_naive(candidate) else candidate
+            for candidate in candidates
+        ]
+        
+        if candidates and self.schedule and self.schedule.accepts_bookings:
+            self.get_interval_index(min(candidates), max(candidates) + duration)
+        
+        results = []
+        for candidate in candidates:
+            is_available, reason = self.is_available_at_time(candidate, service, exclude_appointment_id)
+            results.append({
+                'start_datetime': candidate,
+                'end_datetime': candidate + duration,
+                'is_available': is_available,
+                'reason': reason
+            })
+        return results
+    
     def get_next_available_slots(
         self,
         service: Service,
@@ -160,11 +593,18 @@ class AvailabilityCalculationService:
             Lista de slots disponibles ordenados por fecha
         """
         all_slots = []
+        if not self.schedule:
+            return all_slots
+        
         current_date = timezone.now().date()
         end_date = current_date + timedelta(days=days_ahead)
+        duration_minutes = service.total_duration_minutes
+        
+        # Una sola carga para toda la ventana; el cálculo se detiene al llegar a max_slots
+        self._ensure_range_loaded(current_date, end_date, with_clients=False)
         
         while current_date <= end_date and len(all_slots) < max_slots:
-            daily_slots = self.get_available_slots(current_date, service)
+            daily_slots = self._calculate_slots_for_date(current_date, duration_minutes, available_only=True)
             all_slots.extend(daily_slots)
             current_date += timedelta(days=1)
         
@@ -177,82 +617,37 @@ class AvailabilityCalculationService:
         """
         Obtener horarios de trabajo para una fecha específica
         """
-        weekday = target_date.weekday()
-        
-        # Verificar excepción de horario
-        exception = self._get_schedule_exception(target_date)
-        if exception:
-            if exception.exception_type == 'unavailable':
-                return []
-            elif exception.exception_type == 'special_hours':
-                return [{
-                    'start_time': exception.start_time,
-                    'end_time': exception.end_time
-                }]
-        
-        # Obtener horarios semanales normales
-        weekly_schedules = self.schedule.weekly_schedules.filter(
-            weekday=weekday,
-            is_active=True
-        )
-        
-        working_hours = []
-        for schedule in weekly_schedules:
-            working_hours.append({
-                'start_time': schedule.start_time,
-                'end_time': schedule.end_time
-            })
-        
-        return working_hours
+        return [
+            {'start_time': start_time, 'end_time': end_time}
+            for start_time, end_time in self._get_compiled_schedule().working_hours_for_date(target_date)
+        ]
     
     def _get_breaks_for_date(self, target_date: date) -> List[Dict]:
         """
         Obtener descansos para una fecha específica
         """
-        weekday = target_date.weekday()
-        
-        # Si hay excepción de horario, no aplicar descansos normales
-        exception = self._get_schedule_exception(target_date)
-        if exception and exception.exception_type in ['unavailable', 'special_hours']:
-            return []
-        
-        breaks = []
-        weekly_schedules = self.schedule.weekly_schedules.filter(
-            weekday=weekday,
-            is_active=True
-        )
-        
-        for schedule in weekly_schedules:
-            for break_item in schedule.breaks.filter(is_active=True):
-                breaks.append({
-                    'start_time': break_item.start_time,
-                    'end_time': break_item.end_time,
-                    'name': break_item.name
-                })
-        
-        return breaks
+        # Si hay excepción de horario, no se aplican descansos normales
+        return [
+            {
+                'start_time': break_item.start_time,
+                'end_time': break_item.end_time,
+                'name': break_item.name
+            }
+            for break_item in self._get_compiled_schedule().breaks_for_date(target_date)
+        ]
     
     def _get_existing_appointments(self, target_date: date) -> List[Appointment]:
         """
         Obtener citas existentes para una fecha
         """
-        return Appointment.objects.filter(
-            professional=self.professional,
-            start_datetime__date=target_date,
-            status__in=['pending', 'confirmed', 'checked_in', 'in_progress']
-        ).order_by('start_datetime')
+        self._ensure_range_loaded(target_date, target_date, with_clients=False)
+        return self._appointments_by_date.get(target_date, [])
     
-    def _get_schedule_exception(self, target_date: date) -> Optional['ScheduleException']:
+    def _get_schedule_exception(self, target_date: date) -> Optional[CompiledException]:
         """
         Obtener excepción de horario para una fecha
         """
-        try:
-            return self.schedule.exceptions.get(
-                date=target_date,
-                is_active=True
-            )
-        except ScheduleException.DoesNotExist:
-            return None
+        return self._get_compiled_schedule().get_exception(target_date)
     
     def _is_time_in_working_hours(self, target_time: time, working_hours: List[Dict]) -> bool:
         """
@@ -275,78 +670,91 @@ class AvailabilityCalculationService:
     
     def _generate_slots_for_period(
         self,
-        target_date: date,
-        start_time: time,
-        end_time: time,
-        duration_minutes: int,
-        breaks: List[Dict],
-        existing_appointments: List[Appointment]
-    ) -> List[Dict]:
+        slot_day: SlotDay,
+        period_start: int,
+        period_end: int,
+        busy_breaks: List[Tuple],
+        busy_appointments: List[Tuple],
+        available_only: bool = False
+    ) -> List[Slot]:
         """
         Generar slots para un período de tiempo específico
+        
+        Recorre los slots en orden con dos punteros sobre los descansos y las
+        citas ordenados por inicio: cada intervalo ocupado se descarta una vez
+        que termina, por lo que el costo es O(slots + descansos + citas). Los
+        slots que caen dentro de un bloque ocupado se emiten de corrido sin
+        volver a evaluar conflictos.
+        
+        Con available_only los bloques ocupados se saltan de una vez hasta el
+        primer slot posterior a su fin, sin construir slots ocupados ni leer
+        el cliente de las citas.
+        
+        Args:
+            slot_day: Datos compartidos de los slots del día
+            period_start: Inicio del período (minutos desde medianoche)
+            period_end: Fin del período (minutos desde medianoche)
+            busy_breaks: Tuplas (inicio, fin, nombre) ordenadas por inicio
+            busy_appointments: Tuplas (inicio, fin, cita) ordenadas por inicio
         """
         slots = []
         
-        # Convertir a datetime para trabajar con intervalos
-        current_datetime = datetime.combine(target_date, start_time)
-        end_datetime = datetime.combine(target_date, end_time)
-        
-        # Asegurar que sean timezone-aware
-        if timezone.is_naive(current_datetime):
-            current_datetime = timezone.make_aware(current_datetime)
-        if timezone.is_naive(end_datetime):
-            end_datetime = timezone.make_aware(end_datetime)
+        slot_interval = self.schedule.slot_duration
+        duration = slot_day.duration_minutes
+        last_start = period_end - duration
+        current = period_start
+        break_index = 0
+        appointment_index = 0
         
-        slot_interval = timedelta(minutes=self.schedule.slot_duration)
-        service_duration = timedelta(minutes=duration_minutes)
+        def skip_until(busy_end):
+            # Primer inicio de la grilla en o después del fin del bloque ocupado
+            steps = -((current - busy_end) // slot_interval)
+            return current + max(steps, 1) * slot_interval
         
-        while current_datetime + service_duration <= end_datetime:
-            slot_end_datetime = current_datetime + service_duration
+        while current <= last_start:
+            slot_end = current + duration
             
-            # Verificar si el slot está libre
-            is_available = True
-            conflict_reason = None
+            # Descartar intervalos que terminaron antes del inicio del slot
+            while break_index < len(busy_breaks) and busy_breaks[break_index][1] <= current:
+                break_index += 1
+            while appointment_index < len(busy_appointments) and busy_appointments[appointment_index][1] <= current:
+                appointment_index += 1
             
-            # Verificar descansos
-            for break_item in breaks:
-                break_start = datetime.combine(target_date, break_item['start_time'])
-                break_end = datetime.combine(target_date, break_item['end_time'])
-                
-                # Asegurar que sean timezone-aware
-                if timezone.is_naive(break_start):
-                    break_start = timezone.make_aware(break_start)
-                if timezone.is_naive(break_end):
-                    break_end = timezone.make_aware(break_end)
-                
-                if (current_datetime < break_end and slot_end_datetime > break_start):
-                    is_available = False
-                    conflict_reason = f"Conflicto con descanso: {break_item['name']}"
-                    break
+            next_break = busy_breaks[break_index] if break_index < len(busy_breaks) else None
+            next_appointment = (
+                busy_appointments[appointment_index]
+                if appointment_index < len(busy_appointments) else None
+            )
+            
+            # Verificar descansos (tienen prioridad como motivo del conflicto)
+            if next_break and next_break[0] < slot_end:
+                if available_only:
+                    current = skip_until(next_break[1])
+                    continue
+                conflict_reason = f"Conflicto con descanso: {next_break[2]}"
+                # Todos los slots que comienzan antes del fin del descanso lo pisan
+                while current < next_break[1] and current <= last_start:
+                    slots.append(Slot(slot_day, current, False, conflict_reason))
+                    current += slot_interval
+                continue
             
             # Verificar citas existentes
-            if is_available:
-                for appointment in existing_appointments:
-                    if (current_datetime < appointment.end_datetime and 
-                        slot_end_datetime > appointment.start_datetime):
-                        is_available = False
-                        conflict_reason = f"Conflicto con cita: {appointment.client.full_name}"
-                        break
+            if next_appointment and next_appointment[0] < slot_end:
+                if available_only:
+                    current = skip_until(next_appointment[1])
+                    continue
+                conflict_reason = f"Conflicto con cita: {next_appointment[2].client.full_name}"
+                # Saltar el bloque de la cita mientras ningún descanso entre en conflicto
+                while (current < next_appointment[1] and current <= last_start and
+                       (not next_break or current + duration <= next_break[0])):
+                    slots.append(Slot(slot_day, current, False, conflict_reason))
+                    current += slot_interval
+                continue
             
-            # Agregar slot
-            slots.append({
-                'start_datetime': current_datetime,
-                'end_datetime': slot_end_datetime,
-                'start_time': current_datetime.time(),
-                'end_time': slot_end_datetime.time(),
-                'duration_minutes': duration_minutes,
-                'is_available': is_available,
-                'conflict_reason': conflict_reason,
-                'professional_id': str(self.professional.id),
-                'professional_name': self.professional.name
-            })
+            slots.append(Slot(slot_day, current))
             
             # Avanzar al siguiente slot
-            current_datetime += slot_interval
+            current += slot_interval
         
         return slots
 
@@ -356,11 +764,149 @@ class MultiProfessionalAvailabilityService:
     Servicio para calcular disponibilidad de múltiples profesionales
     """
     
+    @staticmethod
+    def get_bookable_professionals_queryset(
+        service: Service,
+        professional_ids: Optional[List[str]] = None
+    ) -> QuerySet:
+        """
+        Consulta de profesionales que pueden realizar el servicio y aceptan reservas
+        """
+        # Filtrar por is_active y que tengan horarios con accepts_bookings=True
+        professionals_query = service.professionals.filter(
+            is_active=True,
+            schedule__accepts_bookings=True,
+            schedule__is_active=True
+        ).select_related('schedule')
+        
+        if professional_ids:
+            professionals_query = professionals_query.filter(id__in=professional_ids)
+        
+        return professionals_query
+    
+    @staticmethod
+    def get_bookable_professionals(
+        service: Service,
+        professional_ids: Optional[List[str]] = None
+    ) -> List[Professional]:
+        """
+        Obtener profesionales que pueden realizar el servicio y aceptan reservas
+        """
+        return list(MultiProfessionalAvailabilityService.get_bookable_professionals_queryset(
+            service, professional_ids
+        ))
+    
+    @staticmethod
+    def get_booking_horizon(
+        service: Service,
+        professional_ids: Optional[List[str]] = None
+    ) -> Optional[date]:
+        """
+        Último día reservable del servicio según el mayor max_booking_advance de sus profesionales
+        """
+        max_advance = MultiProfessionalAvailabilityService.get_bookable_professionals_queryset(
+            service, professional_ids
+        ).aggregate(max_advance=Max('schedule__max_booking_advance'))['max_advance']
+        return MultiProfessionalAvailabilityService._horizon_date(max_advance)
+    
+    @staticmethod
+    async def aget_booking_horizon(
+        service: Service,
+        professional_ids: Optional[List[str]] = None
+    ) -> Optional[date]:
+        """
+        Versión asíncrona de get_booking_horizon
+        """
+        aggregated = await MultiProfessionalAvailabilityService.get_bookable_professionals_queryset(
+            service, professional_ids
+        ).aaggregate(max_advance=Max('schedule__max_booking_advance'))
+        return MultiProfessionalAvailabilityService._horizon_date(aggregated['max_advance'])
+    
+    @staticmethod
+    def _horizon_date(max_advance_minutes: Optional[int]) -> Optional[date]:
+        if max_advance_minutes is None:
+            return None
+        return timezone.localtime(timezone.now() + timedelta(minutes=max_advance_minutes)).date()
+    
+    @staticmethod
+    def build_availability_services(
+        professionals: List[Professional],
+        start_date: date,
+        end_date: date,
+        with_clients: bool = True
+    ) -> List[AvailabilityCalculationService]:
+        """
+        Crear servicios de disponibilidad con los datos del rango precargados
+        
+        Obtiene los horarios compilados (ver schedule.compiled) y las citas de
+        todos los profesionales con un número constante de consultas.
+        """
+        availability_services = [
+            AvailabilityCalculationService(professional)
+            for professional in professionals
+        ]
+        MultiProfessionalAvailabilityService.preload_availability_services(
+            availability_services, start_date, end_date, with_clients
+        )
+        return availability_services
+    
+    @staticmethod
+    def preload_availability_services(
+        availability_services: List[AvailabilityCalculationService],
+        start_date: date,
+        end_date: date,
+        with_clients: bool = True
+    ) -> None:
+        """
+        Precargar horarios compilados y citas del rango en servicios ya creados
+        """
+        services_by_schedule = {
+            availability_service.schedule.id: availability_service
+            for availability_service in availability_services
+            if availability_service.schedule
+        }
+        if not services_by_schedule:
+            return
+        
+        compiled_schedules = get_compiled_schedules(services_by_schedule.keys())
+        
+        appointments_by_professional = {
+            availability_service.professional.id: []
+            for availability_service in services_by_schedule.values()
+        }
+        # Días locales de cada horario: el rango cubre todas las zonas horarias involucradas
+        bounds = [
+            local_day_bounds(start_date, end_date, availability_service.get_timezone())
+            for availability_service in services_by_schedule.values()
+        ]
+        appointments = Appointment.objects.filter(
+            professional_id__in=appointments_by_professional.keys(),
+            start_datetime__gte=min(bound[0] for bound in bounds),
+            start_datetime__lt=max(bound[1] for bound in bounds),
+            status__in=Appointment.ACTIVE_STATUSES
+        )
+        appointments = (
+            appointments.select_related('client', 'service') if with_clients
+            else appointments.only(*Appointment.AVAILABILITY_FIELDS)
+        ).order_by('start_datetime')
+        for appointment in appointments:
+            appointments_by_professional[appointment.professional_id].append(appointment)
+        
+        for schedule_id, availability_service in services_by_schedule.items():
+            availability_service._compiled = compiled_schedules[schedule_id]
+            availability_service._set_range_data(
+                start_date,
+                end_date,
+                appointments_by_professional[availability_service.professional.id],
+                with_clients
+            )
+    
     @staticmethod
     def get_available_slots_for_service(
         service: Service,
         target_date: date,
-        professional_ids: Optional[List[str]] = None
+        professional_ids: Optional[List[str]] = None,
+        available_only: bool = False
     ) -> Dict[str, List[Dict]]:
         """
         Obtener slots disponibles para un servicio específico
@@ -369,31 +915,231 @@ class MultiProfessionalAvailabilityService:
             service: Servicio a agendar
             target_date: Fecha objetivo
             professional_ids: IDs de profesionales específicos (opcional)
+            available_only: Retornar solo slots libres, sin motivo de conflicto
             
         Returns:
             Diccionario con professional_id como clave y lista de slots como valor
         """
-        # Obtener profesionales que pueden realizar el servicio
-        # Filtrar por is_active y que tengan horarios con accepts_bookings=True
-        professionals_query = service.professionals.filter(
-            is_active=True,
-            schedule__accepts_bookings=True,
-            schedule__is_active=True
+        availability_range = MultiProfessionalAvailabilityService.get_available_slots_for_service_range(
+            service, target_date, target_date, professional_ids, available_only
         )
+        return {
+            professional_id: slots_by_date.get(target_date, [])
+            for professional_id, slots_by_date in availability_range.items()
+        }
+    
+    @staticmethod
+    def get_available_slots_for_service_range(
+        service: Service,
+        start_date: date,
+        end_date: date,
+        professional_ids: Optional[List[str]] = None,
+        available_only: bool = False
+    ) -> Dict[str, Dict[date, List[Dict]]]:
+        """
+        Obtener slots de un servicio para un rango de fechas
         
-        if professional_ids:
-            professionals_query = professionals_query.filter(id__in=professional_ids)
+        Args:
+            service: Servicio a agendar
+            start_date: Fecha de inicio (inclusive)
+            end_date: Fecha de fin (inclusive)
+            professional_ids: IDs de profesionales específicos (opcional)
+            available_only: Retornar solo slots libres, sin cargar clientes
+            
+        Returns:
+            Diccionario con professional_id como clave y, como valor, un
+            diccionario fecha -> lista de slots
+        """
+        professionals = MultiProfessionalAvailabilityService.get_bookable_professionals(
+            service, professional_ids
+        )
+        duration_minutes = service.total_duration_minutes
         
-        professionals = list(professionals_query)
-        availability_by_professional = {}
+        # Consultar primero la caché: solo se precargan los profesionales con días pendientes
+        availability_services = [
+            AvailabilityCalculationService(professional)
+            for professional in professionals
+        ]
+        cache_lookups = {}
+        for availability_service in availability_services:
+            if availability_service.schedule and start_date <= end_date:
+                cache_lookups[availability_service] = lookup_cached_slots(
+                    availability_service.professional.id, start_date, end_date, duration_minutes, available_only
+                )
+        
+        pending_services = [
+            availability_service
+            for availability_service, cache_lookup in cache_lookups.items()
+            if cache_lookup.missing_dates
+        ]
+        if pending_services:
+            missing_dates = [
+                target_date
+                for availability_service in pending_services
+                for target_date in cache_lookups[availability_service].missing_dates
+            ]
+            MultiProfessionalAvailabilityService.preload_availability_services(
+                pending_services, min(missing_dates), max(missing_dates), with_clients=not available_only
+            )
         
-        for professional in professionals:
-            availability_service = AvailabilityCalculationService(professional)
-            slots = availability_service.get_available_slots(target_date, service)
-            availability_by_professional[str(professional.id)] = slots
+        availability_by_professional = {}
+        for availability_service in availability_services:
+            cache_lookup = cache_lookups.get(availability_service)
+            availability_by_professional[str(availability_service.professional.id)] = (
+                availability_service._resolve_cached_slots(cache_lookup, duration_minutes, available_only)
+                if cache_lookup else {}
+            )
         
         return availability_by_professional
     
+    @staticmethod
+    async def aget_available_slots_for_service_range(
+        service: Service,
+        start_date: date,
+        end_date: date,
+        professional_ids: Optional[List[str]] = None,
+        executor: Optional[Executor] = None
+    ) -> Dict[str, Dict[date, List[Slot]]]:
+        """
+        Versión asíncrona de get_available_slots_for_service_range (solo slots libres)
+        
+        Profesionales y citas se cargan con el ORM asíncrono; el cálculo de
+        cada profesional con días fuera de la caché se envía al executor
+        (hilos o procesos) como un snapshot sin acceso a la base de datos
+        (ver schedule.parallel), y los profesionales se calculan en paralelo.
+        
+        Returns:
+            Diccionario con professional_id como clave y, como valor, un
+            diccionario fecha -> lista de slots
+        """
+        # Importar aquí para evitar import circular
+        from .parallel import AvailabilitySnapshot, render_snapshot_slots
+        
+        professionals = [
+            professional
+            async for professional in MultiProfessionalAvailabilityService.get_bookable_professionals_queryset(
+                service, professional_ids
+            )
+        ]
+        duration_minutes = service.total_duration_minutes
+        if start_date > end_date:
+            return {str(professional.id): {} for professional in professionals}
+        
+        cache_lookups = await sync_to_async(lambda: {
+            professional.id: lookup_cached_slots(professional.id, start_date, end_date, duration_minutes, True)
+            for professional in professionals
+        })()
+        pending = [professional for professional in professionals if cache_lookups[professional.id].missing_dates]
+        
+        if pending:
+            missing_dates = [
+                target_date
+                for professional in pending
+                for target_date in cache_lookups[professional.id].missing_dates
+            ]
+            range_start, range_end = min(missing_dates), max(missing_dates)
+            compiled_schedules = await sync_to_async(get_compiled_schedules)(
+                [professional.schedule.id for professional in pending]
+            )
+            appointments_by_professional = {professional.id: [] for professional in pending}
+            bounds = [
+                local_day_bounds(range_start, range_end, get_schedule_timezone(professional.schedule))
+                for professional in pending
+            ]
+            async for appointment in Appointment.objects.filter(
+                professional_id__in=appointments_by_professional.keys(),
+                start_datetime__gte=min(bound[0] for bound in bounds),
+                start_datetime__lt=max(bound[1] for bound in bounds),
+                status__in=Appointment.ACTIVE_STATUSES
+            ).only(*Appointment.AVAILABILITY_FIELDS).order_by('start_datetime'):
+                appointments_by_professional[appointment.professional_id].append(appointment)
+            
+            snapshots = []
+            for professional in pending:
+                availability_service = AvailabilityCalculationService(professional)
+                availability_service._compiled = compiled_schedules[professional.schedule.id]
+                availability_service._set_range_data(
+                    range_start, range_end, appointments_by_professional[professional.id], with_clients=False
+                )
+                professional_missing = cache_lookups[professional.id].missing_dates
+                snapshots.append(AvailabilitySnapshot.from_service(
+                    availability_service, professional_missing[0], professional_missing[-1]
+                ))
+            
+            loop = asyncio.get_running_loop()
+            results = await asyncio.gather(*(
+                loop.run_in_executor(executor, render_snapshot_slots, snapshot, duration_minutes)
+                for snapshot in snapshots
+            ))
+            
+            def store_results():
+                for professional, slots_by_date in zip(pending, results):
+                    cache_lookup = cache_lookups[professional.id]
+                    cache_lookup.store({
+                        target_date: slots_by_date[target_date]
+                        for target_date in cache_lookup.missing_dates
+                    })
+            await sync_to_async(store_results)()
+        
+        return {
+            str(professional.id): cache_lookups[professional.id].slots_by_date()
+            for professional in professionals
+        }
+    
+    @staticmethod
+    def iter_available_slots_for_service(
+        service: Service,
+        start_date: date,
+        end_date: date,
+        professional_ids: Optional[List[str]] = None,
+        not_before: Optional[datetime] = None
+    ) -> Iterator[Dict]:
+        """
+        Generar los slots disponibles de todos los profesionales en orden cronológico
+        
+        Combina con un heap los generadores perezosos de cada profesional: solo
+        se calculan los días necesarios para producir los slots consumidos.
+        """
+        professionals = MultiProfessionalAvailabilityService.get_bookable_professionals(
+            service, professional_ids
+        )
+        availability_services = MultiProfessionalAvailabilityService.build_availability_services(
+            professionals, start_date, end_date, with_clients=False
+        )
+        return heapq.merge(
+            *(
+                availability_service.iter_available_slots(service, start_date, end_date, not_before)
+                for availability_service in availability_services
+            ),
+            key=lambda slot: slot['start_datetime']
+        )
+    
+    @staticmethod
+    def get_next_available_slots_for_service(
+        service: Service,
+        professional_ids: Optional[List[str]] = None,
+        days_ahead: int = 30,
+        max_slots: int = 20
+    ) -> List[Dict]:
+        """
+        Obtener los próximos slots disponibles entre todos los profesionales
+        
+        Args:
+            service: Servicio a agendar
+            professional_ids: IDs de profesionales específicos (opcional)
+            days_ahead: Días hacia adelante a buscar
+            max_slots: Máximo número de slots a retornar
+            
+        Returns:
+            Lista de slots disponibles ordenados por fecha
+        """
+        now = timezone.now()
+        start_date = now.date()
+        slots = MultiProfessionalAvailabilityService.iter_available_slots_for_service(
+            service, start_date, start_date + timedelta(days=days_ahead), professional_ids, not_before=now
+        )
+        return list(islice(slots, max_slots))
+    
     @staticmethod
     def get_earliest_available_slot(
         service: Service,
@@ -411,38 +1157,18 @@ class MultiProfessionalAvailabilityService:
         Returns:
             Slot más temprano disponible o None si no hay disponibilidad
         """
-        current_date = timezone.now().date()
-        end_date = current_date + timedelta(days=days_ahead)
-        
-        while current_date <= end_date:
-            availability = MultiProfessionalAvailabilityService.get_available_slots_for_service(
-                service, current_date, professional_ids
-            )
-            
-            # Encontrar el slot más temprano del día
-            earliest_slot = None
-            earliest_time = None
-            
-            for professional_id, slots in availability.items():
-                for slot in slots:
-                    if slot['is_available']:
-                        if earliest_time is None or slot['start_datetime'] < earliest_time:
-                            earliest_time = slot['start_datetime']
-                            earliest_slot = slot
-            
-            if earliest_slot:
-                return earliest_slot
-            
-            current_date += timedelta(days=1)
-        
-        return None
+        next_slots = MultiProfessionalAvailabilityService.get_next_available_slots_for_service(
+            service, professional_ids, days_ahead=days_ahead, max_slots=1
+        )
+        return next_slots[0] if next_slots else None
     
     @staticmethod
     def get_availability_summary(
         service: Service,
         start_date: date,
         end_date: date,
-        professional_ids: Optional[List[str]] = None
+        professional_ids: Optional[List[str]] = None,
+        parallel: Optional[bool] = None
     ) -> Dict:
         """
         Obtener resumen de disponibilidad para un período
@@ -452,10 +1178,15 @@ class MultiProfessionalAvailabilityService:
             start_date: Fecha de inicio
             end_date: Fecha de fin
             professional_ids: IDs de profesionales específicos (opcional)
+            parallel: Forzar (True) o evitar (False) el pool de procesos; por
+                defecto se usa sobre AVAILABILITY_PARALLEL_THRESHOLD (ver schedule.parallel)
             
         Returns:
             Resumen de disponibilidad
         """
+        # Importar aquí para evitar import circular
+        from .parallel import count_slots_range
+        
         summary = {
             'total_days': (end_date - start_date).days + 1,
             'available_days': 0,
@@ -465,20 +1196,27 @@ class MultiProfessionalAvailabilityService:
             'daily_availability': {}
         }
         
+        # Solo se cuentan slots (ver count_slots_for_date): no se construye ninguno
+        professionals = MultiProfessionalAvailabilityService.get_bookable_professionals(
+            service, professional_ids
+        )
+        availability_services = MultiProfessionalAvailabilityService.build_availability_services(
+            professionals, start_date, end_date, with_clients=False
+        )
+        counts_by_professional = count_slots_range(
+            availability_services, start_date, end_date, service.total_duration_minutes, parallel=parallel
+        )
+        
         current_date = start_date
+        day_index = 0
         
         while current_date <= end_date:
-            availability = MultiProfessionalAvailabilityService.get_available_slots_for_service(
-                service, current_date, professional_ids
-            )
-            
             day_total_slots = 0
             day_available_slots = 0
             day_has_availability = False
             
-            for professional_id, slots in availability.items():
-                prof_total = len(slots)
-                prof_available = len([s for s in slots if s['is_available']])
+            for professional_id, counts in counts_by_professional.items():
+                prof_total, prof_available = counts[day_index]
                 
                 day_total_slots += prof_total
                 day_available_slots += prof_available
@@ -513,5 +1251,6 @@ class MultiProfessionalAvailabilityService:
                 summary['available_days'] += 1
             
             current_date += timedelta(days=1)
+            day_index += 1
         
         return summary
\ No newline at end of file
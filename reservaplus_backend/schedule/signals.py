@@ -0,0 +1,164 @@
+# schedule/signals.py
+
+from datetime import timedelta
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+from appointments.models import Appointment
+from .cache import (
+    forget_professional_timezone,
+    get_professional_timezones,
+    invalidate_professional_availability,
+    invalidate_professional_dates
+)
+from .models import ProfessionalSchedule, WeeklySchedule, ScheduleBreak, ScheduleException
+from .utils import refresh_materialized_availability
+from .warmup import enqueue_availability_warmup
+
+
+def _local_dates(start_datetime, end_datetime, tz):
+    """
+    Fechas locales (en la zona horaria del horario) cubiertas por un intervalo
+    """
+    if start_datetime is None:
+        return ()
+    start_date = timezone.localtime(start_datetime, tz).date()
+    end_date = timezone.localtime(end_datetime, tz).date() if end_datetime else start_date
+    return tuple(
+        start_date + timedelta(days=offset)
+        for offset in range(max((end_date - start_date).days, 0) + 1)
+    )
+
+
+def _refresh_materialized_on_commit(professional_id, dates=None, weekdays=None):
+    """
+    Recalcular los AvailabilitySlot materializados de los días afectados al confirmar la transacción
+    """
+    transaction.on_commit(
+        lambda: refresh_materialized_availability(professional_id, dates=dates, weekdays=weekdays)
+    )
+
+
+def _professional_id_for_schedule(schedule_id):
+    return ProfessionalSchedule.objects.filter(pk=schedule_id).values_list('professional_id', flat=True).first()
+
+
+def _appointment_snapshot(instance):
+    # Leer de __dict__ para no disparar consultas con campos diferidos
+    values = instance.__dict__
+    status = values.get('status')
+    return (
+        values.get('professional_id'),
+        values.get('start_datetime'),
+        values.get('end_datetime'),
+        None if status is None else status in Appointment.ACTIVE_STATUSES
+    )
+
+
+def _invalidate_appointment_snapshots(snapshots):
+    """
+    Invalidar los días de las citas, agrupados en la zona horaria del horario de cada profesional
+    """
+    snapshots = [snapshot for snapshot in snapshots if snapshot[0]]
+    if not snapshots:
+        return
+    timezones = get_professional_timezones(snapshot[0] for snapshot in snapshots)
+    dates_by_professional = {}
+    for professional_id, start_datetime, end_datetime, _ in snapshots:
+        dates_by_professional.setdefault(professional_id, set()).update(
+            _local_dates(start_datetime, end_datetime, timezones[professional_id])
+        )
+    for professional_id, dates in dates_by_professional.items():
+        invalidate_professional_dates(professional_id, dates)
+        _refresh_materialized_on_commit(professional_id, dates=dates)
+
+
+@receiver(post_init, sender=Appointment)
+def remember_appointment_slot(sender, instance, **kwargs):
+    """
+    Recordar profesional y horario originales para invalidar también el día anterior de una cita movida
+    """
+    instance._availability_snapshot = _appointment_snapshot(instance)
+
+
+@receiver(post_save, sender=Appointment)
+def invalidate_appointment_availability(sender, instance, created, **kwargs):
+    """
+    Invalidar la disponibilidad cacheada de los días de la cita (creación, cancelación, reprogramación)
+    
+    Los cambios de estado que no liberan ni ocupan la agenda (confirmar,
+    check-in, iniciar) con el mismo horario no invalidan nada.
+    """
+    current = _appointment_snapshot(instance)
+    previous = getattr(instance, '_availability_snapshot', current)
+    instance._availability_snapshot = current
+    if not created and previous == current and current[3] is not None:
+        return
+    _invalidate_appointment_snapshots({previous, current})
+
+
+@receiver(post_delete, sender=Appointment)
+def invalidate_deleted_appointment_availability(sender, instance, **kwargs):
+    _invalidate_appointment_snapshots([_appointment_snapshot(instance)])
+
+
+@receiver(post_init, sender=ScheduleException)
+def remember_exception_date(sender, instance, **kwargs):
+    instance._availability_snapshot = instance.__dict__.get('date')
+
+
+@receiver(post_save, sender=ScheduleException)
+@receiver(post_delete, sender=ScheduleException)
+def invalidate_exception_availability(sender, instance, **kwargs):
+    """
+    Invalidar solo las fechas afectadas por una excepción de horario
+    """
+    professional_id = _professional_id_for_schedule(instance.professional_schedule_id)
+    if professional_id:
+        dates = {instance.date, getattr(instance, '_availability_snapshot', None) or instance.date}
+        invalidate_professional_dates(professional_id, dates)
+        _refresh_materialized_on_commit(professional_id, dates=dates)
+        enqueue_availability_warmup(professional_id)
+    instance._availability_snapshot = instance.date
+
+
+@receiver(post_save, sender=ProfessionalSchedule)
+@receiver(post_delete, sender=ProfessionalSchedule)
+def invalidate_schedule_availability(sender, instance, **kwargs):
+    forget_professional_timezone(instance.professional_id)
+    invalidate_professional_availability(instance.professional_id)
+    _refresh_materialized_on_commit(instance.professional_id)
+    enqueue_availability_warmup(instance.professional_id)
+
+
+@receiver(post_init, sender=WeeklySchedule)
+def remember_weekly_schedule_weekday(sender, instance, **kwargs):
+    instance._availability_snapshot = instance.__dict__.get('weekday')
+
+
+@receiver(post_save, sender=WeeklySchedule)
+@receiver(post_delete, sender=WeeklySchedule)
+def invalidate_weekly_schedule_availability(sender, instance, **kwargs):
+    professional_id = _professional_id_for_schedule(instance.professional_schedule_id)
+    if professional_id:
+        invalidate_professional_availability(professional_id)
+        weekdays = {instance.weekday, getattr(instance, '_availability_snapshot', None)} - {None}
+        _refresh_materialized_on_commit(professional_id, weekdays=weekdays)
+        enqueue_availability_warmup(professional_id)
+    instance._availability_snapshot = instance.weekday
+
+
+@receiver(post_save, sender=ScheduleBreak)
+@receiver(post_delete, sender=ScheduleBreak)
+def invalidate_break_availability(sender, instance, **kwargs):
+    weekly_schedule = (
+        WeeklySchedule.objects.filter(pk=instance.weekly_schedule_id)
+        .values_list('professional_schedule__professional_id', 'weekday')
+        .first()
+    )
+    if weekly_schedule:
+        professional_id, weekday = weekly_schedule
+        invalidate_professional_availability(professional_id)
+        _refresh_materialized_on_commit(professional_id, weekdays={weekday})
+        enqueue_availability_warmup(professional_id)
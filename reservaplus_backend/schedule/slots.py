@@ -0,0 +1,207 @@
+# schedule/slots.py
+
+from collections.abc import Mapping
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone, tzinfo
+from math import gcd
+from typing import Dict, Iterable, Optional, Tuple
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+from django.utils import timezone
+
+
+SLOT_KEYS = (
+    'start_datetime',
+    'end_datetime',
+    'start_time',
+    'end_time',
+    'duration_minutes',
+    'is_available',
+    'conflict_reason',
+    'professional_id',
+    'professional_name',
+)
+
+
+def to_minutes(value: time) -> int:
+    """
+    Minutos desde la medianoche local
+    """
+    return value.hour * 60 + value.minute
+
+
+def format_minutes(minute: int) -> str:
+    """
+    Minutos desde la medianoche en formato HH:MM
+    """
+    return f'{minute // 60:02d}:{minute % 60:02d}'
+
+
+def encode_compact_slots(slots: Iterable['Slot']) -> Optional[Dict]:
+    """
+    Codificar los slots disponibles de un profesional en un día
+    
+    Retorna la hora base (primer slot libre), el paso en minutos entre
+    inicios y una cadena de bits donde el carácter i indica si el slot que
+    comienza en base + i * paso está libre.
+    """
+    starts = sorted({slot.start_minute for slot in slots if slot.is_available})
+    if not starts:
+        return None
+    
+    base = starts[0]
+    step = 0
+    for start_minute in starts:
+        step = gcd(step, start_minute - base)
+    step = step or 1
+    
+    bits = ['0'] * ((starts[-1] - base) // step + 1)
+    for start_minute in starts:
+        bits[(start_minute - base) // step] = '1'
+    return {
+        'base': format_minutes(base),
+        'step': step,
+        'slots': ''.join(bits)
+    }
+
+
+def get_schedule_timezone(schedule) -> tzinfo:
+    """
+    Zona horaria de un ProfessionalSchedule (la del proyecto si no es válida)
+    """
+    return get_timezone_by_name(getattr(schedule, 'timezone', None))
+
+
+def get_timezone_by_name(name: Optional[str]) -> tzinfo:
+    """
+    Zona horaria a partir de su nombre (la del proyecto si no es válido)
+    """
+    if name:
+        try:
+            return ZoneInfo(name)
+        except (ZoneInfoNotFoundError, ValueError):
+            pass
+    return timezone.get_current_timezone()
+
+
+def local_day_bounds(start_date: date, end_date: date, tz: tzinfo) -> Tuple[datetime, datetime]:
+    """
+    Inicio y fin (exclusivo) de los días locales start_date..end_date en la zona tz
+
+    Para filtrar citas por día local del horario: start_datetime__date usa la
+    zona del proyecto, que puede no coincidir con la del profesional.
+    """
+    return (
+        timezone.make_aware(datetime.combine(start_date, time.min), tz),
+        timezone.make_aware(datetime.combine(end_date + timedelta(days=1), time.min), tz)
+    )
+
+
+class SlotDay:
+    """
+    Datos compartidos por todos los slots de un profesional en un día
+
+    Los minutos se cuentan desde la medianoche local en la zona horaria del
+    horario; el desfase UTC del día se calcula una sola vez.
+    """
+    __slots__ = (
+        'date', 'tzinfo', 'duration_minutes', 'professional_id', 'professional_name',
+        '_midnight', '_midnight_timestamp'
+    )
+
+    def __init__(
+        self,
+        target_date: date,
+        tz: tzinfo,
+        duration_minutes: int,
+        professional_id: str,
+        professional_name: str
+    ):
+        self.date = target_date
+        self.tzinfo = tz
+        self.duration_minutes = duration_minutes
+        self.professional_id = professional_id
+        self.professional_name = professional_name
+        self._midnight = datetime.combine(target_date, time(0, 0))
+        # Desfase al mediodía: evita el cambio de horario, que ocurre de madrugada
+        offset = tz.utcoffset(datetime.combine(target_date, time(12, 0))) or timedelta(0)
+        self._midnight_timestamp = (self._midnight - offset).replace(tzinfo=dt_timezone.utc).timestamp()
+
+    def __getstate__(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __setstate__(self, state):
+        for name, value in state.items():
+            setattr(self, name, value)
+
+    def to_datetime(self, minute: int) -> datetime:
+        """
+        Convertir un minuto del día en datetime con zona horaria
+        """
+        return (self._midnight + timedelta(minutes=minute)).replace(tzinfo=self.tzinfo)
+
+    def minutes_between(self, start_datetime: datetime, end_datetime: datetime):
+        """
+        Intervalo [inicio, fin) en minutos del día, redondeado hacia afuera
+        """
+        start_seconds = start_datetime.timestamp() - self._midnight_timestamp
+        end_seconds = end_datetime.timestamp() - self._midnight_timestamp
+        return int(start_seconds // 60), -int(-end_seconds // 60)
+
+
+class Slot(Mapping):
+    """
+    Slot de disponibilidad compacto
+
+    Guarda solo el minuto de inicio, el estado y el motivo del conflicto; el
+    resto se deriva del SlotDay compartido. Se lee como el diccionario que
+    retornaba el cálculo original (slot['start_datetime'], slot.get(...)),
+    por lo que las vistas y serializadores no cambian; los datetimes solo se
+    construyen al leerlos.
+    """
+    __slots__ = ('day', 'start_minute', 'is_available', 'conflict_reason')
+
+    def __init__(self, day: SlotDay, start_minute: int, is_available: bool = True, conflict_reason: Optional[str] = None):
+        self.day = day
+        self.start_minute = start_minute
+        self.is_available = is_available
+        self.conflict_reason = conflict_reason
+
+    @property
+    def end_minute(self) -> int:
+        return self.start_minute + self.day.duration_minutes
+
+    def __getitem__(self, key):
+        day = self.day
+        if key == 'start_datetime':
+            return day.to_datetime(self.start_minute)
+        if key == 'end_datetime':
+            return day.to_datetime(self.end_minute)
+        if key == 'start_time':
+            return day.to_datetime(self.start_minute).time()
+        if key == 'end_time':
+            return day.to_datetime(self.end_minute).time()
+        if key == 'duration_minutes':
+            return day.duration_minutes
+        if key == 'is_available':
+            return self.is_available
+        if key == 'conflict_reason':
+            return self.conflict_reason
+        if key == 'professional_id':
+            return day.professional_id
+        if key == 'professional_name':
+            return day.professional_name
+        raise KeyError(key)
+
+    def __iter__(self):
+        return iter(SLOT_KEYS)
+
+    def __len__(self):
+        return len(SLOT_KEYS)
+
+    def __getstate__(self):
+        return (self.day, self.start_minute, self.is_available, self.conflict_reason)
+
+    def __setstate__(self, state):
+        self.day, self.start_minute, self.is_available, self.conflict_reason = state
+
+    def __repr__(self):
+        return f"Slot({self.day.professional_name}, {self['start_datetime'].isoformat()}, available={self.is_available})"
@@ -1,3 +1,349 @@
-from django.test import TestCase
+# schedule/tests.py
 
-# Create your tests here.
+import pickle
+import random
+from datetime import datetime, time, date, timedelta, timezone as dt_timezone
+from types import MappingProxyType
+from django.test import SimpleTestCase
+from django.utils import timezone
+from organizations.models import Professional, Client
+from appointments.models import Appointment
+from schedule.bitmaps import cells_in, cells_touching, get_cell_minutes, iter_runs, pack_cells, remap_cells, unpack_cells
+from schedule.compiled import CompiledBreak, CompiledException, CompiledSchedule, _subtract_breaks
+from schedule.intervals import AppointmentIntervalIndex
+from schedule.models import ProfessionalSchedule
+from schedule.parallel import AvailabilitySnapshot, count_slots_range
+from schedule.services import AvailabilityCalculationService
+from schedule.slots import Slot
+
+
+class CountingList(list):
+    """
+    Lista que cuenta las lecturas por índice (sondeos de la barrida sobre intervalos ocupados)
+    """
+
+    def __init__(self, items, counter):
+        super().__init__(items)
+        self.counter = counter
+
+    def __getitem__(self, index):
+        self.counter[0] += 1
+        return super().__getitem__(index)
+
+
+class SlotGenerationBenchmarkTests(SimpleTestCase):
+    """
+    Benchmark de generación de slots con días muy cargados (sin base de datos)
+    """
+
+    target_date = date(2030, 1, 7)
+
+    def setUp(self):
+        """Configurar profesional y horario en memoria"""
+        self.professional = Professional(name="Benchmark")
+        ProfessionalSchedule(professional=self.professional, slot_duration=1)
+        self.availability_service = AvailabilityCalculationService(self.professional)
+        self.client = Client(first_name="Juan", last_name="Pérez")
+
+    def _build_appointments(self, count, minutes=1, gap=0):
+        """Crear citas consecutivas desde las 00:00 (en UTC, como las retorna la base de datos)"""
+        appointments = []
+        start = timezone.make_aware(datetime.combine(self.target_date, time(0, 0))).astimezone(dt_timezone.utc)
+        for index in range(count):
+            appointment_start = start + timedelta(minutes=index * (minutes + gap))
+            appointments.append(Appointment(
+                client=self.client,
+                start_datetime=appointment_start,
+                end_datetime=appointment_start + timedelta(minutes=minutes)
+            ))
+        return appointments
+
+    def _generate(self, appointments, breaks=None, duration_minutes=1, end_time=time(23, 59), available_only=False):
+        """Calcular los slots del día con un horario compilado en memoria"""
+        working_hours = [()] * 7
+        day_breaks = [()] * 7
+        weekday = self.target_date.weekday()
+        working_hours[weekday] = ((time(0, 0), end_time),)
+        day_breaks[weekday] = tuple(sorted(breaks or [], key=lambda break_item: break_item.start_time))
+        self.availability_service._compiled = CompiledSchedule(
+            schedule_id=None,
+            version=(),
+            working_hours=tuple(working_hours),
+            breaks=tuple(day_breaks),
+            free_intervals=tuple(_subtract_breaks(working_hours[day], day_breaks[day]) for day in range(7)),
+            exceptions=MappingProxyType({})
+        )
+        self.availability_service._set_range_data(self.target_date, self.target_date, appointments)
+        return self.availability_service._calculate_slots_for_date(
+            self.target_date, duration_minutes, available_only
+        )
+
+    def _count_probes(self, appointments, end_time=time(23, 59)):
+        """Calcular el día contando las lecturas de los descansos y citas ordenados"""
+        self._generate(appointments, end_time=end_time)
+        counter = [0]
+        generate_slots_for_period = self.availability_service._generate_slots_for_period
+
+        def counting_generate(slot_day, period_start, period_end, busy_breaks, busy_appointments, available_only=False):
+            return generate_slots_for_period(
+                slot_day, period_start, period_end,
+                CountingList(busy_breaks, counter), CountingList(busy_appointments, counter),
+                available_only
+            )
+
+        self.availability_service._generate_slots_for_period = counting_generate
+        try:
+            slots = self.availability_service._calculate_slots_for_date(self.target_date, 1)
+        finally:
+            del self.availability_service._generate_slots_for_period
+        return len(slots), counter[0]
+
+    def test_matches_brute_force(self):
+        """La barrida produce exactamente los mismos slots que la comparación exhaustiva"""
+        appointments = self._build_appointments(40, minutes=25, gap=10)
+        breaks = [
+            CompiledBreak(start_time=time(12, 0), end_time=time(13, 0), name='Almuerzo'),
+            CompiledBreak(start_time=time(16, 10), end_time=time(16, 40), name='Café'),
+        ]
+        self.availability_service.schedule.slot_duration = 15
+
+        slots = self._generate(appointments, breaks, duration_minutes=45, end_time=time(20, 0))
+
+        for slot in slots:
+            expected_reason = None
+            for break_item in breaks:
+                break_start = timezone.make_aware(datetime.combine(self.target_date, break_item.start_time))
+                break_end = timezone.make_aware(datetime.combine(self.target_date, break_item.end_time))
+                if slot['start_datetime'] < break_end and slot['end_datetime'] > break_start:
+                    expected_reason = f"Conflicto con descanso: {break_item.name}"
+                    break
+            if expected_reason is None:
+                for appointment in appointments:
+                    if (slot['start_datetime'] < appointment.end_datetime and
+                            slot['end_datetime'] > appointment.start_datetime):
+                        expected_reason = f"Conflicto con cita: {appointment.client.full_name}"
+                        break
+            self.assertEqual(slot['conflict_reason'], expected_reason)
+            self.assertEqual(slot['is_available'], expected_reason is None)
+
+        self.assertEqual(len(slots), (20 * 60 - 45) // 15 + 1)
+
+        # El modo solo disponibles salta los bloques ocupados y produce los mismos slots libres
+        available = self._generate(appointments, breaks, duration_minutes=45, end_time=time(20, 0), available_only=True)
+        self.assertEqual(available, [slot for slot in slots if slot['is_available']])
+
+        # El conteo por intervalos coincide sin construir slots
+        self.assertEqual(
+            self.availability_service.count_slots_for_date(self.target_date, 45),
+            (len(slots), len(available))
+        )
+
+    def test_compact_slot_records(self):
+        """Los slots son registros compactos que se leen como el diccionario original"""
+        slots = self._generate(self._build_appointments(2, minutes=30), duration_minutes=30, end_time=time(2, 0))
+        slot = slots[-1]
+
+        self.assertIsInstance(slot, Slot)
+        self.assertFalse(hasattr(slot, '__dict__'))
+        self.assertIs(slot.day, slots[0].day)
+        self.assertEqual(
+            dict(slot),
+            {
+                'start_datetime': timezone.make_aware(datetime.combine(self.target_date, time(1, 30))),
+                'end_datetime': timezone.make_aware(datetime.combine(self.target_date, time(2, 0))),
+                'start_time': time(1, 30),
+                'end_time': time(2, 0),
+                'duration_minutes': 30,
+                'is_available': True,
+                'conflict_reason': None,
+                'professional_id': str(self.professional.id),
+                'professional_name': 'Benchmark'
+            }
+        )
+        self.assertEqual(slots[0]['conflict_reason'], 'Conflicto con cita: Juan Pérez')
+        self.assertEqual(pickle.loads(pickle.dumps(slots)), slots)
+
+    def test_dense_day_scales_linearly(self):
+        """Cuadruplicar slots y citas del día no multiplica por 16 los sondeos de la barrida"""
+        small_slots, small_probes = self._count_probes(self._build_appointments(300, gap=0), end_time=time(6, 0))
+        large_slots, large_probes = self._count_probes(self._build_appointments(1200, gap=0))
+
+        # O(slots + citas): cada intervalo se lee un número acotado de veces
+        self.assertLessEqual(small_probes, 2 * (small_slots + 300))
+        self.assertLessEqual(large_probes, 2 * (large_slots + 1200))
+        # Lineal: ≈ 4; con O(slots × citas) ≈ 16
+        self.assertLess(large_probes, small_probes * 8)
+
+
+class ParallelAvailabilityBenchmarkTests(SimpleTestCase):
+    """
+    Benchmark del conteo de slots en serie y en el pool de procesos (sin base de datos)
+    """
+
+    start_date = date(2030, 1, 7)
+    days = 90
+
+    def _build_services(self, count):
+        """Crear profesionales con horarios distintos y citas aleatorias en memoria"""
+        generator = random.Random(11)
+        end_date = self.start_date + timedelta(days=self.days - 1)
+        availability_services = []
+        for index in range(count):
+            professional = Professional(name=f"Profesional {index}")
+            ProfessionalSchedule(professional=professional, slot_duration=generator.choice([10, 15, 30]))
+            working_hours = tuple(
+                ((time(8, 0), time(13, 0)), (time(14, 0), time(20, 0))) if weekday < 6 else ()
+                for weekday in range(7)
+            )
+            breaks = tuple(
+                (CompiledBreak(time(10, 30), time(10, 45), "Pausa"),) if weekday < 6 else ()
+                for weekday in range(7)
+            )
+            availability_service = AvailabilityCalculationService(professional)
+            availability_service._compiled = CompiledSchedule(
+                schedule_id=professional.schedule.id,
+                version=(),
+                working_hours=working_hours,
+                breaks=breaks,
+                free_intervals=tuple(_subtract_breaks(working_hours[day], breaks[day]) for day in range(7)),
+                exceptions=MappingProxyType({
+                    self.start_date + timedelta(days=generator.randint(0, self.days - 1)): CompiledException(
+                        'unavailable', None, None, "Vacaciones"
+                    )
+                })
+            )
+            appointments = []
+            for offset in range(self.days):
+                day_start = timezone.make_aware(datetime.combine(self.start_date + timedelta(days=offset), time(8, 0)))
+                for _ in range(generator.randint(0, 12)):
+                    appointment_start = day_start + timedelta(minutes=generator.randrange(0, 720, 5))
+                    appointments.append(Appointment(
+                        start_datetime=appointment_start,
+                        end_datetime=appointment_start + timedelta(minutes=generator.choice([15, 30, 45, 60, 90]))
+                    ))
+            availability_service._set_range_data(self.start_date, end_date, appointments, with_clients=False)
+            availability_services.append(availability_service)
+        return availability_services
+
+    def test_snapshot_round_trip(self):
+        """Un snapshot serializado reconstruye un servicio con los mismos conteos"""
+        availability_service = self._build_services(1)[0]
+        end_date = self.start_date + timedelta(days=13)
+        snapshot = pickle.loads(pickle.dumps(
+            AvailabilitySnapshot.from_service(availability_service, self.start_date, end_date)
+        ))
+        restored = snapshot.restore()
+        for offset in range(14):
+            target_date = self.start_date + timedelta(days=offset)
+            self.assertEqual(
+                restored.count_slots_for_date(target_date, 45),
+                availability_service.count_slots_for_date(target_date, 45)
+            )
+
+    def test_parallel_matches_serial(self):
+        """El pool de procesos produce exactamente los mismos conteos que el cálculo en serie"""
+        availability_services = self._build_services(12)
+        end_date = self.start_date + timedelta(days=self.days - 1)
+
+        serial = count_slots_range(availability_services, self.start_date, end_date, 45, parallel=False)
+        parallel = count_slots_range(availability_services, self.start_date, end_date, 45, parallel=True, workers=2)
+
+        self.assertEqual(parallel, serial)
+        self.assertEqual(len(serial), 12)
+        self.assertTrue(all(len(counts) == self.days for counts in serial.values()))
+        self.assertGreater(sum(available for counts in serial.values() for _, available in counts), 0)
+
+
+class AppointmentIntervalIndexTests(SimpleTestCase):
+    """
+    Tests del índice de intervalos de citas contra una búsqueda exhaustiva
+    """
+
+    base = timezone.make_aware(datetime(2030, 1, 7, 8, 0))
+
+    def _at(self, minutes):
+        return self.base + timedelta(minutes=minutes)
+
+    def _appointment(self, start, end):
+        return Appointment(start_datetime=self._at(start), end_datetime=self._at(end))
+
+    def test_overlapping_matches_brute_force(self):
+        """Las consultas de solapamiento coinciden con la comparación contra todas las citas"""
+        generator = random.Random(7)
+        appointments = []
+        for _ in range(200):
+            start = generator.randint(0, 600)
+            appointments.append(self._appointment(start, start + generator.choice([0, 15, 30, 60, 240])))
+        index = AppointmentIntervalIndex(appointments)
+
+        for _ in range(500):
+            start = generator.randint(-30, 660)
+            end = start + generator.randint(1, 90)
+            expected = [
+                appointment for appointment in appointments
+                if appointment.start_datetime < self._at(end) and appointment.end_datetime > self._at(start)
+            ]
+            found = index.overlapping(self._at(start), self._at(end))
+            self.assertEqual({id(appointment) for appointment in found}, {id(appointment) for appointment in expected})
+            self.assertEqual(index.overlaps(self._at(start), self._at(end)), bool(expected))
+
+    def test_exclude_appointment(self):
+        """La cita excluida (al validar una modificación) no genera conflicto, también con id como texto"""
+        appointment = self._appointment(60, 120)
+        index = AppointmentIntervalIndex([appointment])
+
+        self.assertTrue(index.overlaps(self._at(90), self._at(100)))
+        self.assertFalse(index.overlaps(self._at(90), self._at(100), exclude_id=appointment.id))
+        self.assertFalse(index.overlaps(self._at(90), self._at(100), exclude_id=str(appointment.id)))
+
+    def test_next_free_gap(self):
+        """El primer hueco libre salta los bloques ocupados contiguos y los huecos demasiado cortos"""
+        index = AppointmentIntervalIndex([
+            self._appointment(0, 60),
+            self._appointment(60, 90),
+            self._appointment(100, 130),
+            self._appointment(200, 260),
+        ])
+
+        self.assertEqual(index.next_free_gap(self._at(-30)), self._at(-30))
+        self.assertEqual(index.next_free_gap(self._at(10)), self._at(90))
+        self.assertEqual(index.next_free_gap(self._at(10), timedelta(minutes=30)), self._at(130))
+        self.assertEqual(index.next_free_gap(self._at(10), timedelta(minutes=90)), self._at(260))
+
+
+class AvailabilityBitmapTests(SimpleTestCase):
+    """
+    Tests de las operaciones de bits de schedule.bitmaps
+    """
+    
+    def test_cell_minutes(self):
+        self.assertEqual(get_cell_minutes(30, [540, 570, 600]), 30)
+        self.assertEqual(get_cell_minutes(30, [555, 585]), 15)
+        self.assertEqual(get_cell_minutes(45, []), 45)
+    
+    def test_masks_match_brute_force(self):
+        rng = random.Random(7)
+        for _ in range(300):
+            cell_minutes = rng.choice([5, 15, 30])
+            start_minute = rng.randrange(0, 1440)
+            end_minute = rng.randrange(start_minute, 1441)
+            inside = sum(
+                1 << cell for cell in range(1440 // cell_minutes)
+                if start_minute <= cell * cell_minutes and (cell + 1) * cell_minutes <= end_minute
+            )
+            touching = sum(
+                1 << cell for cell in range(1440 // cell_minutes)
+                if cell * cell_minutes < end_minute and start_minute < (cell + 1) * cell_minutes
+            )
+            self.assertEqual(cells_in(start_minute, end_minute, cell_minutes), inside)
+            self.assertEqual(cells_touching(start_minute, end_minute, cell_minutes), touching)
+    
+    def test_runs_remap_and_packing(self):
+        mask = cells_in(540, 720, 30) | cells_in(780, 1020, 30)
+        self.assertEqual(list(iter_runs(mask)), [(18, 24), (26, 34)])
+        self.assertEqual(remap_cells(mask, 30, 15), cells_in(540, 720, 15) | cells_in(780, 1020, 15))
+        self.assertEqual(remap_cells(remap_cells(mask, 30, 15), 15, 30), mask)
+        
+        packed = pack_cells(mask, 15)
+        self.assertEqual(len(packed), 12)
+        self.assertEqual(unpack_cells(memoryview(packed)), mask)
@@ -1,9 +1,17 @@
 # schedule/tests_integration.py
 
 from datetime import datetime, time, date, timedelta
+from io import StringIO
+from unittest.mock import patch
+from zoneinfo import ZoneInfo
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.utils import timezone
 from django.core.exceptions import ValidationError
+from rest_framework.test import APIClient
 from organizations.models import Organization, Professional, Service, Client
 from users.models import User
 from appointments.models import Appointment
@@ -11,9 +19,25 @@ from schedule.models import (
     ProfessionalSchedule, 
     WeeklySchedule, 
     ScheduleBreak, 
-    ScheduleException
+    ScheduleException,
+    AvailabilitySlot,
+    AvailabilityBitmap,
+    DailyAvailability
 )
+from schedule.heatmap import refresh_daily_availability
 from schedule.services import AvailabilityCalculationService, MultiProfessionalAvailabilityService
+from schedule.cache import lookup_cached_slots
+from schedule.compiled import clear_compiled_schedule_cache, get_compiled_schedule
+from schedule.warmup import LAST_WARMUP_CACHE_KEY, warm_availability
+from schedule.utils import (
+    block_time_slot,
+    build_availability_bitmaps,
+    bulk_create_availability_slots,
+    generate_availability_slots,
+    get_professional_availability,
+    refresh_availability_slots,
+    unblock_time_slot
+)
 
 
 class ScheduleAppointmentIntegrationTests(TestCase):
@@ -23,6 +47,9 @@ class ScheduleAppointmentIntegrationTests(TestCase):
     
     def setUp(self):
         """Configurar datos de prueba"""
+        clear_compiled_schedule_cache()
+        cache.clear()
+        
         # Crear organización
         self.organization = Organization.objects.create(
             name="Test Salon",
@@ -354,4 +381,568 @@ class ScheduleAppointmentIntegrationTests(TestCase):
         self.assertGreater(summary['total_days'], 0)
         self.assertGreaterEqual(summary['available_days'], 0)
         self.assertGreaterEqual(summary['total_slots'], 0)
-        self.assertGreaterEqual(summary['available_slots'], 0)
\ No newline at end of file
+        self.assertGreaterEqual(summary['available_slots'], 0)    
+    def test_availability_summary_parallel_matches_serial(self):
+        """Test de resumen de disponibilidad en el pool de procesos: mismo resultado que en serie"""
+        start_date = timezone.now().date() + timedelta(days=1)
+        end_date = start_date + timedelta(days=20)
+        while start_date.weekday() >= 5:
+            start_date += timedelta(days=1)
+        
+        start_datetime = timezone.make_aware(datetime.combine(start_date, time(10, 0)))
+        Appointment.objects.create(
+            organization=self.organization,
+            professional=self.professional,
+            service=self.service,
+            client=self.client,
+            start_datetime=start_datetime,
+            end_datetime=start_datetime + timedelta(minutes=60),
+            duration_minutes=60,
+            price=25000,
+            created_by=self.user
+        )
+        
+        serial = MultiProfessionalAvailabilityService.get_availability_summary(
+            self.service, start_date, end_date, parallel=False
+        )
+        with self.settings(AVAILABILITY_PARALLEL_WORKERS=2):
+            parallel = MultiProfessionalAvailabilityService.get_availability_summary(
+                self.service, start_date, end_date, parallel=True
+            )
+        self.assertEqual(parallel, serial)
+        self.assertEqual(
+            serial['daily_availability'][start_date.isoformat()]['available_slots'],
+            AvailabilityCalculationService(self.professional).count_slots_for_date(start_date, 60)[1]
+        )
+    
+    def test_available_slots_range_matches_daily(self):
+        """Test de rango de fechas: mismo resultado que el cálculo día a día"""
+        start_date = timezone.now().date() + timedelta(days=1)
+        end_date = start_date + timedelta(days=6)
+        
+        availability_service = AvailabilityCalculationService(self.professional)
+        slots_by_date = availability_service.get_available_slots_range(
+            start_date, end_date, self.service
+        )
+        
+        self.assertEqual(len(slots_by_date), 7)
+        for target_date, slots in slots_by_date.items():
+            daily_slots = AvailabilityCalculationService(self.professional).get_available_slots(
+                target_date, self.service
+            )
+            self.assertEqual(slots, daily_slots)
+    
+    def test_available_slots_range_constant_queries(self):
+        """Test de rango de fechas: las consultas no crecen con el número de días"""
+        start_date = timezone.now().date() + timedelta(days=1)
+        
+        # Profesionales, versión del horario, horario compilado (3) y citas
+        with self.assertNumQueries(6):
+            MultiProfessionalAvailabilityService.get_available_slots_for_service_range(
+                self.service, start_date, start_date + timedelta(days=6)
+            )
+        
+        # Con el horario compilado en caché solo se consultan versión y citas
+        with self.assertNumQueries(3):
+            MultiProfessionalAvailabilityService.get_available_slots_for_service_range(
+                self.service, start_date, start_date + timedelta(days=59)
+            )
+        
+        # Con los slots en caché solo se consultan los profesionales
+        with self.assertNumQueries(1):
+            MultiProfessionalAvailabilityService.get_available_slots_for_service_range(
+                self.service, start_date, start_date + timedelta(days=59)
+            )
+    
+    def test_compiled_schedule_invalidated_on_change(self):
+        """Test de caché de horario compilado: se recompila al modificar el horario"""
+        compiled = get_compiled_schedule(self.schedule)
+        self.assertIs(get_compiled_schedule(self.schedule), compiled)
+        
+        # Los descansos ya vienen descontados de los intervalos libres
+        self.assertEqual(
+            compiled.free_intervals[0],
+            ((time(9, 0), time(12, 0)), (time(13, 0), time(17, 0)))
+        )
+        
+        exception_date = timezone.now().date() + timedelta(days=3)
+        ScheduleException.objects.create(
+            professional_schedule=self.schedule,
+            date=exception_date,
+            exception_type='holiday',
+            reason='Feriado'
+        )
+        
+        recompiled = get_compiled_schedule(self.schedule)
+        self.assertIsNot(recompiled, compiled)
+        self.assertEqual(recompiled.working_hours_for_date(exception_date), ())
+    
+    def test_availability_cache_invalidation(self):
+        """Test de caché de disponibilidad: solo se recalculan el profesional y los días afectados"""
+        target_date = timezone.now().date() + timedelta(days=2)
+        while target_date.weekday() >= 5:
+            target_date += timedelta(days=1)
+        other_date = target_date + timedelta(days=1)
+        while other_date.weekday() >= 5:
+            other_date += timedelta(days=1)
+        
+        availability_service = AvailabilityCalculationService(self.professional)
+        slots = availability_service.get_available_slots_range(target_date, other_date, self.service)
+        self.assertTrue(all(slot['is_available'] for slot in slots[target_date] if slot['start_time'] == time(10, 0)))
+        
+        with self.assertNumQueries(0):
+            AvailabilityCalculationService(self.professional).get_available_slots_range(
+                target_date, other_date, self.service
+            )
+        
+        # Una cita nueva invalida solo su día
+        Appointment.objects.create(
+            organization=self.organization,
+            professional=self.professional,
+            service=self.service,
+            client=self.client,
+            start_datetime=timezone.make_aware(datetime.combine(target_date, time(10, 0))),
+            end_datetime=timezone.make_aware(datetime.combine(target_date, time(11, 0))),
+            duration_minutes=60,
+            price=25000,
+            created_by=self.user
+        )
+        cache_lookup = lookup_cached_slots(self.professional.id, target_date, other_date, 60)
+        self.assertEqual(cache_lookup.missing_dates, [target_date])
+        
+        slots = AvailabilityCalculationService(self.professional).get_available_slots(target_date, self.service)
+        slot_10 = next(slot for slot in slots if slot['start_time'] == time(10, 0))
+        self.assertFalse(slot_10['is_available'])
+        
+        # Un cambio en el horario semanal invalida todos los días del profesional
+        weekly_schedule = WeeklySchedule.objects.filter(professional_schedule=self.schedule).first()
+        weekly_schedule.end_time = time(16, 0)
+        weekly_schedule.save()
+        cache_lookup = lookup_cached_slots(self.professional.id, target_date, other_date, 60)
+        self.assertEqual(cache_lookup.missing_dates, [target_date, other_date])
+    
+    def test_schedule_timezone_buckets_appointments(self):
+        """Test de zona horaria del horario: citas e invalidación agrupadas por el día local del profesional"""
+        self.schedule.timezone = 'Asia/Tokyo'
+        self.schedule.save()
+        tokyo = ZoneInfo('Asia/Tokyo')
+        target_date = timezone.now().astimezone(tokyo).date() + timedelta(days=2)
+        while target_date.weekday() >= 5:
+            target_date += timedelta(days=1)
+        
+        availability_service = AvailabilityCalculationService(self.professional)
+        availability_service.get_available_slots(target_date, self.service)
+        
+        # 10:00 en Tokio es el día anterior en la zona del proyecto
+        start_datetime = datetime.combine(target_date, time(10, 0), tzinfo=tokyo)
+        self.assertNotEqual(timezone.localtime(start_datetime).date(), target_date)
+        Appointment.objects.create(
+            organization=self.organization,
+            professional=self.professional,
+            service=self.service,
+            client=self.client,
+            start_datetime=start_datetime,
+            end_datetime=start_datetime + timedelta(hours=1),
+            duration_minutes=60,
+            price=25000,
+            created_by=self.user
+        )
+        cache_lookup = lookup_cached_slots(self.professional.id, target_date, target_date, 60)
+        self.assertEqual(cache_lookup.missing_dates, [target_date])
+        
+        slots = AvailabilityCalculationService(self.professional).get_available_slots(target_date, self.service)
+        slot_10 = next(slot for slot in slots if slot['start_time'] == time(10, 0))
+        self.assertFalse(slot_10['is_available'])
+        
+        availability = MultiProfessionalAvailabilityService.get_available_slots_for_service_range(
+            self.service, target_date, target_date, available_only=True
+        )
+        free_times = [slot['start_time'] for slot in availability[str(self.professional.id)][target_date]]
+        self.assertNotIn(time(10, 0), free_times)
+        self.assertIn(time(11, 0), free_times)
+    
+    def test_availability_version_keys_expire(self):
+        """Test de claves de versión: expiran después de los slots y al expirar inician una versión nueva"""
+        target_date = timezone.now().date() + timedelta(days=2)
+        while target_date.weekday() >= 5:
+            target_date += timedelta(days=1)
+        
+        with self.settings(AVAILABILITY_CACHE_TIMEOUT=600, AVAILABILITY_VERSION_TIMEOUT=60):
+            with patch.object(cache, 'add', wraps=cache.add) as cache_add:
+                AvailabilityCalculationService(self.professional).get_available_slots(target_date, self.service)
+        version_timeouts = {
+            call.kwargs['timeout'] for call in cache_add.call_args_list
+            if call.args[0].startswith('availability:version:')
+        }
+        self.assertEqual(version_timeouts, {1200})
+        
+        # Una versión expirada no reutiliza los slots guardados bajo la anterior
+        cache.delete(f'availability:version:{self.professional.id}:{target_date.isoformat()}')
+        cache_lookup = lookup_cached_slots(self.professional.id, target_date, target_date, 60)
+        self.assertEqual(cache_lookup.missing_dates, [target_date])
+    
+    def test_available_only_skips_conflicts_and_clients(self):
+        """Test de modo solo disponibles: mismos slots libres sin consultar clientes"""
+        target_date = timezone.now().date() + timedelta(days=2)
+        while target_date.weekday() >= 5:
+            target_date += timedelta(days=1)
+        
+        Appointment.objects.create(
+            organization=self.organization,
+            professional=self.professional,
+            service=self.service,
+            client=self.client,
+            start_datetime=timezone.make_aware(datetime.combine(target_date, time(10, 15))),
+            end_datetime=timezone.make_aware(datetime.combine(target_date, time(11, 15))),
+            duration_minutes=60,
+            price=25000,
+            created_by=self.user
+        )
+        
+        explained = AvailabilityCalculationService(self.professional).get_available_slots(
+            target_date, self.service
+        )
+        self.assertTrue(any(slot['conflict_reason'] == "Conflicto con cita: Juan Pérez" for slot in explained))
+        
+        cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            available = AvailabilityCalculationService(self.professional).get_available_slots(
+                target_date, self.service, available_only=True
+            )
+        
+        self.assertEqual(available, [slot for slot in explained if slot['is_available']])
+        self.assertFalse(any('organizations_client' in query['sql'] for query in context.captured_queries))
+    
+    def test_interval_index_shared_by_validations(self):
+        """Test de índice de citas: clean y detección de conflictos usan una sola carga"""
+        target_date = timezone.now().date() + timedelta(days=2)
+        while target_date.weekday() >= 5:
+            target_date += timedelta(days=1)
+        start_datetime = timezone.make_aware(datetime.combine(target_date, time(10, 0)))
+        
+        appointment = Appointment.objects.create(
+            organization=self.organization,
+            professional=self.professional,
+            service=self.service,
+            client=self.client,
+            start_datetime=start_datetime,
+            end_datetime=start_datetime + timedelta(minutes=60),
+            duration_minutes=60,
+            price=25000,
+            created_by=self.user
+        )
+        
+        # Revalidar la misma cita no la hace chocar consigo misma
+        appointment.refresh_from_db()
+        appointment.full_clean()
+        
+        availability_service = AvailabilityCalculationService(self.professional)
+        with CaptureQueriesContext(connection) as context:
+            conflicts = availability_service.detect_conflicts(start_datetime + timedelta(minutes=30), self.service)
+        self.assertEqual(
+            [conflict['type'] for conflict in conflicts],
+            ['schedule_conflict', 'appointment_conflict']
+        )
+        self.assertEqual(conflicts[1]['conflicting_appointment']['id'], str(appointment.id))
+        self.assertEqual(conflicts[1]['conflicting_appointment']['service_name'], self.service.name)
+        # Cliente y servicio de las citas en conflicto llegan con la carga del índice
+        self.assertFalse(any(
+            query['sql'].startswith('SELECT "organizations_service"') for query in context.captured_queries
+        ))
+        
+        # El índice ya está construido: excluir la cita (id como texto) no vuelve a consultar citas
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                availability_service.detect_conflicts(
+                    start_datetime + timedelta(minutes=30), self.service, str(appointment.id)
+                ),
+                []
+            )
+    
+    def test_is_available_many_single_snapshot(self):
+        """Test de verificación por lotes: mismos resultados que is_available_at_time con una sola carga"""
+        target_date = timezone.now().date() + timedelta(days=2)
+        while target_date.weekday() >= 4:
+            target_date += timedelta(days=1)
+        next_date = target_date + timedelta(days=1)
+        start_datetime = timezone.make_aware(datetime.combine(target_date, time(10, 0)))
+        
+        appointment = Appointment.objects.create(
+            organization=self.organization,
+            professional=self.professional,
+            service=self.service,
+            client=self.client,
+            start_datetime=start_datetime,
+            end_datetime=start_datetime + timedelta(minutes=60),
+            duration_minutes=60,
+            price=25000,
+            created_by=self.user
+        )
+        
+        candidates = [
+            timezone.make_aware(datetime.combine(candidate_date, candidate_time))
+            for candidate_date in (target_date, next_date)
+            for candidate_time in (time(9, 30), time(10, 0), time(12, 0), time(14, 0), time(10, 30), time(20, 0))
+        ]
+        
+        with CaptureQueriesContext(connection) as few_queries:
+            AvailabilityCalculationService(self.professional).is_available_many(candidates[:2], self.service)
+        with CaptureQueriesContext(connection) as many_queries:
+            results = AvailabilityCalculationService(self.professional).is_available_many(candidates, self.service)
+        self.assertEqual(len(many_queries), len(few_queries))
+        
+        for candidate, result in zip(candidates, results):
+            expected = AvailabilityCalculationService(self.professional).is_available_at_time(candidate, self.service)
+            self.assertEqual((result['is_available'], result['reason']), expected)
+            self.assertEqual(result['end_datetime'] - result['start_datetime'], timedelta(minutes=60))
+        
+        self.assertEqual(
+            [result['is_available'] for result in results[:6]],
+            [False, False, False, True, False, False]
+        )
+        self.assertEqual(results[3]['reason'], "Disponible")
+        
+        # Al reprogramar, la propia cita no bloquea los candidatos
+        results = AvailabilityCalculationService(self.professional).is_available_many(
+            candidates[:2], self.service, str(appointment.id)
+        )
+        self.assertEqual([result['is_available'] for result in results], [True, True])
+    
+    def test_materialized_slots_incremental_refresh(self):
+        """Test de slots materializados: los cambios solo recalculan los días afectados"""
+        start_date = timezone.now().date() + timedelta(days=2)
+        while start_date.weekday() >= 4:
+            start_date += timedelta(days=1)
+        next_date = start_date + timedelta(days=1)
+        
+        # 14 slots de 30 minutos por día (9:00-17:00 sin el almuerzo)
+        self.assertEqual(bulk_create_availability_slots(self.schedule, start_date, next_date), 28)
+        block_time_slot(self.schedule, start_date, time(9, 0), time(9, 30), "Reunión")
+        original_ids = set(AvailabilitySlot.objects.values_list('id', flat=True))
+        
+        # Regenerar sin cambios no toca las filas ni los bloqueos manuales
+        with self.assertNumQueries(3):
+            self.assertEqual(
+                refresh_availability_slots(self.schedule, [start_date, next_date]),
+                {'created': 0, 'updated': 0, 'deleted': 0, 'total': 28}
+            )
+        
+        start_datetime = timezone.make_aware(datetime.combine(start_date, time(10, 0)))
+        with self.captureOnCommitCallbacks(execute=True):
+            Appointment.objects.create(
+                organization=self.organization,
+                professional=self.professional,
+                service=self.service,
+                client=self.client,
+                start_datetime=start_datetime,
+                end_datetime=start_datetime + timedelta(minutes=60),
+                duration_minutes=60,
+                price=25000,
+                created_by=self.user
+            )
+        busy = AvailabilitySlot.objects.filter(is_available=False).order_by('start_time')
+        self.assertEqual(
+            [(slot.date, slot.start_time) for slot in busy],
+            [(start_date, time(10, 0)), (start_date, time(10, 30))]
+        )
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            ScheduleException.objects.create(
+                professional_schedule=self.schedule,
+                date=next_date,
+                exception_type='unavailable',
+                reason="Capacitación"
+            )
+        self.assertFalse(AvailabilitySlot.objects.filter(date=next_date).exists())
+        
+        # Los slots del primer día se conservan (mismas filas, bloqueo incluido)
+        remaining = AvailabilitySlot.objects.filter(date=start_date)
+        self.assertEqual(remaining.count(), 14)
+        self.assertTrue(set(remaining.values_list('id', flat=True)) <= original_ids)
+        self.assertEqual(
+            list(remaining.filter(is_blocked=True).values_list('start_time', 'blocked_reason')),
+            [(time(9, 0), "Reunión")]
+        )
+    
+    def test_availability_bitmap_operations(self):
+        """Test de mapas de bits: disponibilidad, bloqueos y citas como operaciones de bits"""
+        target_date = timezone.now().date() + timedelta(days=2)
+        while target_date.weekday() >= 5:
+            target_date += timedelta(days=1)
+        
+        self.assertEqual(build_availability_bitmaps(self.schedule, target_date, target_date + timedelta(days=6)), 7)
+        bitmap = AvailabilityBitmap.objects.get(professional_schedule=self.schedule, date=target_date)
+        self.assertEqual(bitmap.cell_minutes, 30)
+        self.assertEqual(bitmap.version, 0)
+        
+        # Mismos slots que la generación por filas (9:00-17:00 sin el almuerzo)
+        expected = [
+            (slot['start_time'], slot['end_time'])
+            for slot in generate_availability_slots(self.schedule, target_date, target_date)
+        ]
+        available = get_professional_availability(self.schedule, target_date)
+        self.assertEqual([(slot['start_time'], slot['end_time']) for slot in available], expected)
+        self.assertEqual(len(available), 14)
+        
+        self.assertEqual(block_time_slot(self.schedule, target_date, time(9, 0), time(10, 0), "Reunión"), 2)
+        available = get_professional_availability(self.schedule, target_date)
+        self.assertEqual(available[0]['start_time'], time(10, 0))
+        bitmap.refresh_from_db()
+        self.assertEqual(bitmap.version, 1)
+        self.assertEqual(bitmap.blocked_reasons, {'540': "Reunión", '570': "Reunión"})
+        
+        # Una cita nueva libera solo las celdas que ocupa (al confirmar la transacción)
+        start_datetime = timezone.make_aware(datetime.combine(target_date, time(14, 10)))
+        with self.captureOnCommitCallbacks(execute=True):
+            Appointment.objects.create(
+                organization=self.organization,
+                professional=self.professional,
+                service=self.service,
+                client=self.client,
+                start_datetime=start_datetime,
+                end_datetime=start_datetime + timedelta(minutes=60),
+                duration_minutes=60,
+                price=25000,
+                created_by=self.user
+            )
+        start_times = [slot['start_time'] for slot in get_professional_availability(self.schedule, target_date)]
+        self.assertNotIn(time(14, 0), start_times)
+        self.assertNotIn(time(14, 30), start_times)
+        self.assertNotIn(time(15, 0), start_times)
+        self.assertIn(time(15, 30), start_times)
+        self.assertEqual(len(start_times), 9)
+        
+        # El desbloqueo conserva la cita y deja al día sin motivos de bloqueo
+        self.assertEqual(unblock_time_slot(self.schedule, target_date, time(9, 0), time(10, 0)), 2)
+        bitmap.refresh_from_db()
+        self.assertEqual(bitmap.version, 3)
+        self.assertEqual(bitmap.blocked_reasons, {})
+        self.assertEqual(len(get_professional_availability(self.schedule, target_date)), 11)
+    
+    def test_daily_availability_heatmap(self):
+        """Test del mapa de calor diario: resumen precalculado y actualización incremental"""
+        start_date = timezone.now().date() + timedelta(days=2)
+        while start_date.weekday() >= 4:
+            start_date += timedelta(days=1)
+        next_date = start_date + timedelta(days=1)
+        
+        self.assertEqual(
+            refresh_daily_availability(self.schedule, [start_date, next_date]),
+            {'created': 2, 'updated': 0, 'total': 2}
+        )
+        row = DailyAvailability.objects.get(date=start_date)
+        self.assertEqual(row.organization, self.organization)
+        self.assertEqual(row.free_minutes, 420)
+        self.assertEqual(row.earliest_free_time, time(9, 0))
+        
+        # Los conteos coinciden con el motor de slots
+        availability_service = AvailabilityCalculationService(self.professional)
+        self.assertEqual(row.slot_counts, {
+            str(duration): availability_service.count_slots_for_date(start_date, duration)[1]
+            for duration in (30, 60, 90)
+        })
+        untouched = DailyAvailability.objects.get(date=next_date).updated_at
+        
+        # Una cita a primera hora solo recalcula su día
+        start_datetime = timezone.make_aware(datetime.combine(start_date, time(9, 0)))
+        with self.captureOnCommitCallbacks(execute=True):
+            Appointment.objects.create(
+                organization=self.organization,
+                professional=self.professional,
+                service=self.service,
+                client=self.client,
+                start_datetime=start_datetime,
+                end_datetime=start_datetime + timedelta(minutes=60),
+                duration_minutes=60,
+                price=25000,
+                created_by=self.user
+            )
+        row.refresh_from_db()
+        self.assertEqual(row.free_minutes, 360)
+        self.assertEqual(row.earliest_free_time, time(10, 0))
+        self.assertEqual(row.slot_counts['30'], 12)
+        self.assertEqual(DailyAvailability.objects.get(date=next_date).updated_at, untouched)
+        
+        # El endpoint lee las filas existentes y materializa el día faltante
+        api_client = APIClient()
+        api_client.force_authenticate(user=self.user)
+        response = api_client.get('/api/schedule/heatmap/', {
+            'start_date': start_date.isoformat(),
+            'days': 3
+        })
+        self.assertEqual(response.status_code, 200)
+        days = response.data['professionals'][0]['days']
+        self.assertEqual(len(days), 3)
+        self.assertEqual(days[start_date.isoformat()]['free_minutes'], 360)
+        self.assertEqual(days[start_date.isoformat()]['earliest_free_time'], '10:00')
+        self.assertEqual(DailyAvailability.objects.count(), 3)
+        
+        # Un professional_id que no es UUID responde 400 en lugar de fallar en la consulta
+        for url in ('/api/schedule/heatmap/', '/api/schedule/availability/bitmaps/'):
+            response = api_client.get(url, {'professional_id': 'no-es-uuid'})
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.data['error'], 'professional_id inválido')
+    
+    def test_availability_warmup(self):
+        """Test del precálculo: cachea los slots públicos y se repite tras editar el horario"""
+        start_date = timezone.localdate()
+        end_date = start_date + timedelta(days=4)
+        duration = self.service.total_duration_minutes
+        
+        stats = warm_availability(days=5)
+        self.assertEqual(stats['professionals'], 1)
+        self.assertEqual(stats['computed_days'], 5)
+        self.assertEqual(cache.get(LAST_WARMUP_CACHE_KEY)['computed_days'], 5)
+        self.assertEqual(
+            lookup_cached_slots(self.professional.id, start_date, end_date, duration, available_only=True).missing_dates,
+            []
+        )
+        
+        # Editar el horario invalida la caché y encola un precálculo solo para el profesional
+        weekly_schedule = WeeklySchedule.objects.filter(professional_schedule=self.schedule).first()
+        with self.captureOnCommitCallbacks(execute=True):
+            weekly_schedule.end_time = time(18, 0)
+            weekly_schedule.save()
+        self.assertEqual(
+            lookup_cached_slots(self.professional.id, start_date, end_date, duration, available_only=True).missing_dates,
+            []
+        )
+        
+        output = StringIO()
+        call_command('warm_availability_cache', '--days', '3', '--workers', '1', stdout=output)
+        self.assertIn('3 días calculados para 1 profesionales', output.getvalue())
+    
+    def test_next_available_slots_stops_early(self):
+        """Test de búsqueda perezosa: se detiene al reunir max_slots slots"""
+        professional2 = Professional.objects.create(
+            organization=self.organization,
+            name="Ana López",
+            email="ana@test.com"
+        )
+        self.service.professionals.add(professional2)
+        schedule2 = ProfessionalSchedule.objects.create(professional=professional2, slot_duration=15)
+        for weekday in range(7):
+            WeeklySchedule.objects.create(
+                professional_schedule=schedule2,
+                weekday=weekday,
+                start_time=time(8, 0),
+                end_time=time(20, 0)
+            )
+        
+        calculate_slots = AvailabilityCalculationService._calculate_slots_for_date
+        with patch.object(
+            AvailabilityCalculationService, '_calculate_slots_for_date',
+            autospec=True, side_effect=calculate_slots
+        ) as calculate_mock:
+            next_slots = MultiProfessionalAvailabilityService.get_next_available_slots_for_service(
+                self.service, days_ahead=30, max_slots=5
+            )
+        
+        self.assertEqual(len(next_slots), 5)
+        start_datetimes = [slot['start_datetime'] for slot in next_slots]
+        self.assertEqual(start_datetimes, sorted(start_datetimes))
+        self.assertTrue(all(slot['is_available'] for slot in next_slots))
+        self.assertTrue(all(slot['start_datetime'] >= timezone.now() for slot in next_slots))
+        
+        # Solo se calculan los primeros días de cada profesional, no los 31 del horizonte
+        self.assertLess(calculate_mock.call_count, 10)
@@ -16,6 +16,9 @@ urlpatterns = [
     # Resumen general de horarios
     path('overview/', views.ScheduleOverviewView.as_view(), name='schedule-overview'),
     
+    # Mapa de calor de disponibilidad (resumen diario precalculado)
+    path('heatmap/', views.AvailabilityHeatmapView.as_view(), name='availability-heatmap'),
+    
     # Horarios específicos por profesional
     path('professional/<uuid:professional_id>/', views.ProfessionalScheduleDetailView.as_view(), name='professional-schedule-detail'),
     
@@ -1,63 +1,62 @@
 # schedule/utils.py
 
 from datetime import datetime, timedelta, time
+from django.db import transaction
+from django.db.models import Max, Min
 from django.utils import timezone
+from .bitmaps import (
+    MINUTES_PER_DAY,
+    cells_in,
+    cells_touching,
+    get_cell_minutes,
+    pack_cells,
+    remap_cells
+)
+from .compiled import get_compiled_schedule
+from .intervals import AppointmentIntervalIndex
+from .slots import SlotDay, get_schedule_timezone, local_day_bounds, to_minutes
 from .models import (
     ProfessionalSchedule,
     WeeklySchedule,
     ScheduleException,
-    AvailabilitySlot
+    AvailabilitySlot,
+    AvailabilityBitmap
 )
 
 
 def generate_availability_slots(professional_schedule, start_date, end_date):
     """
     Generar slots de disponibilidad para un profesional en un rango de fechas
+    
+    Usa el horario compilado (ver schedule.compiled): no consulta excepciones
+    ni horarios semanales por día.
     """
+    compiled = get_compiled_schedule(professional_schedule)
     slots = []
     current_date = start_date
     
     while current_date <= end_date:
-        # Obtener día de la semana (0=Lunes, 6=Domingo)
-        weekday = current_date.weekday()
-        
-        # Verificar si hay excepciones para este día
-        exception = professional_schedule.exceptions.filter(
-            date=current_date,
-            is_active=True
-        ).first()
+        exception = compiled.get_exception(current_date)
         
         if exception:
-            if exception.exception_type == 'unavailable':
-                # Día no disponible, continuar con el siguiente día
-                current_date += timedelta(days=1)
-                continue
-            elif exception.exception_type == 'special_hours':
-                # Horario especial
-                if exception.start_time and exception.end_time:
-                    day_slots = generate_day_slots(
-                        professional_schedule,
-                        current_date,
-                        exception.start_time,
-                        exception.end_time
-                    )
-                    slots.extend(day_slots)
+            # Horario especial; el resto de las excepciones bloquean el día completo
+            if exception.exception_type == 'special_hours' and exception.start_time and exception.end_time:
+                slots.extend(generate_day_slots(
+                    professional_schedule,
+                    current_date,
+                    exception.start_time,
+                    exception.end_time
+                ))
         else:
-            # Horario normal - buscar horarios semanales
-            weekly_schedules = professional_schedule.weekly_schedules.filter(
-                weekday=weekday,
-                is_active=True
-            )
-            
-            for weekly_schedule in weekly_schedules:
-                day_slots = generate_day_slots(
+            # Horario normal
+            for start_time, end_time in compiled.working_hours_for_date(current_date):
+                slots.extend(generate_day_slots(
                     professional_schedule,
                     current_date,
-                    weekly_schedule.start_time,
-                    weekly_schedule.end_time,
-                    weekly_schedule.breaks.filter(is_active=True)
-                )
-                slots.extend(day_slots)
+                    start_time,
+                    end_time,
+                    compiled.breaks_for_date(current_date)
+                ))
         
         current_date += timedelta(days=1)
     
@@ -118,79 +117,388 @@ def generate_day_slots(professional_schedule, date, start_time, end_time, breaks
 def bulk_create_availability_slots(professional_schedule, start_date, end_date):
     """
     Crear slots de disponibilidad en masa para un profesional
+    
+    Los slots existentes del rango se actualizan en lugar de regenerarse
+    (ver refresh_availability_slots).
+    
+    Returns:
+        Número de slots materializados en el rango
     """
-    # Limpiar slots existentes en el rango
-    AvailabilitySlot.objects.filter(
-        professional_schedule=professional_schedule,
-        date__range=[start_date, end_date]
-    ).delete()
-    
-    # Generar nuevos slots
-    slots_data = generate_availability_slots(
-        professional_schedule, 
-        start_date, 
-        end_date
+    dates = [start_date + timedelta(days=offset) for offset in range((end_date - start_date).days + 1)]
+    return refresh_availability_slots(professional_schedule, dates)['total']
+
+
+def _get_appointment_index(professional_schedule, start_date, end_date):
+    """
+    Índice de citas activas del rango (incluye el día anterior, por citas que cruzan la medianoche)
+    """
+    # Importar aquí para evitar import circular
+    from appointments.models import Appointment
+    
+    range_start, range_end = local_day_bounds(
+        start_date - timedelta(days=1), end_date, get_schedule_timezone(professional_schedule)
     )
+    return AppointmentIntervalIndex(
+        Appointment.objects.filter(
+            professional_id=professional_schedule.professional_id,
+            start_datetime__gte=range_start,
+            start_datetime__lt=range_end,
+            status__in=Appointment.ACTIVE_STATUSES
+        ).only(*Appointment.AVAILABILITY_FIELDS)
+    )
+
+
+def refresh_availability_slots(professional_schedule, dates):
+    """
+    Recalcular los slots materializados de un profesional para fechas específicas
+    
+    Compara los slots existentes con los esperados (horario compilado y citas
+    activas) y aplica solo las diferencias con bulk_create, bulk_update y
+    delete. Los bloqueos manuales (is_blocked, blocked_reason) se conservan.
+    
+    Returns:
+        Diccionario con los slots creados, actualizados, eliminados y el total
+    """
+    dates = sorted(set(dates))
+    result = {'created': 0, 'updated': 0, 'deleted': 0, 'total': 0}
+    if not dates:
+        return result
     
-    # Crear objetos AvailabilitySlot
-    slots_objects = [
-        AvailabilitySlot(**slot_data) for slot_data in slots_data
+    tz = get_schedule_timezone(professional_schedule)
+    interval_index = _get_appointment_index(professional_schedule, dates[0], dates[-1])
+    
+    expected = {}
+    date_set = set(dates)
+    for slot_data in generate_availability_slots(professional_schedule, dates[0], dates[-1]):
+        if slot_data['date'] not in date_set:
+            continue
+        slot_start = datetime.combine(slot_data['date'], slot_data['start_time']).replace(tzinfo=tz)
+        slot_end = datetime.combine(slot_data['date'], slot_data['end_time']).replace(tzinfo=tz)
+        expected[(slot_data['date'], slot_data['start_time'])] = (
+            slot_data['end_time'],
+            not interval_index.overlaps(slot_start, slot_end)
+        )
+    result['total'] = len(expected)
+    
+    to_update = []
+    to_delete = []
+    now = timezone.now()
+    existing = AvailabilitySlot.objects.filter(
+        professional_schedule=professional_schedule,
+        date__in=dates
+    ).order_by().only('id', 'date', 'start_time', 'end_time', 'is_available')
+    for slot in existing:
+        values = expected.pop((slot.date, slot.start_time), None)
+        if values is None:
+            to_delete.append(slot.id)
+        elif (slot.end_time, slot.is_available) != values:
+            slot.end_time, slot.is_available = values
+            slot.updated_at = now
+            to_update.append(slot)
+    
+    to_create = [
+        AvailabilitySlot(
+            professional_schedule=professional_schedule,
+            date=slot_date,
+            start_time=start_time,
+            end_time=end_time,
+            is_available=is_available
+        )
+        for (slot_date, start_time), (end_time, is_available) in expected.items()
     ]
     
-    # Crear en masa
-    AvailabilitySlot.objects.bulk_create(slots_objects)
+    if not (to_delete or to_update or to_create):
+        return result
+    
+    with transaction.atomic():
+        if to_delete:
+            AvailabilitySlot.objects.filter(id__in=to_delete).delete()
+        if to_update:
+            AvailabilitySlot.objects.bulk_update(to_update, ['end_time', 'is_available', 'updated_at'])
+        if to_create:
+            AvailabilitySlot.objects.bulk_create(to_create)
+    
+    result.update(created=len(to_create), updated=len(to_update), deleted=len(to_delete))
+    return result
+
+
+def _slots_by_date(professional_schedule, dates):
+    """
+    Slots del horario (sin citas) agrupados por fecha, en minutos desde la medianoche
+    """
+    slots_by_date = {target_date: [] for target_date in dates}
+    for slot_data in generate_availability_slots(professional_schedule, min(dates), max(dates)):
+        if slot_data['date'] in slots_by_date:
+            slots_by_date[slot_data['date']].append(
+                (to_minutes(slot_data['start_time']), to_minutes(slot_data['end_time']))
+            )
+    return slots_by_date
+
+
+def refresh_availability_bitmaps(professional_schedule, dates):
+    """
+    Recalcular los mapas de bits de disponibilidad de un profesional para fechas específicas
+    
+    Las celdas libres se recalculan desde el horario compilado y las citas
+    activas; los bloqueos manuales se conservan (y se convierten si cambia el
+    tamaño de celda). Solo se escriben los días que cambiaron, incrementando
+    su versión.
+    
+    Returns:
+        Diccionario con los días creados, actualizados y el total
+    """
+    dates = sorted(set(dates))
+    result = {'created': 0, 'updated': 0, 'total': len(dates)}
+    if not dates:
+        return result
+    
+    tz = get_schedule_timezone(professional_schedule)
+    interval_index = _get_appointment_index(professional_schedule, dates[0], dates[-1])
+    slots_by_date = _slots_by_date(professional_schedule, dates)
+    existing = {
+        bitmap.date: bitmap
+        for bitmap in AvailabilityBitmap.objects.filter(
+            professional_schedule=professional_schedule,
+            date__in=dates
+        )
+    }
+    
+    to_create = []
+    to_update = []
+    now = timezone.now()
+    for target_date in dates:
+        day_slots = slots_by_date[target_date]
+        cell_minutes = get_cell_minutes(professional_schedule.slot_duration, (start for start, _ in day_slots))
+        
+        free_mask = 0
+        for start_minute, end_minute in day_slots:
+            free_mask |= cells_in(start_minute, end_minute, cell_minutes)
+        
+        day = SlotDay(target_date, tz, 0, None, '')
+        day_start, day_end = day.to_datetime(0), day.to_datetime(MINUTES_PER_DAY)
+        for appointment in interval_index.overlapping(day_start, day_end):
+            start_minute, end_minute = day.minutes_between(appointment.start_datetime, appointment.end_datetime)
+            free_mask &= ~cells_touching(start_minute, end_minute, cell_minutes)
+        free_cells = pack_cells(free_mask, cell_minutes)
+        
+        bitmap = existing.get(target_date)
+        if bitmap is None:
+            to_create.append(AvailabilityBitmap(
+                professional_schedule=professional_schedule,
+                date=target_date,
+                cell_minutes=cell_minutes,
+                free_cells=free_cells,
+                blocked_cells=pack_cells(0, cell_minutes)
+            ))
+        elif bitmap.cell_minutes != cell_minutes or bytes(bitmap.free_cells) != free_cells:
+            bitmap.blocked_cells = pack_cells(
+                remap_cells(bitmap.blocked_mask, bitmap.cell_minutes, cell_minutes), cell_minutes
+            )
+            bitmap.cell_minutes = cell_minutes
+            bitmap.free_cells = free_cells
+            bitmap.version += 1
+            bitmap.updated_at = now
+            to_update.append(bitmap)
+    
+    if to_create or to_update:
+        with transaction.atomic():
+            if to_update:
+                AvailabilityBitmap.objects.bulk_update(
+                    to_update, ['cell_minutes', 'free_cells', 'blocked_cells', 'version', 'updated_at']
+                )
+            if to_create:
+                AvailabilityBitmap.objects.bulk_create(to_create)
+    
+    result.update(created=len(to_create), updated=len(to_update))
+    return result
+
+
+def build_availability_bitmaps(professional_schedule, start_date, end_date):
+    """
+    Crear o actualizar los mapas de bits de disponibilidad de un rango de fechas
+    
+    Returns:
+        Número de días materializados en el rango
+    """
+    dates = [start_date + timedelta(days=offset) for offset in range((end_date - start_date).days + 1)]
+    return refresh_availability_bitmaps(professional_schedule, dates)['total']
+
+
+def refresh_materialized_availability(professional_id, dates=None, weekdays=None):
+    """
+    Recalcular solo los días ya materializados de un profesional afectados por un cambio
     
-    return len(slots_objects)
+    Se actualizan los AvailabilitySlot, los AvailabilityBitmap y el mapa de
+    calor diario (DailyAvailability) dentro del horizonte ya materializado de cada uno.
+    
+    Args:
+        dates: Fechas afectadas (citas y excepciones)
+        weekdays: Días de la semana afectados (horarios semanales y descansos);
+            sin dates ni weekdays se recalcula todo el horizonte materializado
+    """
+    # Importar aquí para evitar import circular (heatmap usa schedule.services)
+    from .heatmap import refresh_daily_availability
+    from .models import DailyAvailability
+    
+    results = {}
+    professional_schedule = None
+    storages = (
+        ('slots', AvailabilitySlot, refresh_availability_slots),
+        ('bitmaps', AvailabilityBitmap, refresh_availability_bitmaps),
+        ('heatmap', DailyAvailability, refresh_daily_availability),
+    )
+    for name, model, refresh in storages:
+        horizon = model.objects.filter(
+            professional_schedule__professional_id=professional_id,
+            date__gte=timezone.localdate()
+        ).values('professional_schedule_id').annotate(
+            first_date=Min('date'), last_date=Max('date')
+        ).order_by('professional_schedule_id').first()
+        if not horizon:
+            continue
+        
+        first_date, last_date = horizon['first_date'], horizon['last_date']
+        if dates is not None:
+            affected = [target_date for target_date in dates if first_date <= target_date <= last_date]
+        else:
+            affected = [
+                first_date + timedelta(days=offset)
+                for offset in range((last_date - first_date).days + 1)
+                if weekdays is None or (first_date + timedelta(days=offset)).weekday() in weekdays
+            ]
+        if not affected:
+            continue
+        
+        if professional_schedule is None:
+            professional_schedule = ProfessionalSchedule.objects.get(pk=horizon['professional_schedule_id'])
+        results[name] = refresh(professional_schedule, affected)
+    
+    return results or None
+
+
+def _get_day_bitmap(professional_schedule, date, for_update=False):
+    """
+    Obtener el mapa de bits de un día, materializándolo si no existe
+    """
+    queryset = AvailabilityBitmap.objects.filter(professional_schedule=professional_schedule, date=date)
+    if for_update:
+        queryset = queryset.select_for_update()
+    bitmap = queryset.first()
+    if bitmap is None:
+        refresh_availability_bitmaps(professional_schedule, [date])
+        bitmap = queryset.get()
+    return bitmap
+
+
+def _slot_masks(professional_schedule, date, cell_minutes, start_time=None, end_time=None):
+    """
+    Slots del día (opcionalmente contenidos en [start_time, end_time]) con su máscara de celdas
+    """
+    slot_masks = []
+    for start_minute, end_minute in _slots_by_date(professional_schedule, [date])[date]:
+        if start_time is not None and not (to_minutes(start_time) <= start_minute and end_minute <= to_minutes(end_time)):
+            continue
+        slot_masks.append((start_minute, end_minute, cells_in(start_minute, end_minute, cell_minutes)))
+    return slot_masks
 
 
 def get_professional_availability(professional_schedule, date):
     """
     Obtener disponibilidad de un profesional para una fecha específica
+    
+    Se resuelve con operaciones de bits sobre el AvailabilityBitmap del día:
+    un slot está disponible si todas sus celdas están libres y ninguna bloqueada.
+    
+    Returns:
+        Lista de slots disponibles ({'date', 'start_time', 'end_time'}) ordenados por hora
     """
-    return AvailabilitySlot.objects.filter(
-        professional_schedule=professional_schedule,
-        date=date,
-        is_available=True,
-        is_blocked=False
-    ).order_by('start_time')
+    bitmap = _get_day_bitmap(professional_schedule, date)
+    available_mask = bitmap.available_mask
+    midnight = datetime.combine(date, time(0, 0))
+    return [
+        {
+            'date': date,
+            'start_time': (midnight + timedelta(minutes=start_minute)).time(),
+            'end_time': (midnight + timedelta(minutes=end_minute)).time()
+        }
+        for start_minute, end_minute, mask in sorted(_slot_masks(professional_schedule, date, bitmap.cell_minutes))
+        if mask and available_mask & mask == mask
+    ]
 
 
 def block_time_slot(professional_schedule, date, start_time, end_time, reason=""):
     """
     Bloquear un slot de tiempo específico
-    """
-    slots = AvailabilitySlot.objects.filter(
-        professional_schedule=professional_schedule,
-        date=date,
-        start_time__gte=start_time,
-        end_time__lte=end_time
-    )
     
-    updated_count = slots.update(
-        is_blocked=True,
-        blocked_reason=reason
-    )
+    Marca las celdas de los slots contenidos en el rango en el mapa de bits
+    del día; los AvailabilitySlot materializados se actualizan igual.
     
-    return updated_count
+    Returns:
+        Número de slots bloqueados
+    """
+    with transaction.atomic():
+        bitmap = _get_day_bitmap(professional_schedule, date, for_update=True)
+        slot_masks = _slot_masks(professional_schedule, date, bitmap.cell_minutes, start_time, end_time)
+        blocked_mask = bitmap.blocked_mask
+        blocked_reasons = dict(bitmap.blocked_reasons)
+        for start_minute, _, mask in slot_masks:
+            blocked_mask |= mask
+            blocked_reasons[str(start_minute)] = reason
+        _save_blocked_cells(bitmap, blocked_mask, blocked_reasons)
+        
+        AvailabilitySlot.objects.filter(
+            professional_schedule=professional_schedule,
+            date=date,
+            start_time__gte=start_time,
+            end_time__lte=end_time
+        ).update(
+            is_blocked=True,
+            blocked_reason=reason
+        )
+    
+    return len(slot_masks)
 
 
 def unblock_time_slot(professional_schedule, date, start_time, end_time):
     """
     Desbloquear un slot de tiempo específico
-    """
-    slots = AvailabilitySlot.objects.filter(
-        professional_schedule=professional_schedule,
-        date=date,
-        start_time__gte=start_time,
-        end_time__lte=end_time
-    )
     
-    updated_count = slots.update(
-        is_blocked=False,
-        blocked_reason=""
-    )
+    Returns:
+        Número de slots desbloqueados
+    """
+    with transaction.atomic():
+        bitmap = _get_day_bitmap(professional_schedule, date, for_update=True)
+        slot_masks = _slot_masks(professional_schedule, date, bitmap.cell_minutes, start_time, end_time)
+        blocked_mask = bitmap.blocked_mask
+        blocked_reasons = dict(bitmap.blocked_reasons)
+        for start_minute, _, mask in slot_masks:
+            blocked_mask &= ~mask
+            blocked_reasons.pop(str(start_minute), None)
+        _save_blocked_cells(bitmap, blocked_mask, blocked_reasons)
+        
+        AvailabilitySlot.objects.filter(
+            professional_schedule=professional_schedule,
+            date=date,
+            start_time__gte=start_time,
+            end_time__lte=end_time
+        ).update(
+            is_blocked=False,
+            blocked_reason=""
+        )
     
-    return updated_count
+    return len(slot_masks)
+
+
+def _save_blocked_cells(bitmap, blocked_mask, blocked_reasons):
+    """
+    Guardar los bloqueos de un día solo si cambiaron, incrementando su versión
+    """
+    if blocked_mask == bitmap.blocked_mask and blocked_reasons == bitmap.blocked_reasons:
+        return
+    bitmap.blocked_cells = pack_cells(blocked_mask, bitmap.cell_minutes)
+    bitmap.blocked_reasons = blocked_reasons
+    bitmap.version += 1
+    bitmap.save(update_fields=['blocked_cells', 'blocked_reasons', 'version', 'updated_at'])
 
 
 def get_schedule_conflicts(professional_schedule, date, start_time, end_time):
@@ -1,3 +1,4 @@
+import uuid
 from django.shortcuts import render
 from rest_framework import viewsets, status, permissions
 from rest_framework.decorators import action
@@ -14,7 +15,9 @@ from .models import (
     WeeklySchedule,
     ScheduleBreak,
     ScheduleException,
-    AvailabilitySlot
+    AvailabilitySlot,
+    AvailabilityBitmap,
+    DailyAvailability
 )
 from .serializers import (
     ProfessionalScheduleSerializer,
@@ -24,8 +27,11 @@ from .serializers import (
     ScheduleBreakSerializer,
     ScheduleExceptionSerializer,
     AvailabilitySlotSerializer,
+    AvailabilityBitmapSerializer,
     ScheduleSummarySerializer
 )
+from .heatmap import get_heatmap_durations, refresh_daily_availability
+from .utils import refresh_availability_bitmaps
 
 
 class ProfessionalScheduleViewSet(viewsets.ModelViewSet):
@@ -260,6 +266,7 @@ class AvailabilitySlotViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = AvailabilitySlotSerializer
     authentication_classes = [JWTAuthentication]
     permission_classes = [permissions.IsAuthenticated]
+    max_bitmap_days = 92
     
     def get_queryset(self):
         user = self.request.user
@@ -312,6 +319,193 @@ class AvailabilitySlotViewSet(viewsets.ReadOnlyModelViewSet):
         
         serializer = self.get_serializer(queryset, many=True)
         return Response(serializer.data)
+    
+    @action(detail=False, methods=['get'])
+    def bitmaps(self, request):
+        """
+        Obtener la disponibilidad de un profesional como mapas de bits (una fila por día)
+        
+        Alternativa compacta a by_professional: los días aún no materializados
+        se calculan una sola vez.
+        """
+        professional_id = request.query_params.get('professional_id')
+        if not professional_id:
+            return Response(
+                {'error': 'professional_id es requerido'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        try:
+            start_date = datetime.strptime(
+                request.query_params.get('start_date', timezone.localdate().isoformat()), '%Y-%m-%d'
+            ).date()
+            end_date = datetime.strptime(
+                request.query_params.get('end_date', (start_date + timedelta(days=30)).isoformat()), '%Y-%m-%d'
+            ).date()
+        except ValueError:
+            return Response(
+                {'error': 'Formato de fecha inválido. Use YYYY-MM-DD'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        if end_date < start_date or (end_date - start_date).days > self.max_bitmap_days:
+            return Response(
+                {'error': f'El rango debe ser de máximo {self.max_bitmap_days} días'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        try:
+            uuid.UUID(professional_id)
+        except ValueError:
+            return Response(
+                {'error': 'professional_id inválido'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        try:
+            professional = Professional.objects.select_related('schedule').get(
+                id=professional_id,
+                organization=request.user.organization
+            )
+        except Professional.DoesNotExist:
+            return Response(
+                {'error': 'Profesional no encontrado'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        
+        if not hasattr(professional, 'schedule'):
+            return Response(
+                {'error': 'El profesional no tiene horarios configurados'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        queryset = AvailabilityBitmap.objects.filter(
+            professional_schedule=professional.schedule,
+            date__range=(start_date, end_date)
+        )
+        existing_dates = set(queryset.values_list('date', flat=True))
+        missing_dates = [
+            start_date + timedelta(days=offset)
+            for offset in range((end_date - start_date).days + 1)
+            if start_date + timedelta(days=offset) not in existing_dates
+        ]
+        if missing_dates:
+            refresh_availability_bitmaps(professional.schedule, missing_dates)
+        
+        return Response({
+            'professional_id': str(professional.id),
+            'professional_name': professional.name,
+            'days': AvailabilityBitmapSerializer(queryset, many=True).data
+        })
+
+
+class AvailabilityHeatmapView(APIView):
+    """
+    Vista del mapa de calor de disponibilidad de la organización
+    
+    Lee el resumen diario precalculado (DailyAvailability) con una sola consulta
+    indexada por organización y fecha; solo los días aún no materializados
+    pasan por el motor de slots.
+    """
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [permissions.IsAuthenticated]
+    default_days = 60
+    max_days = 92
+    
+    def get(self, request):
+        """
+        Obtener minutos libres, slots por duración y primera hora libre por profesional y día
+        """
+        user = request.user
+        if not user.organization:
+            return Response(
+                {'error': 'Usuario sin organización'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        try:
+            start_date = datetime.strptime(
+                request.query_params.get('start_date', timezone.localdate().isoformat()), '%Y-%m-%d'
+            ).date()
+            days = int(request.query_params.get('days', self.default_days))
+        except ValueError:
+            return Response(
+                {'error': 'Parámetros inválidos. Use start_date=YYYY-MM-DD y days numérico'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        if not 1 <= days <= self.max_days:
+            return Response(
+                {'error': f'days debe estar entre 1 y {self.max_days}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        end_date = start_date + timedelta(days=days - 1)
+        
+        schedules = ProfessionalSchedule.objects.filter(
+            professional__organization=user.organization,
+            professional__is_active=True,
+            is_active=True,
+            accepts_bookings=True
+        ).select_related('professional').order_by('professional__name')
+        professional_id = request.query_params.get('professional_id')
+        if professional_id:
+            try:
+                uuid.UUID(professional_id)
+            except ValueError:
+                return Response(
+                    {'error': 'professional_id inválido'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            schedules = schedules.filter(professional_id=professional_id)
+        schedules = list(schedules)
+        
+        rows = DailyAvailability.objects.filter(
+            organization=user.organization,
+            date__range=(start_date, end_date),
+            professional_schedule__in=schedules
+        )
+        days_by_schedule = {schedule.id: {} for schedule in schedules}
+        for row in rows:
+            days_by_schedule[row.professional_schedule_id][row.date] = row
+        
+        # Materializar una sola vez los días que aún no existen
+        all_dates = [start_date + timedelta(days=offset) for offset in range(days)]
+        refreshed = False
+        for schedule in schedules:
+            missing_dates = [
+                target_date for target_date in all_dates
+                if target_date not in days_by_schedule[schedule.id]
+            ]
+            if missing_dates:
+                refresh_daily_availability(schedule, missing_dates)
+                refreshed = True
+        if refreshed:
+            days_by_schedule = {schedule.id: {} for schedule in schedules}
+            for row in rows.all():
+                days_by_schedule[row.professional_schedule_id][row.date] = row
+        
+        return Response({
+            'start_date': start_date.isoformat(),
+            'end_date': end_date.isoformat(),
+            'durations': get_heatmap_durations(),
+            'professionals': [
+                {
+                    'professional_id': str(schedule.professional_id),
+                    'professional_name': schedule.professional.name,
+                    'days': {
+                        target_date.isoformat(): {
+                            'free_minutes': row.free_minutes,
+                            'slot_counts': row.slot_counts,
+                            'earliest_free_time': (
+                                row.earliest_free_time.strftime('%H:%M') if row.earliest_free_time else None
+                            )
+                        }
+                        for target_date, row in sorted(days_by_schedule[schedule.id].items())
+                    }
+                }
+                for schedule in schedules
+            ]
+        })
 
 
 class ScheduleOverviewView(APIView):
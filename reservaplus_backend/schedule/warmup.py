@@ -0,0 +1,171 @@
+# schedule/warmup.py
+
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import timedelta
+from typing import Dict, Iterable, List, Optional
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections, connections, transaction
+from django.utils import timezone
+from organizations.models import Professional
+from .cache import get_availability_cache_timeout, is_availability_cache_enabled
+from .services import AvailabilityCalculationService
+
+
+# Días hacia adelante que se precalculan por defecto
+DEFAULT_AVAILABILITY_WARMUP_DAYS = 14
+
+# Clave con las estadísticas de la última ejecución completa
+LAST_WARMUP_CACHE_KEY = 'availability:warmup:last_run'
+
+
+def get_warmup_days() -> int:
+    return getattr(settings, 'AVAILABILITY_WARMUP_DAYS', DEFAULT_AVAILABILITY_WARMUP_DAYS)
+
+
+def get_bookable_professional_ids(organization_id=None) -> List:
+    """
+    IDs de los profesionales activos cuyo horario acepta reservas
+    """
+    professionals = Professional.objects.filter(
+        is_active=True,
+        schedule__accepts_bookings=True,
+        schedule__is_active=True
+    )
+    if organization_id:
+        professionals = professionals.filter(organization_id=organization_id)
+    return list(professionals.order_by('id').values_list('id', flat=True))
+
+
+def warm_professional_availability(professional_id, days: Optional[int] = None) -> Dict:
+    """
+    Precalcular y cachear los slots libres de un profesional para cada uno de sus servicios
+
+    Los servicios con la misma duración comparten entradas de caché, por lo que
+    se calcula una vez por duración sobre una sola carga del rango.
+
+    Returns:
+        Diccionario con el profesional, las duraciones y los días calculados
+    """
+    days = get_warmup_days() if days is None else days
+    result = {'professional_id': str(professional_id), 'durations': [], 'computed_days': 0}
+
+    professional = Professional.objects.select_related('schedule').filter(
+        pk=professional_id,
+        is_active=True,
+        schedule__accepts_bookings=True,
+        schedule__is_active=True
+    ).first()
+    if not professional or days <= 0:
+        return result
+
+    services_by_duration = {}
+    for service in professional.services.filter(is_active=True):
+        services_by_duration.setdefault(service.total_duration_minutes, service)
+
+    start_date = timezone.localdate()
+    end_date = start_date + timedelta(days=days - 1)
+    availability_service = AvailabilityCalculationService(professional)
+    availability_service.load_range(start_date, end_date, with_clients=False)
+    for duration, service in sorted(services_by_duration.items()):
+        slots_by_date = availability_service.get_available_slots_range(
+            start_date, end_date, service, available_only=True
+        )
+        result['durations'].append(duration)
+        result['computed_days'] += len(slots_by_date)
+    return result
+
+
+def _warm_in_worker(professional_id, days: int) -> Dict:
+    # Cada proceso del pool abre su propia conexión a la base de datos
+    close_old_connections()
+    try:
+        return warm_professional_availability(professional_id, days)
+    finally:
+        connections.close_all()
+
+
+def warm_availability(
+    professional_ids: Optional[Iterable] = None,
+    days: Optional[int] = None,
+    workers: int = 1
+) -> Dict:
+    """
+    Precalcular la disponibilidad de los profesionales reservables
+
+    Con workers > 1 los profesionales se reparten en un pool de procesos; solo
+    tiene sentido con una caché compartida entre procesos (Redis), ya que la
+    caché en memoria local es propia de cada proceso.
+
+    Returns:
+        Diccionario con los profesionales procesados, los días calculados y la duración
+    """
+    started = time.monotonic()
+    days = get_warmup_days() if days is None else days
+    if professional_ids is None:
+        professional_ids = get_bookable_professional_ids()
+    professional_ids = list(professional_ids)
+
+    stats = {'professionals': len(professional_ids), 'computed_days': 0, 'workers': 1, 'seconds': 0.0}
+    if not is_availability_cache_enabled() or not professional_ids:
+        stats['seconds'] = round(time.monotonic() - started, 3)
+        return stats
+
+    if workers > 1 and len(professional_ids) > 1:
+        stats['workers'] = min(workers, len(professional_ids))
+        # Los procesos hijos no deben heredar conexiones abiertas del padre
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=stats['workers']) as executor:
+            results = list(executor.map(_warm_in_worker, professional_ids, [days] * len(professional_ids)))
+    else:
+        results = [warm_professional_availability(professional_id, days) for professional_id in professional_ids]
+
+    stats['computed_days'] = sum(result['computed_days'] for result in results)
+    stats['seconds'] = round(time.monotonic() - started, 3)
+    cache.set(
+        LAST_WARMUP_CACHE_KEY,
+        dict(stats, days=days, finished_at=timezone.now().isoformat()),
+        timeout=max(get_availability_cache_timeout(), 60 * 60 * 24)
+    )
+    return stats
+
+
+# Precálculo dirigido tras guardar horarios: un hilo en segundo plano por proceso
+_warmup_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='availability-warmup')
+_pending_warmups = set()
+_pending_lock = threading.Lock()
+
+
+def _run_enqueued_warmup(professional_id) -> None:
+    with _pending_lock:
+        _pending_warmups.discard(professional_id)
+    try:
+        warm_professional_availability(professional_id)
+    finally:
+        close_old_connections()
+
+
+def enqueue_availability_warmup(professional_id) -> None:
+    """
+    Encolar el precálculo de un profesional al confirmar la transacción
+
+    Los cambios repetidos del mismo profesional se agrupan mientras la tarea
+    está pendiente. Con AVAILABILITY_WARMUP_IN_BACKGROUND=False (tests) se
+    ejecuta en el mismo hilo.
+    """
+    if not is_availability_cache_enabled():
+        return
+
+    def submit():
+        if not getattr(settings, 'AVAILABILITY_WARMUP_IN_BACKGROUND', True):
+            warm_professional_availability(professional_id)
+            return
+        with _pending_lock:
+            if professional_id in _pending_warmups:
+                return
+            _pending_warmups.add(professional_id)
+        _warmup_executor.submit(_run_enqueued_warmup, professional_id)
+
+    transaction.on_commit(submit)